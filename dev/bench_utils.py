@@ -0,0 +1,79 @@
+"""Shared helpers for the benchmark scripts in this folder."""
+import os
+import sys
+import json
+import time
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DEFAULT_QUERIES = [
+    "What are the latest updates on Epstein",
+    "Give me the latest on news corp columnist Lucy Zelić.",
+    "What is happening with the UK economy?",
+    "Latest climate change policy news",
+    "Who won the weekend's Premier League matches?",
+    "What did the prime minister announce this week?",
+    "Updates on the war in Ukraine",
+    "Artificial intelligence regulation in Europe",
+]
+
+
+def load_queries(path: str = None):
+    """One query per line from a file, or the default news questions"""
+    if not path:
+        return list(DEFAULT_QUERIES)
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def percentile(samples, pct: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(samples):
+    """mean/p50/p95/p99 of latency samples in seconds, reported in milliseconds"""
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as an aligned text table"""
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return "-" if value is None else str(value)
+
+    widths = {c: max(len(c), *(len(fmt(r.get(c))) for r in rows)) if rows else len(c) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def write_json(path: str, payload):
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    print(f"Results written to {path}")
@@ -0,0 +1,78 @@
+"""Adaptive (AIMD) batch concurrency against each database: where the limit settles, throughput and p95.
+
+Runs AsyncPipeline in-process with adaptive=True, so the LLM endpoint and the database services
+must be reachable as they are for the LangChain service. A fixed-concurrency run at --fixed is
+included per database for comparison.
+
+Usage (from the repository root):
+    python dev/benchmark_adaptive_concurrency.py --databases clickhouse postgres --questions 200
+    python dev/benchmark_adaptive_concurrency.py --target-p95-ms 3000 --start 4 --output adaptive.json
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+from bench_utils import ROOT, load_queries, print_table, write_json
+
+sys.path.insert(0, os.path.join(ROOT, "llm"))
+from llm_utils.async_pipeline import AsyncPipeline
+from llm_utils.langchain_pipeline import RAGApplication, Database
+
+
+async def run_once(app, database: str, questions, concurrency: int, adaptive: bool, target_p95_ms: float):
+    pipeline = AsyncPipeline(max_concurrency=concurrency, run_name=f"bench-adaptive-{database}", database=database,
+                             app=app, adaptive=adaptive, target_p95_ms=target_p95_ms)
+    started = time.perf_counter()
+    results = await pipeline.run_batch(questions)
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for r in results if str(r.get("answer", "")).startswith("Error:"))
+    # Per-question latency is only measured by the limiter, so the fixed run reports throughput alone
+    row = {
+        "database": database,
+        "mode": "adaptive" if adaptive else "fixed",
+        "questions": len(questions),
+        "errors": errors,
+        "questions_per_s": len(questions) / elapsed,
+    }
+    if adaptive:
+        summary = pipeline.limiter.summary()
+        row.update(settled_limit=summary["settled_limit"], final_limit=summary["final_limit"],
+                   p95_ms=summary["last_window_p95_ms"], adjustments=summary["adjustments"])
+    else:
+        row.update(settled_limit=concurrency, final_limit=concurrency, p95_ms=None)
+    return row
+
+
+async def run(databases, questions, start: int, fixed: int, target_p95_ms: float):
+    app = RAGApplication(name="")
+    rows = []
+    for database in databases:
+        for adaptive, concurrency in ((False, fixed), (True, start)):
+            row = await run_once(app, database, questions, concurrency, adaptive, target_p95_ms)
+            print(f"{database} {row['mode']}: {row['questions_per_s']:.2f} q/s, limit {row['settled_limit']}")
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive batch concurrency per database")
+    parser.add_argument("--databases", nargs="+", default=[db.value[0] for db in Database])
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--questions", type=int, default=100, help="Questions per run (queries are repeated)")
+    parser.add_argument("--start", type=int, default=2, help="Initial concurrency for the adaptive run")
+    parser.add_argument("--fixed", type=int, default=8, help="Concurrency of the fixed comparison run")
+    parser.add_argument("--target-p95-ms", type=float, default=None)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    questions = (queries * (args.questions // len(queries) + 1))[:args.questions]
+    rows = asyncio.run(run(args.databases, questions, args.start, args.fixed, args.target_p95_ms))
+    print_table(rows, ["database", "mode", "settled_limit", "final_limit", "questions_per_s", "p95_ms", "errors"])
+    write_json(args.output, {"results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Latency and memory of ClickHouse re-ranking: row tuples vs Arrow/NumPy columns.
+
+Both paths fetch the same top-N candidates with their embeddings and re-rank them with
+services.common.rerank. "rows" is how results came back before: result_rows as Python tuples,
+every embedding a list of 384 floats, stacked into a matrix for scoring. "columnar" is
+ClickhouseDao.related_articles_columnar: one Arrow table, the embedding column viewed as a
+NumPy matrix, only the final k rows materialized. Memory is the tracemalloc peak of the
+Python heap during a query; the columnar path also reports the Arrow memory still held when
+the result is returned, which is zero once the candidate table has been dropped.
+
+Usage (from the repository root, with ClickHouse reachable):
+    python dev/benchmark_columnar_rerank.py --candidates 50 200 1000
+    python dev/benchmark_columnar_rerank.py --rerank mmr --mmr-lambda 0.7 --k 10
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+import pyarrow as pa
+
+from bench_utils import load_queries, latency_summary, timed, print_table, write_json
+from scripts.embedding_snapshot import load_dao
+from services.common.rerank import RERANK_MODES, rerank
+
+
+def rows_path(dao, query: str, k: int, candidates: int, mode: str, mmr_lambda: float, min_score: float):
+    embedding = dao.model.encode(query)
+    rows = dao.client.query(f"""
+        SELECT url, title, body, publication_date, embedding
+        FROM {dao.table}
+        ORDER BY {dao.candidate_order("none", embedding)}
+        LIMIT {candidates}
+    """).result_rows
+    idx, scores = rerank(np.array([row[4] for row in rows], dtype=np.float32), embedding, k, mode,
+                         mmr_lambda, min_score)
+    return [rows[i][:4] + (1.0 - float(score),) for i, score in zip(idx, scores)]
+
+
+def columnar_path(dao, query: str, k: int, candidates: int, mode: str, mmr_lambda: float, min_score: float):
+    return dao.related_articles_columnar(query, limit=k, candidates=candidates, rerank=mode,
+                                         mmr_lambda=mmr_lambda, min_score=min_score)
+
+
+def measure(name, fn, dao, queries, args, candidates: int):
+    fn(dao, queries[0], args.k, candidates, args.rerank, args.mmr_lambda, args.min_score)  # warm up
+    samples, python_peaks, arrow_bytes = [], [], []
+    for _ in range(args.repeat):
+        for q in queries:
+            arrow_before = pa.total_allocated_bytes()
+            tracemalloc.start()
+            _, elapsed = timed(fn, dao, q, args.k, candidates, args.rerank, args.mmr_lambda, args.min_score)
+            python_peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            samples.append(elapsed)
+            arrow_bytes.append(pa.total_allocated_bytes() - arrow_before)
+    summary = latency_summary(samples)
+    return {
+        "path": name,
+        "candidates": candidates,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "python_peak_kb": max(python_peaks) / 1024,
+        "arrow_held_kb": max(arrow_bytes) / 1024 if name == "columnar" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar vs row-tuple candidate re-ranking")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--rerank", choices=RERANK_MODES, default="exact")
+    parser.add_argument("--mmr-lambda", type=float, default=0.5)
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--queries-file")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    dao = load_dao("clickhouse")
+    queries = load_queries(args.queries_file)
+    rows = []
+    for candidates in args.candidates:
+        rows.append(measure("rows", rows_path, dao, queries, args, candidates))
+        rows.append(measure("columnar", columnar_path, dao, queries, args, candidates))
+    print_table(rows, ["path", "candidates", "p50_ms", "p95_ms", "python_peak_kb", "arrow_held_kb"])
+    write_json(args.output, {"rerank": args.rerank, "k": args.k, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
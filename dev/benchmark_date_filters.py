@@ -0,0 +1,73 @@
+"""Latency of date-filtered vector search against the width of the publication-date window.
+
+Rows scanned are reported where the backend exposes them (ClickHouse read_rows, NumPy mask size),
+so partition pruning and index pre-filtering show up next to the timings.
+
+Usage (from the repository root, with the backend's database reachable):
+    python dev/benchmark_date_filters.py --backend clickhouse --windows 7 30 90 365
+    python dev/benchmark_date_filters.py --backend numpy --anchor 2025-06-30
+"""
+import argparse
+from datetime import date, timedelta
+
+from bench_utils import load_queries, latency_summary, timed, print_table, write_json
+from scripts.embedding_snapshot import load_dao, DAOS
+
+
+def search(dao, backend: str, query: str, **kwargs):
+    """related_articles and the rows it scanned, where the backend reports them"""
+    if backend == "numpy":
+        stats = {}
+        return dao.related_articles(query, stats=stats, **kwargs), stats["scanned_rows"]
+    return dao.related_articles(query, **kwargs), getattr(dao, "last_read_rows", None)
+
+
+def run(backend: str, windows, anchor: date, queries, k: int, repeat: int):
+    dao = load_dao(backend)
+    to_date = anchor.isoformat()
+
+    rows = []
+    # None is the unfiltered baseline
+    for days in [None] + list(windows):
+        from_date = (anchor - timedelta(days=days - 1)).isoformat() if days else None
+        window = {"from_date": from_date, "to_date": to_date if days else None}
+        dao.related_articles(queries[0], limit=k, **window)  # warm up (builds indexes/masks)
+        samples, scanned, returned = [], [], []
+        for _ in range(repeat):
+            for q in queries:
+                (result, read), elapsed = timed(search, dao, backend, q, limit=k, **window)
+                samples.append(elapsed)
+                returned.append(len(result))
+                scanned.append(read)
+        summary = latency_summary(samples)
+        known = [s for s in scanned if s is not None]
+        rows.append({
+            "backend": backend,
+            "window_days": days or "all",
+            "p50_ms": summary["p50_ms"],
+            "p95_ms": summary["p95_ms"],
+            "rows_scanned": sum(known) / len(known) if known else None,
+            "avg_results": sum(returned) / len(returned),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark date-range filters against window size")
+    parser.add_argument("--backend", required=True, choices=list(DAOS))
+    parser.add_argument("--windows", nargs="+", type=int, default=[7, 30, 90, 365], help="Window widths in days")
+    parser.add_argument("--anchor", type=date.fromisoformat, default=date.today(),
+                        help="Last day of every window (default: today)")
+    parser.add_argument("--queries-file")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    rows = run(args.backend, args.windows, args.anchor, load_queries(args.queries_file), args.k, args.repeat)
+    print_table(rows, ["backend", "window_days", "p50_ms", "p95_ms", "rows_scanned", "avg_results"])
+    write_json(args.output, rows)
+
+
+if __name__ == "__main__":
+    main()
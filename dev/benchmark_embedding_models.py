@@ -0,0 +1,107 @@
+"""Speed/quality matrix of embedding models across backends.
+
+Articles from a snapshot (see scripts/embedding_snapshot.py) are re-encoded with each model and
+loaded into that model's own table in every requested backend (EMBEDDING_MODEL is set per model, so
+the DAOs pick the per-model table; see services/common/embedding_models.py). Quality is
+title -> article retrieval: an article's headline is the query and its own URL the one relevant
+result, so recall@k needs no labels. Per model it reports encode throughput and exact (brute-force)
+recall; per (model, backend) pair the stored vector size, query latency and recall through the DAO.
+
+Usage (from the repository root, with the backends' databases reachable):
+    python dev/benchmark_embedding_models.py --snapshot snapshots/guardian --backends numpy
+    python dev/benchmark_embedding_models.py --snapshot snapshots/guardian --models minilm bge-small mpnet \\
+        --backends clickhouse postgres --articles 5000 --queries 200
+"""
+import os
+import argparse
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from bench_utils import latency_summary, timed, print_table, write_json
+from scripts.embedding_snapshot import load_dao
+from services.common.embedding_models import EMBEDDING_MODELS, embedding_model
+from services.common.encoder import load_encoder
+
+
+def load_articles(snapshot: str, n: int):
+    table = pq.read_table(os.path.join(snapshot, "articles.parquet"))
+    return [a for a in table.to_pylist() if a["title"] and a["body"]][:n]
+
+
+def exact_recall(embeddings: np.ndarray, title_vectors: np.ndarray, sample, k: int) -> float:
+    """Share of titles whose own article (row sample[i] for title i) is in the brute-force top-k"""
+    unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = title_vectors @ unit.T
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    return float(np.mean([article in row for article, row in zip(sample, top)]))
+
+
+def measure_backend(backend: str, model_key: str, articles, embeddings, sample, k: int, ingest: bool):
+    dao = load_dao(backend)
+    if ingest:
+        rows = [(a["url"], a["title"], a["body"], a["publication_date"], e) for a, e in zip(articles, embeddings)]
+        dao.insert_articles(rows)
+    samples, hits = [], []
+    for i in sample:
+        try:
+            result, elapsed = timed(dao.related_articles, articles[i]["title"], limit=k)
+        except Exception:
+            result, elapsed = [], None
+        if elapsed is not None:
+            samples.append(elapsed)
+        hits.append(articles[i]["url"] in [row[0] for row in result])
+    storage = dao.storage_stats().get("none") if hasattr(dao, "storage_stats") else None
+    summary = latency_summary(samples)
+    return {
+        "model": model_key,
+        "backend": backend,
+        "table": getattr(dao, "table", None) or getattr(dao, "data_dir", None),
+        "storage": storage,
+        "p50_ms": summary.get("p50_ms"),
+        "p95_ms": summary.get("p95_ms"),
+        f"recall@{k}": float(np.mean(hits)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding models per backend")
+    parser.add_argument("--snapshot", required=True, help="Snapshot directory providing the articles")
+    parser.add_argument("--models", nargs="+", choices=list(EMBEDDING_MODELS), default=list(EMBEDDING_MODELS))
+    parser.add_argument("--backends", nargs="+", default=["numpy"],
+                        choices=["clickhouse", "postgres", "cassandra", "numpy"])
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100, help="Headlines used as queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-ingest", action="store_true", help="Per-model tables are already loaded")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    articles = load_articles(args.snapshot, args.articles)
+    sample = np.random.default_rng(0).choice(len(articles), min(args.queries, len(articles)), replace=False)
+    models, pairs = [], []
+    for key in args.models:
+        os.environ["EMBEDDING_MODEL"] = key
+        model = embedding_model(key)
+        encoder = load_encoder(model.name)
+        encoder.encode([a["body"] for a in articles[:args.batch_size]], batch_size=args.batch_size)  # warm up
+        embeddings, elapsed = timed(encoder.encode, [a["body"] for a in articles], batch_size=args.batch_size)
+        titles = encoder.encode([articles[i]["title"] for i in sample], normalize_embeddings=True)
+        models.append({
+            "model": key,
+            "dim": model.dim,
+            "articles_per_s": len(articles) / elapsed,
+            f"exact_recall@{args.k}": exact_recall(embeddings, titles, sample, args.k),
+        })
+        for backend in args.backends:
+            pairs.append(measure_backend(backend, key, articles, embeddings, sample, args.k, not args.skip_ingest))
+
+    print_table(models, ["model", "dim", "articles_per_s", f"exact_recall@{args.k}"])
+    print()
+    print_table(pairs, ["model", "backend", "table", "storage", "p50_ms", "p95_ms", f"recall@{args.k}"])
+    write_json(args.output, {"articles": len(articles), "queries": len(sample), "models": models, "pairs": pairs})
+
+
+if __name__ == "__main__":
+    main()
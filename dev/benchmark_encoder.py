@@ -0,0 +1,80 @@
+"""Single-query latency, batch throughput and cosine parity of each encoder backend.
+
+Usage (from the repository root):
+    python dev/benchmark_encoder.py
+    python dev/benchmark_encoder.py --configs torch onnx onnx-int8 --batch-size 64 --batch-texts 1024
+"""
+import argparse
+
+import numpy as np
+
+from bench_utils import load_queries, latency_summary, timed, print_table, write_json
+from services.common.encoder import load_encoder
+
+# name -> (backend, int8)
+CONFIGS = {
+    "torch": ("torch", False),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+    "openvino": ("openvino", False),
+    "openvino-int8": ("openvino", True),
+}
+
+
+def batch_texts(queries, n: int):
+    """Article-sized texts for the throughput run, built by repeating the queries"""
+    return [" ".join(queries[(i + j) % len(queries)] for j in range(20)) for i in range(n)]
+
+
+def run(configs, queries, repeat: int, batch_size: int, n_texts: int):
+    texts = batch_texts(queries, n_texts)
+    reference = load_encoder(backend="torch", int8=False).encode(texts[:64], normalize_embeddings=True)
+
+    rows = []
+    for name in configs:
+        backend, int8 = CONFIGS[name]
+        try:
+            model = load_encoder(backend=backend, int8=int8)
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+            continue
+
+        model.encode(queries[0])  # warm up
+        samples = []
+        for _ in range(repeat):
+            for q in queries:
+                samples.append(timed(model.encode, q)[1])
+
+        _, elapsed = timed(model.encode, texts, batch_size=batch_size)
+        embeddings = model.encode(texts[:64], normalize_embeddings=True)
+        cosine = np.sum(reference * embeddings, axis=1)
+
+        summary = latency_summary(samples)
+        rows.append({
+            "encoder": name,
+            "p50_ms": summary["p50_ms"],
+            "p95_ms": summary["p95_ms"],
+            "texts_per_s": len(texts) / elapsed,
+            "min_cosine": float(cosine.min()),
+            "mean_cosine": float(cosine.mean()),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark encoder inference backends")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--queries-file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-texts", type=int, default=512, help="Texts encoded in the throughput run")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    rows = run(args.configs, load_queries(args.queries_file), args.repeat, args.batch_size, args.batch_texts)
+    print_table(rows, ["encoder", "p50_ms", "p95_ms", "texts_per_s", "min_cosine", "mean_cosine"])
+    write_json(args.output, rows)
+
+
+if __name__ == "__main__":
+    main()
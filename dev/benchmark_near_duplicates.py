@@ -0,0 +1,97 @@
+"""Corpus-size reduction from near-duplicate collapsing and its effect on retrieval.
+
+Runs the ingest-time MinHash stage (services/common/near_duplicates.py) over an embedding
+snapshot (see scripts/embedding_snapshot.py) at each threshold, in snapshot order as ingest would
+see it. For the full and each collapsed corpus it reports exact top-k search latency over the
+embedding matrix and how many top-k slots hold near-duplicates of a higher-ranked result, i.e.
+redundant context the LLM would be paying for.
+
+Usage (from the repository root):
+    python dev/benchmark_near_duplicates.py --snapshot snapshots/guardian
+    python dev/benchmark_near_duplicates.py --snapshot snapshots/guardian --thresholds 0.6 0.8 0.9 --k 10
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from bench_utils import load_queries, latency_summary, timed, print_table, write_json
+from services.common.encoder import load_encoder
+from services.common.near_duplicates import NearDuplicateIndex, minhash, article_text, similarity
+
+
+def load_snapshot(path: str):
+    articles = pq.read_table(os.path.join(path, "articles.parquet"), columns=["url", "title", "body"]).to_pylist()
+    embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return articles, embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def search(embeddings: np.ndarray, query: np.ndarray, k: int):
+    scores = embeddings @ query
+    top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def redundant_slots(results, signatures, threshold: float) -> int:
+    """Top-k slots that are near-duplicates of a higher-ranked result"""
+    return sum(
+        any(similarity(signatures[r], signatures[earlier]) >= threshold for earlier in results[:i])
+        for i, r in enumerate(results)
+    )
+
+
+def measure(label, keep, embeddings, signatures, query_vectors, k: int, threshold: float, repeat: int):
+    matrix = embeddings[keep]
+    samples, redundant = [], []
+    for _ in range(repeat):
+        for query in query_vectors:
+            top, elapsed = timed(search, matrix, query, k)
+            samples.append(elapsed)
+            redundant.append(redundant_slots([keep[i] for i in top], signatures, threshold))
+    summary = latency_summary(samples)
+    return {
+        "corpus": label,
+        "articles": len(keep),
+        "reduction": 1 - len(keep) / len(embeddings),
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        f"redundant@{k}": sum(redundant) / len(redundant),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate collapsing at ingest")
+    parser.add_argument("--snapshot", required=True, help="Embedding snapshot directory")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--queries-file")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    articles, embeddings = load_snapshot(args.snapshot)
+    signatures, elapsed = timed(lambda: [minhash(article_text(a)) for a in articles])
+    print(f"MinHash signatures for {len(articles)} articles: {elapsed * 1000 / max(1, len(articles)):.3f} ms each")
+    # Queries must be encoded by the model that produced the snapshot
+    with open(os.path.join(args.snapshot, "manifest.json")) as f:
+        model = load_encoder(json.load(f)["model"])
+    query_vectors = [v / np.linalg.norm(v) for v in model.encode(load_queries(args.queries_file))]
+
+    # Redundancy is always judged at the strictest threshold so the rows are comparable
+    judge = max(args.thresholds)
+    rows = [measure("full", list(range(len(articles))), embeddings, signatures, query_vectors, args.k, judge,
+                    args.repeat)]
+    for threshold in args.thresholds:
+        index = NearDuplicateIndex(threshold=threshold)
+        canonical, _ = index.split({**a, "row": i} for i, a in enumerate(articles))
+        rows.append(measure(f"collapsed@{threshold}", [a["row"] for a in canonical], embeddings, signatures,
+                            query_vectors, args.k, judge, args.repeat))
+    print_table(rows, ["corpus", "articles", "reduction", "p50_ms", "p95_ms", f"redundant@{args.k}"])
+    write_json(args.output, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Ingest encoding throughput (articles/sec) against the number of encoder worker processes.
+
+Each worker count runs with cores / workers threads per worker; 1 worker is the in-process baseline.
+Texts come from a snapshot (see scripts/embedding_snapshot.py) or are synthesized at article length.
+
+Usage (from the repository root):
+    python dev/benchmark_parallel_encode.py --workers 1 2 4 8
+    python dev/benchmark_parallel_encode.py --snapshot snapshots/guardian --articles 5000 --pin-cores
+"""
+import os
+import argparse
+
+import pyarrow.parquet as pq
+
+from bench_utils import DEFAULT_QUERIES, timed, print_table, write_json
+from services.common.encoder import load_encoder
+from services.common.parallel_encode import ParallelEncoder
+
+
+def load_texts(snapshot: str, n: int):
+    if snapshot:
+        bodies = pq.read_table(os.path.join(snapshot, "articles.parquet"), columns=["body"]).column("body")
+        texts = [body for body in bodies.to_pylist() if body][:n]
+        if texts:
+            return (texts * (n // len(texts) + 1))[:n]
+    # Roughly the length of a Guardian article body
+    return [" ".join(DEFAULT_QUERIES[(i + j) % len(DEFAULT_QUERIES)] for j in range(80)) for i in range(n)]
+
+
+def run(worker_counts, texts, batch_size: int, pin_cores: bool):
+    cores = os.cpu_count() or 1
+    rows = []
+    baseline = None
+    for workers in worker_counts:
+        threads = max(1, cores // workers)
+        if workers <= 1:
+            model = load_encoder()
+            model.encode(texts[:batch_size], batch_size=batch_size)  # warm up
+            _, elapsed = timed(model.encode, texts, batch_size=batch_size)
+        else:
+            with ParallelEncoder(workers, threads, pin_cores=pin_cores) as encoder:
+                encoder.encode(texts[:workers * batch_size], batch_size=batch_size)  # start workers, load models
+                _, elapsed = timed(encoder.encode, texts, batch_size=batch_size)
+
+        rate = len(texts) / elapsed
+        baseline = baseline or rate
+        rows.append({
+            "workers": workers,
+            "threads_per_worker": cores if workers <= 1 else threads,
+            "articles_per_s": rate,
+            "speedup": rate / baseline,
+        })
+        print(f"{workers} workers: {rate:.1f} articles/s")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-process ingest encoding")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--snapshot", help="Snapshot directory to take article bodies from")
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--pin-cores", action="store_true", help="Give each worker its own cores")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    rows = run(args.workers, load_texts(args.snapshot, args.articles), args.batch_size, args.pin_cores)
+    print_table(rows, ["workers", "threads_per_worker", "articles_per_s", "speedup"])
+    write_json(args.output, {"cpu_count": os.cpu_count(), "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Memory, latency and recall@k of each quantization level per backend.
+
+Usage (from the repository root, with the backend's database reachable):
+    python dev/benchmark_quantization.py --backend numpy --levels none int8 binary
+    python dev/benchmark_quantization.py --backend postgres --levels none halfvec binary --k 10
+"""
+import argparse
+
+from bench_utils import load_queries, latency_summary, timed, print_table, write_json
+from scripts.embedding_snapshot import load_dao
+from services.common.quantization import recall_at_k
+
+LEVELS = {
+    "clickhouse": ["none", "int8", "binary"],
+    "postgres": ["none", "halfvec", "binary"],
+    "numpy": ["none", "int8", "binary"],
+}
+
+
+def run(backend: str, levels, queries, k: int, repeat: int):
+    dao = load_dao(backend)
+    storage = dao.storage_stats()
+
+    # Exact results are the recall baseline
+    exact = {q: [row[0] for row in dao.related_articles(q, limit=k, quantization="none")] for q in queries}
+
+    rows = []
+    for level in levels:
+        dao.related_articles(queries[0], limit=k, quantization=level)  # warm up (builds indexes/codes)
+        samples, recalls = [], []
+        for _ in range(repeat):
+            for q in queries:
+                result, elapsed = timed(dao.related_articles, q, limit=k, quantization=level)
+                samples.append(elapsed)
+                recalls.append(recall_at_k([row[0] for row in result], exact[q]))
+        summary = latency_summary(samples)
+        rows.append({
+            "backend": backend,
+            "level": level,
+            "storage": storage.get(level),
+            "p50_ms": summary["p50_ms"],
+            "p95_ms": summary["p95_ms"],
+            f"recall@{k}": sum(recalls) / len(recalls),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized candidate search with exact re-ranking")
+    parser.add_argument("--backend", required=True, choices=list(LEVELS))
+    parser.add_argument("--levels", nargs="+", help="Defaults to every level the backend supports")
+    parser.add_argument("--queries-file")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    rows = run(args.backend, args.levels or LEVELS[args.backend], load_queries(args.queries_file), args.k, args.repeat)
+    print_table(rows, ["backend", "level", "storage", "p50_ms", "p95_ms", f"recall@{args.k}"])
+    write_json(args.output, rows)
+
+
+if __name__ == "__main__":
+    main()
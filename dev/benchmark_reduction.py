@@ -0,0 +1,79 @@
+"""Latency, storage and recall@k of reduced embedding dimensions per backend.
+
+For each target dimension a projection is fitted on the backend's stored full-dimension vectors
+(or Matryoshka truncation is used), the reduced table is loaded from those vectors and queried
+through the DAO (see scripts/reduce_embeddings.py). Recall is measured against the exact
+full-dimension top-k of the same backend.
+
+Usage (from the repository root, with the backends' databases reachable):
+    python dev/benchmark_reduction.py --backends numpy --dims 64 128 192 256
+    EMBEDDING_MODEL=mxbai-large python dev/benchmark_reduction.py --backends postgres --method truncate \\
+        --dims 256 512 --k 10
+"""
+import argparse
+
+from bench_utils import load_queries, latency_summary, timed, print_table, write_json
+from scripts.reduce_embeddings import fit, full_dao, load, reduced_dao
+from services.common.quantization import recall_at_k
+
+
+def measure(dao, label: str, dim: int, queries, exact, k: int, repeat: int):
+    dao.related_articles(queries[0], limit=k)  # warm up
+    samples, recalls = [], []
+    for _ in range(repeat):
+        for q in queries:
+            result, elapsed = timed(dao.related_articles, q, limit=k)
+            samples.append(elapsed)
+            recalls.append(recall_at_k([row[0] for row in result], exact[q]))
+    summary = latency_summary(samples)
+    return {
+        "reduction": label,
+        "dim": dim,
+        "storage": dao.storage_stats().get("none") if hasattr(dao, "storage_stats") else None,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        f"recall@{k}": sum(recalls) / len(recalls),
+    }
+
+
+def run(backend: str, method: str, dims, queries, k: int, repeat: int, sample: int, skip_load: bool):
+    dao = full_dao(backend)
+    exact = {q: [row[0] for row in dao.related_articles(q, limit=k)] for q in queries}
+    rows = [{"backend": backend, **measure(dao, "none", dao.embedding.dim, queries, exact, k, repeat)}]
+    for dim in dims:
+        version = None
+        if method == "pca" and not skip_load:
+            version = fit(backend, dim, sample).version
+        reduced = reduced_dao(backend, method, dim, version) if skip_load else load(backend, method, dim, version)
+        row = measure(reduced, reduced.embedding.version, dim, queries, exact, k, repeat)
+        if method == "pca":
+            row["explained_variance"] = reduced.embedding.projection.explained_variance
+        rows.append({"backend": backend, **row})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding dimensionality reduction")
+    parser.add_argument("--backends", nargs="+", default=["numpy"],
+                        choices=["clickhouse", "postgres", "cassandra", "numpy"])
+    parser.add_argument("--method", choices=["pca", "truncate"], default="pca")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 192, 256])
+    parser.add_argument("--sample", type=int, help="Fit each projection on the first N stored embeddings only")
+    parser.add_argument("--skip-load", action="store_true", help="Reduced tables are already loaded (latest fits)")
+    parser.add_argument("--queries-file")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries_file)
+    rows = []
+    for backend in args.backends:
+        rows.extend(run(backend, args.method, args.dims, queries, args.k, args.repeat, args.sample, args.skip_load))
+    print_table(rows, ["backend", "reduction", "dim", "storage", "explained_variance", "p50_ms", "p95_ms",
+                       f"recall@{args.k}"])
+    write_json(args.output, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Payload size and encode/decode time of the /related-articles response formats.
+
+"fastapi-json" is what the services did before: jsonable_encoder + json.dumps on the server,
+requests' .json() on the client. The others are services.common.responses (orjson, msgpack,
+Arrow IPC). Rows are synthetic with article-length bodies; with --port the same formats are
+also fetched end to end from a running database service.
+
+Usage (from the repository root):
+    python dev/benchmark_response_formats.py --limit 5 --batch 64
+    python dev/benchmark_response_formats.py --port 8004 --repeat 50
+"""
+import json
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import requests
+from fastapi.encoders import jsonable_encoder
+
+from bench_utils import DEFAULT_QUERIES, latency_summary, timed, print_table, write_json
+from services.common.responses import (
+    MEDIA_TYPES, ARROW_AVAILABLE, accept_header, encode_rows, decode_rows, encode_batch, decode_batch
+)
+
+
+def synthetic_rows(n: int, body_chars: int, offset: int = 0):
+    body = (" ".join(DEFAULT_QUERIES) + " ") * (body_chars // 300 + 1)
+    published = datetime(2025, 7, 1, tzinfo=timezone.utc)
+    return [
+        (f"https://www.theguardian.com/p/{offset + i}", f"Article {offset + i}", body[:body_chars],
+         published - timedelta(hours=i), 0.9 - i / 100)
+        for i in range(n)
+    ]
+
+
+def codecs():
+    yield "fastapi-json", lambda rows: json.dumps(jsonable_encoder(rows)).encode("utf-8"), json.loads
+    for name, media_type in MEDIA_TYPES.items():
+        if name == "arrow" and not ARROW_AVAILABLE:
+            continue
+        yield name, (lambda rows, m=media_type: encode_rows(rows, m)), (lambda body, m=media_type: decode_rows(body, m))
+
+
+def batch_codecs():
+    yield "fastapi-json", lambda groups: json.dumps(jsonable_encoder(groups)).encode("utf-8"), json.loads
+    for name, media_type in MEDIA_TYPES.items():
+        if name == "arrow" and not ARROW_AVAILABLE:
+            continue
+        yield (name, (lambda groups, m=media_type: encode_batch(groups, m)),
+               (lambda body, m=media_type: decode_batch(body, m)))
+
+
+def measure(shape: str, payload, codec_list, repeat: int):
+    rows = []
+    for name, encode, decode in codec_list:
+        encode_samples, decode_samples = [], []
+        for _ in range(repeat):
+            body, elapsed = timed(encode, payload)
+            encode_samples.append(elapsed)
+            _, elapsed = timed(decode, body)
+            decode_samples.append(elapsed)
+        rows.append({
+            "shape": shape,
+            "format": name,
+            "bytes": len(body),
+            "encode_p50_ms": latency_summary(encode_samples)["p50_ms"],
+            "decode_p50_ms": latency_summary(decode_samples)["p50_ms"],
+        })
+    return rows
+
+
+def measure_live(port: int, query: str, repeat: int):
+    url = f"http://localhost:{port}/related-articles"
+    rows = []
+    for name in MEDIA_TYPES:
+        samples = []
+        for _ in range(repeat):
+            def fetch():
+                response = requests.get(url, params={"query": query}, headers={"Accept": accept_header(name)})
+                response.raise_for_status()
+                return response, decode_rows(response.content, response.headers.get("content-type"))
+            (response, _), elapsed = timed(fetch)
+            samples.append(elapsed)
+        rows.append({
+            "shape": f"live:{port}",
+            "format": f"{name} -> {response.headers.get('content-type')}",
+            "bytes": len(response.content),
+            "request_p50_ms": latency_summary(samples)["p50_ms"],
+            "request_p95_ms": latency_summary(samples)["p95_ms"],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /related-articles response formats")
+    parser.add_argument("--limit", type=int, default=5, help="Rows per query")
+    parser.add_argument("--batch", type=int, default=64, help="Queries in the batch payload")
+    parser.add_argument("--body-chars", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--port", type=int, help="Also fetch from a running database service on this port")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    single = synthetic_rows(args.limit, args.body_chars)
+    groups = [synthetic_rows(args.limit, args.body_chars, q * args.limit) for q in range(args.batch)]
+    rows = measure(f"{args.limit} rows", single, list(codecs()), args.repeat)
+    rows += measure(f"{args.batch}x{args.limit} batch", groups, list(batch_codecs()), max(1, args.repeat // 10))
+    print_table(rows, ["shape", "format", "bytes", "encode_p50_ms", "decode_p50_ms"])
+
+    live = measure_live(args.port, DEFAULT_QUERIES[0], args.repeat) if args.port else []
+    if live:
+        print()
+        print_table(live, ["shape", "format", "bytes", "request_p50_ms", "request_p95_ms"])
+    write_json(args.output, {"body_chars": args.body_chars, "results": rows, "live": live})
+
+
+if __name__ == "__main__":
+    main()
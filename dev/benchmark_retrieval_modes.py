@@ -0,0 +1,87 @@
+"""Retrieval latency per backend over HTTP (remote) and by calling the DAO in-process.
+
+Both modes go through llm_utils.retrievers, as the LangChain pipeline does. The in-process rows
+also report the DAO's own encode + search time (its last_stages, where it keeps them), so "overhead_ms" is what each
+mode adds on top of the search itself: serialization and the HTTP hop for remote, only the call
+for in-process. Remote rows include how many calls were hedged and the tail latency the hedges
+recovered (see llm_utils/retrieval_policy.py). The in-process DAO needs the backend's client library and connection settings.
+
+Usage (from the repository root, with the database services and their databases reachable):
+    python dev/benchmark_retrieval_modes.py --databases numpy postgres --repeat 20
+    python dev/benchmark_retrieval_modes.py --databases clickhouse --batch --output modes.json
+"""
+import os
+import sys
+import argparse
+from typing import Optional
+
+from bench_utils import ROOT, load_queries, latency_summary, timed, print_table, write_json
+
+sys.path.insert(0, os.path.join(ROOT, "llm"))
+from llm_utils.retrievers import database_names, retriever
+
+
+def dao_ms(client) -> Optional[float]:
+    stages = getattr(client.dao, "last_stages", None)
+    if stages is None:
+        return None
+    return sum(stages.get(stage) or 0 for stage in ("encode_ms", "search_ms", "rerank_ms"))
+
+
+def run(database: str, mode: str, queries, repeat: int, batch: bool):
+    client = retriever(database, mode)
+    client.related(queries[0])  # warm up (connects, loads the encoder)
+    samples, search = [], []
+    for _ in range(repeat):
+        if batch:
+            _, elapsed = timed(client.related_batch, queries)
+            samples.append(elapsed)
+            continue
+        for q in queries:
+            _, elapsed = timed(client.related, q)
+            samples.append(elapsed)
+            if mode == "in-process" and dao_ms(client) is not None:
+                search.append(dao_ms(client))
+    summary = latency_summary(samples)
+    policy = client.policy.as_dict()
+    return {
+        "database": database,
+        "mode": mode,
+        "shape": "batch" if batch else "single",
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "dao_ms": sum(search) / len(search) if search else None,
+        # Cumulative for the retriever; hedging only applies to remote single-question calls
+        "hedged": policy["hedged"],
+        "recovered_ms": policy["recovered_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark remote vs in-process retrieval")
+    parser.add_argument("--databases", nargs="+", default=["numpy"], choices=database_names())
+    parser.add_argument("--modes", nargs="+", default=["remote", "in-process"], choices=["remote", "in-process"])
+    parser.add_argument("--queries-file")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--batch", action="store_true", help="Also time one batch retrieval of every query")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries_file)
+    rows = []
+    for database in args.databases:
+        measured = [run(database, mode, queries, args.repeat, False) for mode in args.modes]
+        # The DAO's search time is the same work in both modes, so it is the baseline for each
+        search = next((row["dao_ms"] for row in measured if row["dao_ms"] is not None), None)
+        for row in measured:
+            row["overhead_ms"] = row["p50_ms"] - search if search is not None else None
+        rows.extend(measured)
+        if args.batch:
+            rows.extend(run(database, mode, queries, args.repeat, True) for mode in args.modes)
+    print_table(rows, ["database", "mode", "shape", "p50_ms", "p95_ms", "dao_ms", "overhead_ms", "hedged",
+                       "recovered_ms"])
+    write_json(args.output, rows)
+
+
+if __name__ == "__main__":
+    main()
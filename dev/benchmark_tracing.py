@@ -0,0 +1,98 @@
+"""Per-question overhead of tracing the RAG graph: off, local file export and LangSmith, by sample rate
+and field truncation.
+
+Questions run through RAGApplication.answer_question with a synthetic, pre-fetched context of
+article-length documents and USE_LLM off, so no database or LLM is involved and the difference
+between configurations is the tracing itself. File mode also reports trace bytes per question.
+
+Usage (from the repository root):
+    python dev/benchmark_tracing.py --questions 500
+    python dev/benchmark_tracing.py --rates 1 0.1 0.01 --max-chars 0 1000 --langsmith   # needs LANGSMITH_API_KEY
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+from bench_utils import ROOT, DEFAULT_QUERIES, latency_summary, timed, print_table, write_json
+
+sys.path.insert(0, os.path.join(ROOT, "llm"))
+os.environ.setdefault("ANTHROPIC_API_KEY", "unused")  # the client is built but never called
+os.environ["USE_LLM"] = "false"
+os.environ["USE_POST"] = "false"
+
+from langchain.schema import Document
+from llm_utils.langchain_pipeline import RAGApplication
+from llm_utils.tracing import Tracing
+
+
+def synthetic_context(articles: int, body_chars: int):
+    body = (" ".join(DEFAULT_QUERIES) + " ") * (body_chars // 300 + 1)
+    return [
+        Document(page_content=body[:body_chars],
+                 metadata={"url": f"https://gu.com/p/{i}", "title": f"Article {i}",
+                           "publication_date": "2025-07-01T00:00:00Z", "similarity_score": 0.5})
+        for i in range(articles)
+    ]
+
+
+def configurations(rates, max_chars, langsmith: bool):
+    yield "off", 0.0, 0
+    modes = ["file"] + (["langsmith"] if langsmith else [])
+    for mode in modes:
+        for rate in rates:
+            for chars in max_chars:
+                yield mode, rate, chars
+
+
+def run(app, questions, context, rates, max_chars, langsmith: bool, trace_dir: str):
+    app.tracing = Tracing(mode="off")
+    app.answer_question(questions[0], "numpy", context)  # warm up
+    rows = []
+    for mode, rate, chars in configurations(rates, max_chars, langsmith):
+        path = os.path.join(trace_dir, f"{mode}-{rate}-{chars}.jsonl")
+        app.tracing = Tracing(mode=mode, sample_rate=rate, max_chars=chars, path=path)
+        samples = []
+        for question in questions:
+            _, elapsed = timed(app.answer_question, question, "numpy", context)
+            samples.append(elapsed)
+        flush = getattr(app.tracing.client, "flush", None)
+        _, flush_s = timed(flush) if flush else (None, None)
+
+        trace_bytes = os.path.getsize(path) if mode == "file" and os.path.exists(path) else None
+        rows.append({
+            "mode": mode,
+            "sample_rate": rate,
+            "max_field_chars": chars,
+            "traced": app.tracing.sampled,
+            **latency_summary(samples),
+            "trace_bytes_per_question": trace_bytes / len(questions) if trace_bytes is not None else None,
+            "langsmith_flush_s": flush_s,
+        })
+        print(f"{mode} rate={rate} max_chars={chars}: p50 {rows[-1]['p50_ms']:.2f} ms")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tracing overhead per question")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--articles", type=int, default=5, help="Documents in each question's context")
+    parser.add_argument("--body-chars", type=int, default=6000, help="Characters per article body")
+    parser.add_argument("--rates", nargs="+", type=float, default=[1.0, 0.1])
+    parser.add_argument("--max-chars", nargs="+", type=int, default=[0, 1000], help="0 keeps fields whole")
+    parser.add_argument("--langsmith", action="store_true", help="Also trace to LangSmith")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    questions = [DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)] for i in range(args.questions)]
+    context = synthetic_context(args.articles, args.body_chars)
+    app = RAGApplication(name="tracing-benchmark")
+    with tempfile.TemporaryDirectory() as trace_dir:
+        rows = run(app, questions, context, args.rates, args.max_chars, args.langsmith, trace_dir)
+    print_table(rows, ["mode", "sample_rate", "max_field_chars", "traced", "p50_ms", "p95_ms", "p99_ms",
+                       "trace_bytes_per_question", "langsmith_flush_s"])
+    write_json(args.output, {"articles": args.articles, "body_chars": args.body_chars, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,25 @@
-import asyncio
 import threading
 import uvicorn
 import streamlit as st
 import logging
 import json
-import time
 from datetime import datetime
 from llm_utils.langchain_pipeline import Database
 from llm_utils.langchain_controller import LangchainController, BatchQuestionRequest, MultiBatchRequest
+from llm_utils.gui_runner import BackgroundLoop, BatchJob
 
 
 LOGO_URL = "https://cdn.brandfetch.io/idEaoqZ5uv/w/400/h/400/theme/dark/icon.png?c=1dxbfHSJFAPEGdCLU4o5B"
 LOADING_URL = "https://cdn.pixabay.com/animation/2025/04/08/09/08/09-08-31-655_512.gif"
-DURATION_METRICS_URL = "http://localhost:3000/d-solo/90ced2bd-5ea8-42c5-b87b-be9e1a8cdb4c/db-metrics-visualization?orgId=1&from=1753395832378&to=1753417432378&timezone=browser&panelId=1&__feature.dashboardSceneSolo=true"
-TOKEN_METRICS_URL = "http://localhost:3000/d-solo/90ced2bd-5ea8-42c5-b87b-be9e1a8cdb4c/db-metrics-visualization?orgId=1&from=1753645594350&to=1753667194350&timezone=browser&panelId=2&__feature.dashboardSceneSolo=true"
-METRICS_BY_DB_URL = "http://localhost:3000/d-solo/90ced2bd-5ea8-42c5-b87b-be9e1a8cdb4c/db-metrics-visualization?orgId=1&from=1753645594350&to=1753667194350&timezone=browser&panelId=3&__feature.dashboardSceneSolo=true"
+GRAFANA_PANEL_URL = "http://localhost:3000/d-solo/90ced2bd-5ea8-42c5-b87b-be9e1a8cdb4c/db-metrics-visualization?orgId=1&from={time_from}&to=now&timezone=browser&refresh=30s&panelId={panel_id}&__feature.dashboardSceneSolo=true"
+# Panel ids in services/streamlit/provisioner/dashboard.json
+DURATION_METRICS_PANEL = 1
+TOKEN_METRICS_PANEL = 2
+METRICS_BY_DB_PANEL = 3
+LATENCY_PERCENTILE_PANELS = {"p50": 4, "p95": 5, "p99": 6}
+ANSWER_P95_PANEL = 7
+METRICS_TIME_RANGES = {"Last hour": "now-1h", "Last 6 hours": "now-6h", "Last 24 hours": "now-24h",
+                       "Last 7 days": "now-7d"}
 
 # Database options - customize these based on your available databases
 DATABASE_OPTIONS = [
@@ -270,8 +275,86 @@ button[data-baseweb="tab"][aria-selected="true"] {{
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize controller
-controller = LangchainController()
+# Initialize controller and the background event loop once per server
+@st.cache_resource
+def get_controller():
+    """One controller (and RAG pipeline) per Streamlit server, reused across reruns and sessions"""
+    return LangchainController()
+
+
+@st.cache_resource
+def get_event_loop():
+    """Persistent background event loop that batches are submitted to"""
+    return BackgroundLoop()
+
+
+controller = get_controller()
+event_loop = get_event_loop()
+
+if "jobs" not in st.session_state:
+    st.session_state.jobs = {}
+
+
+def start_job(key, total, make_coro, input_data):
+    """Submit a batch to the background loop; a previous job under the same key is cancelled"""
+    previous = st.session_state.jobs.get(key)
+    if previous and previous.running:
+        previous.cancel()
+    st.session_state.jobs[key] = BatchJob(event_loop, total, make_coro, input_data)
+
+
+@st.fragment(run_every=1)
+def job_progress(key, label):
+    """Live progress and a cancel button; reruns the page once the job has finished"""
+    job = st.session_state.jobs[key]
+    if not job.running:
+        st.rerun()
+    st.markdown(f'''
+        <div id="loading" style="display:flex; flex-direction: column; justify-content:center; align-items: center; margin: 20px 0;">
+            <img src="{LOADING_URL}" width="300" style="border-radius: 12px;"/>
+            <div class="label">RAGuardian is thinking...</div>
+        </div>
+    ''', unsafe_allow_html=True)
+    st.progress(job.progress, text=f"{label}: {job.completed}/{job.total} answered in {job.duration:.1f}s")
+    if st.button("Cancel", key=f"cancel_{key}"):
+        job.cancel()
+        st.rerun()
+
+
+def finished_job(key, operation_type):
+    """The finished job under key as (job, result, error), logging it once; None while running or absent"""
+    job = st.session_state.jobs.get(key)
+    if job is None:
+        return None
+    if job.running:
+        job_progress(key, operation_type)
+        return None
+    result, error = job.outcome()
+    if not job.logged:
+        job.logged = True
+        if error is None:
+            log_api_call(operation_type, job.input_data, result, duration=job.duration)
+            if show_debug:
+                st.sidebar.json({
+                    "Input": job.input_data,
+                    "Duration": f"{job.duration:.2f}s",
+                    "Success": True
+                })
+        else:
+            log_api_call(operation_type, job.input_data, error=error, duration=job.duration)
+    return job, result, error
+
+
+def render_error(error):
+    st.markdown(f'''
+        <div class="error-message">
+            <strong>Error:</strong> {str(error)}
+        </div>
+    ''', unsafe_allow_html=True)
+
+
+def render_cancelled(job):
+    st.warning(f"Cancelled after {job.completed}/{job.total} answers ({job.duration:.2f}s).")
 
 
 # def run_api():
@@ -337,14 +420,6 @@ with tab1:
                 "database": final_db,
                 "query_length": len(user_input)
             })
-            
-            placeholder = st.empty()
-            placeholder.markdown(f'''
-                <div id="loading" style="display:flex; flex-direction: column; justify-content:center; align-items: center; margin: 20px 0;">
-                    <img src="{LOADING_URL}" width="300" style="border-radius: 12px;"/>
-                    <div class="label">RAGuardian is thinking...</div>
-                </div>
-            ''', unsafe_allow_html=True)
 
             # Prepare input data for logging
             input_data = {
@@ -352,68 +427,51 @@ with tab1:
                 "database": final_db,
                 "method": "answer_question"
             }
-            
-            start_time = time.time()
-            try:
-                
-                # Pass final_db as the database parameter
-                result = asyncio.run(controller.answer_question_batch(BatchQuestionRequest(query=user_input, database=final_db, batch_size=1, max_workers=1, run_id="test-run-1")))
-
-                duration = time.time() - start_time
-                
-                # Log successful API call
-                log_api_call("Single Query", input_data, result, duration=duration)
-                
-                if show_debug:
-                    st.sidebar.json({
-                        "Input": input_data,
-                        "Duration": f"{duration:.2f}s",
-                        "Success": True
-                    })
-
-                response = result
-                time_taken = response.get('total_duration')
-                answer = response.get("answers")[0].get("answer", "")
-                context = response.get("answers")[0].get("context", [])
-
-                placeholder.markdown(f'''
-                    <div class="chat-container answer-fadein" style="opacity:0;">
-                        <img src="{LOGO_URL}" class="guardian-logo" alt="Guardian Logo">
-                        <div class="result-bubble">
-                            {answer}
-                        </div>
-                    </div>
-                    <div class="label answer-fadein">Database: {final_db}</div>
-                    <div class="label answer-fadein">Articles Used: {len(context)}</div>
-                    <div class="label answer-fadein">Time Taken: {time_taken:.2f} seconds</div>
-                ''', unsafe_allow_html=True)
-
-                context_html = """
-                <div class="context-box">
-                    <div class="label">Context</div>
-                    <br />
-                """
-                for article in context:
-                    title = article.get("title", "Untitled")
-                    url = article.get("url", "#")
-                    context_html += f'<a class="context-link" href="{url}" target="_blank">{title}</a>'
 
-                context_html += "</div>"
-                st.markdown(context_html, unsafe_allow_html=True)
-                
-            except Exception as e:
-                duration = time.time() - start_time
-                log_api_call("Single Query", input_data, error=e, duration=duration)
-                
-                placeholder.markdown(f'''
-                    <div class="error-message">
-                        <strong>Error:</strong> {str(e)}
-                    </div>
-                ''', unsafe_allow_html=True)
+            # Pass final_db as the database parameter
+            request = BatchQuestionRequest(query=user_input, database=final_db, batch_size=1, max_workers=1, run_id="test-run-1")
+            start_job("single", 1, lambda on_result: controller.answer_question_batch(request, on_result), input_data)
         else:
             log_user_interaction("single_query_empty_input", {"attempted_database": final_db})
             st.warning("Enter something before running.")
 
+    finished = finished_job("single", "Single Query")
+    if finished:
+        job, response, error = finished
+        if job.cancelled:
+            render_cancelled(job)
+        elif error is not None:
+            render_error(error)
+        else:
+            time_taken = response.get('total_duration')
+            answer = response.get("answers")[0].get("answer", "")
+            context = response.get("answers")[0].get("context", [])
+
+            st.markdown(f'''
+                <div class="chat-container answer-fadein" style="opacity:0;">
+                    <img src="{LOGO_URL}" class="guardian-logo" alt="Guardian Logo">
+                    <div class="result-bubble">
+                        {answer}
+                    </div>
+                </div>
+                <div class="label answer-fadein">Database: {job.input_data["database"]}</div>
+                <div class="label answer-fadein">Articles Used: {len(context)}</div>
+                <div class="label answer-fadein">Time Taken: {time_taken:.2f} seconds</div>
+            ''', unsafe_allow_html=True)
+
+            context_html = """
+            <div class="context-box">
+                <div class="label">Context</div>
+                <br />
+            """
+            for article in context:
+                title = article.get("title", "Untitled")
+                url = article.get("url", "#")
+                context_html += f'<a class="context-link" href="{url}" target="_blank">{title}</a>'
+
+            context_html += "</div>"
+            st.markdown(context_html, unsafe_allow_html=True)
+
 with tab2:
     config_col1, config_col2, config_col3, config_col4 = st.columns(4)
     with config_col1:
@@ -458,14 +516,6 @@ with tab2:
                 "run_id": run_id,
                 "database": final_batch_db
             })
-            
-            placeholder = st.empty()
-            placeholder.markdown(f'''
-                <div id="loading" style="display:flex; flex-direction: column; justify-content:center; align-items: center; margin: 20px 0;">
-                    <img src="{LOADING_URL}" width="300" style="border-radius: 12px;"/>
-                    <div class="label">RAGuardian is thinking...</div>
-                </div>
-            ''', unsafe_allow_html=True)
 
             request = BatchQuestionRequest(
                 query=query,
@@ -477,62 +527,7 @@ with tab2:
             
             # Log the request object
             request_dict = request.dict()
-
-            start_time = time.time()
-            try:
-                
-                result = asyncio.run(controller.answer_question_batch(request))
-                
-                duration = time.time() - start_time
-                log_api_call("Batch Query", request_dict, result, duration=duration)
-                
-                if show_debug:
-                    st.sidebar.json({
-                        "Request": request_dict,
-                        "Duration": f"{duration:.2f}s",
-                        "Success": True
-                    })
- 
-                placeholder.empty()
-
-                answers = result.get("answers", [])
-                total_duration = result.get("total_duration", 0)
-                st.markdown(f'''
-                    <div class="label answer-fadein">Database: {final_batch_db}</div>
-                    <div class="label answer-fadein">Batch Size: {batch_size}</div>
-                    <div class="label answer-fadein">Time Taken: {total_duration:.2f} seconds</div>
-                ''', unsafe_allow_html=True)
-
-                for i, answer in enumerate(answers):
-                    context = answer.get("context", [])
-                    answer_text = answer.get("answer", "")
-                    st.markdown(f'''
-                        <div class="chat-container answer-fadein" style="opacity:0;">
-                            <img src="{LOGO_URL}" class="guardian-logo" alt="Guardian Logo">
-                            <div class="result-bubble">
-                                <b>Sample Answer {i+1}</b><br>{answer_text}
-                            </div>
-                        </div>
-                        <div class="label answer-fadein">Articles Used: {len(context)}</div>
-                    ''', unsafe_allow_html=True)
-
-                    context_html = f'<div class="context-box"><div class="label">Context {i+1}</div><br>'
-                    for article in context:
-                        title = article.get("title", "Untitled")
-                        url = article.get("url", "#")
-                        context_html += f'<a class="context-link" href="{url}" target="_blank">{title}</a>'
-                    context_html += '</div>'
-                    st.markdown(context_html, unsafe_allow_html=True)
-                    
-            except Exception as e:
-                duration = time.time() - start_time
-                log_api_call("Batch Query", request_dict, error=e, duration=duration)
-                
-                placeholder.markdown(f'''
-                    <div class="error-message">
-                        <strong>Error:</strong> {str(e)}
-                    </div>
-                ''', unsafe_allow_html=True)
+            start_job("batch", batch_size, lambda on_result: controller.answer_question_batch(request, on_result), request_dict)
         else:
             log_user_interaction("batch_query_empty_input", {"attempted_config": {
                 "batch_size": batch_size,
@@ -541,6 +536,43 @@ with tab2:
             }})
             st.warning("Enter something before running.")
 
+    finished = finished_job("batch", "Batch Query")
+    if finished:
+        job, result, error = finished
+        if job.cancelled:
+            render_cancelled(job)
+        elif error is not None:
+            render_error(error)
+        else:
+            answers = result.get("answers", [])
+            total_duration = result.get("total_duration", 0)
+            st.markdown(f'''
+                <div class="label answer-fadein">Database: {job.input_data["database"]}</div>
+                <div class="label answer-fadein">Batch Size: {job.input_data["batch_size"]}</div>
+                <div class="label answer-fadein">Time Taken: {total_duration:.2f} seconds</div>
+            ''', unsafe_allow_html=True)
+
+            for i, answer in enumerate(answers):
+                context = answer.get("context", [])
+                answer_text = answer.get("answer", "")
+                st.markdown(f'''
+                    <div class="chat-container answer-fadein" style="opacity:0;">
+                        <img src="{LOGO_URL}" class="guardian-logo" alt="Guardian Logo">
+                        <div class="result-bubble">
+                            <b>Sample Answer {i+1}</b><br>{answer_text}
+                        </div>
+                    </div>
+                    <div class="label answer-fadein">Articles Used: {len(context)}</div>
+                ''', unsafe_allow_html=True)
+
+                context_html = f'<div class="context-box"><div class="label">Context {i+1}</div><br>'
+                for article in context:
+                    title = article.get("title", "Untitled")
+                    url = article.get("url", "#")
+                    context_html += f'<a class="context-link" href="{url}" target="_blank">{title}</a>'
+                context_html += '</div>'
+                st.markdown(context_html, unsafe_allow_html=True)
+
 with tab3:
     config_col1, config_col2, config_col3 = st.columns(3)
     with config_col1:
@@ -581,14 +613,6 @@ with tab3:
                 "run_id": run_id_multi,
                 "database": final_multi_db
             })
-            
-            placeholder = st.empty()
-            placeholder.markdown(f'''
-                <div id="loading" style="display:flex; flex-direction: column; justify-content:center; align-items: center; margin: 20px 0;">
-                    <img src="{LOADING_URL}" width="300" style="border-radius: 12px;"/>
-                    <div class="label">RAGuardian is thinking...</div>
-                </div>
-            ''', unsafe_allow_html=True)
 
             request = MultiBatchRequest(
                 queries=queries,
@@ -599,66 +623,7 @@ with tab3:
             
             # Log the request object
             request_dict = request.model_dump()
-
-            start_time = time.time()
-            try:
-                
-                result = asyncio.run(controller.answer_questions_multi_batch(request))
-                
-                duration = time.time() - start_time
-                log_api_call("Multi-Batch Query", request_dict, result, duration=duration)
-                
-                if show_debug:
-                    st.sidebar.json({
-                        "Request": request_dict,
-                        "Duration": f"{duration:.2f}s",
-                        "Success": True
-                    })
-
-                placeholder.empty()
-
-                answers = result.get("results", [])
-                total_duration = result.get("total_duration", 0)
-
-                st.markdown(f'''
-                    <div class="label answer-fadein">Database: {final_multi_db}</div>
-                    <div class="label answer-fadein">Queries: {len(queries)}</div>
-                    <div class="label answer-fadein">Time Taken: {total_duration:.2f} seconds</div>
-                ''', unsafe_allow_html=True)
-
-                for i, item in enumerate(answers):
-                    query_text = item.get("query", "")
-                    answer_data = item.get("answer", {})
-                    answer_text = answer_data.get("answer", "")
-                    context = answer_data.get("context", [])
-
-                    st.markdown(f'''
-                        <div class="chat-container answer-fadein" style="opacity:0;">
-                            <img src="{LOGO_URL}" class="guardian-logo" alt="Guardian Logo">
-                            <div class="result-bubble">
-                                <b>Q{i+1}: {query_text}</b><br>{answer_text}
-                            </div>
-                        </div>
-                        <div class="label answer-fadein">Articles Used: {len(context)}</div>
-                    ''', unsafe_allow_html=True)
-
-                    context_html = f'<div class="context-box"><div class="label">Context {i + 1}</div><br>'
-                    for article in context:
-                        title = article.get("title", "Untitled")
-                        url = article.get("url", "#")
-                        context_html += f'<a class="context-link" href="{url}" target="_blank">{title}</a>'
-                    context_html += '</div>'
-                    st.markdown(context_html, unsafe_allow_html=True)
-                    
-            except Exception as e:
-                duration = time.time() - start_time
-                log_api_call("Multi-Batch Query", request_dict, error=e, duration=duration)
-                
-                placeholder.markdown(f'''
-                    <div class="error-message">
-                        <strong>Error:</strong> {str(e)}
-                    </div>
-                ''', unsafe_allow_html=True)
+            start_job("multi", len(queries), lambda on_result: controller.answer_questions_multi_batch(request, on_result), request_dict)
         else:
             log_user_interaction("multi_query_empty_input", {"attempted_config": {
                 "max_workers": max_workers_multi,
@@ -667,21 +632,69 @@ with tab3:
             }})
             st.warning("Please enter at least one valid query.")
 
+    finished = finished_job("multi", "Multi-Batch Query")
+    if finished:
+        job, result, error = finished
+        if job.cancelled:
+            render_cancelled(job)
+        elif error is not None:
+            render_error(error)
+        else:
+            answers = result.get("results", [])
+            total_duration = result.get("total_duration", 0)
+
+            st.markdown(f'''
+                <div class="label answer-fadein">Database: {job.input_data["database"]}</div>
+                <div class="label answer-fadein">Queries: {len(job.input_data["queries"])}</div>
+                <div class="label answer-fadein">Time Taken: {total_duration:.2f} seconds</div>
+            ''', unsafe_allow_html=True)
+
+            for i, item in enumerate(answers):
+                query_text = item.get("query", "")
+                answer_data = item.get("answer", {})
+                answer_text = answer_data.get("answer", "")
+                context = answer_data.get("context", [])
+
+                st.markdown(f'''
+                    <div class="chat-container answer-fadein" style="opacity:0;">
+                        <img src="{LOGO_URL}" class="guardian-logo" alt="Guardian Logo">
+                        <div class="result-bubble">
+                            <b>Q{i+1}: {query_text}</b><br>{answer_text}
+                        </div>
+                    </div>
+                    <div class="label answer-fadein">Articles Used: {len(context)}</div>
+                ''', unsafe_allow_html=True)
+
+                context_html = f'<div class="context-box"><div class="label">Context {i + 1}</div><br>'
+                for article in context:
+                    title = article.get("title", "Untitled")
+                    url = article.get("url", "#")
+                    context_html += f'<a class="context-link" href="{url}" target="_blank">{title}</a>'
+                context_html += '</div>'
+                st.markdown(context_html, unsafe_allow_html=True)
+
+
+def grafana_panel(panel_id, time_from, height=600):
+    url = GRAFANA_PANEL_URL.format(panel_id=panel_id, time_from=time_from)
+    st.components.v1.html(f'<iframe src="{url}" width="1000" height="{height}" frameborder="0"></iframe>',
+                          height=height)
+
 
 with tab4:
-    tab4a, tab4b, tab4c = st.tabs(["Duration Metrics", "Token Metrics", "Metrics by DB"])
+    time_range = st.selectbox("Time range", list(METRICS_TIME_RANGES), index=1)
+    time_from = METRICS_TIME_RANGES[time_range]
+    tab4a, tab4b, tab4c, tab4d = st.tabs(["Latency Percentiles", "Duration Metrics", "Token Metrics", "Metrics by DB"])
 
     with tab4a:
-        st.components.v1.html(
-            f'<iframe src="{DURATION_METRICS_URL}" width="1000" height="600" frameborder="0"></iframe>',
-            height=600)
+        percentile = st.radio("Retrieval percentile", list(LATENCY_PERCENTILE_PANELS), index=1, horizontal=True)
+        grafana_panel(LATENCY_PERCENTILE_PANELS[percentile], time_from, height=400)
+        grafana_panel(ANSWER_P95_PANEL, time_from, height=400)
 
     with tab4b:
-        st.components.v1.html(
-            f'<iframe src="{TOKEN_METRICS_URL}" width="1000" height="600" frameborder="0"></iframe>',
-            height=600)
+        grafana_panel(DURATION_METRICS_PANEL, time_from)
 
     with tab4c:
-        st.components.v1.html(
-            f'<iframe src="{METRICS_BY_DB_URL}" width="1000" height="600" frameborder="0"></iframe>',
-            height=600)
\ No newline at end of file
+        grafana_panel(TOKEN_METRICS_PANEL, time_from)
+
+    with tab4d:
+        grafana_panel(METRICS_BY_DB_PANEL, time_from)
\ No newline at end of file
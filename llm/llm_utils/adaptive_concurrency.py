@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+import statistics
+from collections import deque
+from typing import Dict, Any, Optional
+
+ADAPTIVE_MAX_CONCURRENCY = int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", 64))
+ADAPTIVE_TARGET_P95_MS = float(os.getenv("ADAPTIVE_TARGET_P95_MS", 5000))
+
+# Last settled limit per database, reported by the controller
+SETTLED: Dict[str, Dict[str, Any]] = {}
+
+
+def p95(samples) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one while p95 latency stays under target and shrinks
+    multiplicatively when it does not (additive increase, multiplicative decrease).
+
+    Latency is judged over a window of the most recent completions. The limit only grows when
+    the previous limit was actually reached, so an under-loaded run does not drift upward.
+    """
+
+    def __init__(self, initial: int = 2, target_p95: float = ADAPTIVE_TARGET_P95_MS / 1000,
+                 min_limit: int = 1, max_limit: int = ADAPTIVE_MAX_CONCURRENCY, backoff: float = 0.7,
+                 window: int = 20):
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.target_p95 = target_p95
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.window = window
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.samples = deque(maxlen=window)
+        self.since_adjustment = 0
+        self.completed = 0
+        self.errors = 0
+        self.started = time.time()
+        self.history = [(0.0, self.limit)]
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def record(self, latency: float, ok: bool = True):
+        """Add one completed request and adjust the limit once per window"""
+        self.samples.append(latency)
+        self.completed += 1
+        self.errors += 0 if ok else 1
+        self.since_adjustment += 1
+        if not ok:
+            self.decrease()
+            return
+        # Wait for a window of samples taken at the current limit before judging it
+        if self.since_adjustment < min(self.window, max(self.limit, 5)):
+            return
+        observed = p95(self.samples)
+        if observed > self.target_p95:
+            self.decrease()
+        elif self.peak_in_flight >= self.limit and self.limit < self.max_limit:
+            self.set_limit(self.limit + 1)
+        else:
+            self.since_adjustment = 0
+
+    def decrease(self):
+        self.set_limit(max(self.min_limit, int(self.limit * self.backoff)))
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self.since_adjustment = 0
+        self.peak_in_flight = self.in_flight
+        self.samples.clear()
+        self.history.append((time.time() - self.started, limit))
+
+    def settled(self) -> float:
+        """Time-weighted mean limit over the second half of the run, where it has found its level"""
+        now = time.time() - self.started
+        half = now / 2
+        points = self.history + [(now, self.limit)]
+        weighted = total = 0.0
+        for (t0, limit), (t1, _) in zip(points, points[1:]):
+            start = max(t0, half)
+            if t1 > start:
+                weighted += limit * (t1 - start)
+                total += t1 - start
+        return weighted / total if total else float(self.limit)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.started
+        return {
+            "final_limit": self.limit,
+            "settled_limit": round(self.settled(), 2),
+            "max_limit_reached": max(limit for _, limit in self.history),
+            "target_p95_ms": self.target_p95 * 1000,
+            "last_window_p95_ms": p95(self.samples) * 1000 if self.samples else None,
+            "mean_latency_ms": statistics.mean(self.samples) * 1000 if self.samples else None,
+            "completed": self.completed,
+            "errors": self.errors,
+            "throughput_per_s": self.completed / elapsed if elapsed else 0,
+            "adjustments": len(self.history) - 1,
+            "history": [{"t": round(t, 3), "limit": limit} for t, limit in self.history],
+        }
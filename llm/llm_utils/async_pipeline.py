@@ -1,46 +1,112 @@
 import asyncio
 import time
-import sys
-import os
-from typing import List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Optional, Callable
 from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.config import RunnableConfig
 
-# Add the llm directory to the Python path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from langchain_pipeline import RAGApplication
+from llm_utils.langchain_pipeline import RAGApplication, to_documents
+from llm_utils.retrievers import retriever
+from llm_utils.adaptive_concurrency import AIMDLimiter, ADAPTIVE_MAX_CONCURRENCY, SETTLED
+from llm_utils.tracing import untraced
 
 class AsyncPipeline:
-    def __init__(self, max_concurrency: int = 8, run_name: str = "batch_demo", database: str = "clickhouse"):
-        self.app = RAGApplication(name="")
+    def __init__(self, max_concurrency: int = 8, run_name: str = "batch_demo", database: str = "clickhouse",
+                 app: Optional[RAGApplication] = None, adaptive: bool = False, target_p95_ms: Optional[float] = None):
+        """With adaptive=True, max_concurrency is only the starting point: an AIMD limiter raises or lowers
+        the number of questions in flight to keep p95 latency under target_p95_ms."""
+        # Reusing the caller's RAGApplication skips rebuilding the LLM client and graph per batch
+        self.app = app or RAGApplication(name="")
         self.max_concurrency = max_concurrency
         self.run_name = run_name
         self.tags = [database]
         self.database = database 
         self.run_time = time.time()
+        self.adaptive = adaptive
+        self.target_p95_ms = target_p95_ms
+        self.limiter: Optional[AIMDLimiter] = None
         self.config = RunnableConfig(
             max_concurrency=self.max_concurrency,
             run_name=self.run_name,
             tags=self.tags,
             metadata={"batch_size": self.max_concurrency}
         )
-        self.async_runnable = RunnableLambda(lambda d: self.app.answer_question(d["question"], d["database"]))
+        self.async_runnable = RunnableLambda(
+            lambda d: self.app.answer_question(d["question"], d["database"], d.get("context"), self.run_name)
+        )
+
+    def fetch_contexts(self, questions: List[str]) -> List[Optional[list]]:
+        """Retrieve every question's articles through the batch endpoint, or None to retrieve per question"""
+        try:
+            return [to_documents(rows) for rows in retriever(self.database).related_batch(questions)]
+        except Exception as e:
+            print(f"Batch retrieval failed, falling back to per-question retrieval: {e}")
+            return [None] * len(questions)
 
-    async def run_batch(self, questions: List[str]) -> List[Any]:
+    async def run_batch(self, questions: List[str], on_result: Optional[Callable[[int, Any], None]] = None) -> List[Any]:
+        """Answer every question; on_result(index, answer) is called as each one completes"""
         start_time = time.time()
         print(f"Starting batch processing of {len(questions)} questions with database: {self.database}...")
         
+        # One set-oriented search for the whole batch, then generation per question
+        contexts = await asyncio.to_thread(self.fetch_contexts, questions)
+        print(f"Retrieved context for {len(questions)} questions in {time.time() - start_time:.2f} seconds")
+
         # Create inputs for each question
-        inputs = [{"question": q, "database": self.database} for q in questions]
+        inputs = [
+            {"question": q, "database": self.database, "context": context}
+            for q, context in zip(questions, contexts)
+        ]
         
-        # Process all questions concurrently
-        results = await self.async_runnable.abatch(inputs, config=self.config)
+        # Process all questions concurrently, collecting answers in input order as they complete
+        results = [None] * len(inputs)
+        if self.adaptive:
+            completions = self.run_adaptive(inputs)
+        else:
+            completions = self.async_runnable.abatch_as_completed(inputs, config=self.config)
+        # The batch wrapper is not traced; each question's graph run is sampled on its own
+        with untraced():
+            async for index, result in completions:
+                results[index] = result
+                if on_result:
+                    on_result(index, result)
         
         completed_duration = time.time() - start_time
         print(f"All {len(questions)} questions processed in {completed_duration:.2f} seconds")
+        if self.limiter:
+            summary = self.limiter.summary()
+            SETTLED[self.database] = {**summary, "run_name": self.run_name, "questions": len(questions)}
+            print(f"Adaptive concurrency for {self.database} settled at {summary['settled_limit']} "
+                  f"(final {summary['final_limit']}, p95 target {summary['target_p95_ms']:.0f} ms)")
         
         return results
 
+    async def run_adaptive(self, inputs):
+        """Yield (index, answer) as answers complete, with in-flight questions bounded by the AIMD limiter"""
+        kwargs = {"target_p95": self.target_p95_ms / 1000} if self.target_p95_ms else {}
+        self.limiter = AIMDLimiter(initial=self.max_concurrency, **kwargs)
+        config = RunnableConfig(run_name=self.run_name, tags=self.tags, metadata={"adaptive": True})
+        loop = asyncio.get_running_loop()
+        # Sized for the limiter's ceiling so the thread pool never becomes the hidden limit
+        executor = ThreadPoolExecutor(max_workers=ADAPTIVE_MAX_CONCURRENCY, thread_name_prefix="adaptive")
+
+        async def run_one(index, data):
+            async with self.limiter:
+                started = time.perf_counter()
+                result = await loop.run_in_executor(executor, self.async_runnable.invoke, data, config)
+                ok = not str(result.get("answer", "")).startswith("Error:")
+                self.limiter.record(time.perf_counter() - started, ok)
+                return index, result
+
+        tasks = [asyncio.create_task(run_one(i, data)) for i, data in enumerate(inputs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
 
 async def main():
     pipeline = AsyncPipeline(run_name="test-run-sid", max_concurrency=2, database="clickhouse")
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, CancelledError
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+
+class BackgroundLoop:
+    """One asyncio event loop running forever in a daemon thread.
+
+    Coroutines are handed over with submit(), so callers on other threads (the Streamlit
+    script thread) never create or block on an event loop of their own.
+    """
+
+    def __init__(self, name: str = "gui-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro: Coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+class BatchJob:
+    """A batch running on a BackgroundLoop, with progress counted as each answer completes"""
+
+    def __init__(self, loop: BackgroundLoop, total: int, make_coro: Callable[[Callable], Coroutine],
+                 input_data: Optional[Dict[str, Any]] = None):
+        self.total = total
+        self.completed = 0
+        self.input_data = input_data or {}
+        self.started = time.time()
+        self.finished = None
+        self.logged = False
+        # make_coro receives the per-answer callback and returns the coroutine to run
+        self.future = loop.submit(make_coro(self.on_result))
+        self.future.add_done_callback(self.on_done)
+
+    def on_result(self, index: int, result: Any):
+        self.completed += 1
+
+    def on_done(self, future: Future):
+        self.finished = time.time()
+
+    @property
+    def running(self) -> bool:
+        return not self.future.done()
+
+    @property
+    def progress(self) -> float:
+        return self.completed / self.total if self.total else 1.0
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def cancelled(self) -> bool:
+        return self.future.cancelled()
+
+    def cancel(self) -> bool:
+        """Cancel the batch; answers already being generated finish, the rest never start"""
+        return self.future.cancel()
+
+    def outcome(self):
+        """(result, error) of a finished job"""
+        try:
+            return self.future.result(), None
+        except CancelledError:
+            return None, "Cancelled"
+        except Exception as e:
+            return None, e
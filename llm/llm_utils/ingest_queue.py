@@ -0,0 +1,122 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+
+from llm_utils.retrievers import database_port, service_hostname
+
+POST_ENDPOINT_URL = "http://{hostname}:{port}/upload-articles"
+
+# Ingest runs to one database are not repeated more often than this; later triggers are dropped
+INGEST_MIN_INTERVAL_SECONDS = float(os.getenv("INGEST_MIN_INTERVAL_SECONDS", 300))
+INGEST_TIMEOUT_SECONDS = float(os.getenv("INGEST_TIMEOUT_SECONDS", 300))
+# /upload-articles mode the triggered runs use: latest, incremental or backfill
+INGEST_MODE = os.getenv("INGEST_MODE", "latest")
+# Finished runs kept for the throughput figures
+INGEST_HISTORY = 100
+
+
+class IngestQueue:
+    """Background ingest runs triggered from the question path, at most one per database at a time.
+
+    A trigger for a database that has a run waiting or in progress, or that finished one less
+    than INGEST_MIN_INTERVAL_SECONDS ago, is dropped as a duplicate. A single worker thread calls
+    each service's /upload-articles, so questions never wait on the Guardian API, the encoder or
+    the inserts.
+    """
+
+    def __init__(self, min_interval: float = INGEST_MIN_INTERVAL_SECONDS, timeout: float = INGEST_TIMEOUT_SECONDS,
+                 mode: str = INGEST_MODE):
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.mode = mode
+        self.jobs: "queue.Queue[tuple]" = queue.Queue()
+        # database -> enqueue time of its waiting run
+        self.waiting: Dict[str, float] = {}
+        self.running: Optional[str] = None
+        self.last_finished: Dict[str, float] = {}
+        self.history = deque(maxlen=INGEST_HISTORY)
+        self.stats = {"triggered": 0, "enqueued": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+        self.lock = threading.Lock()
+        self.worker = threading.Thread(target=self.work, name="ingest-queue", daemon=True)
+        self.worker.start()
+
+    def enqueue(self, database: str) -> Dict[str, Any]:
+        """Schedule an ingest run unless one is already waiting or ran recently"""
+        now = time.time()
+        with self.lock:
+            self.stats["triggered"] += 1
+            recent = now - self.last_finished.get(database, float("-inf")) < self.min_interval
+            if database in self.waiting or database == self.running or recent:
+                self.stats["deduplicated"] += 1
+                return {"status": "deduplicated", "database": database}
+            self.waiting[database] = now
+            self.stats["enqueued"] += 1
+        self.jobs.put((database, now))
+        return {"status": "queued", "database": database}
+
+    def work(self):
+        while True:
+            database, enqueued = self.jobs.get()
+            started = time.time()
+            with self.lock:
+                self.waiting.pop(database, None)
+                self.running = database
+            ok, error = True, None
+            try:
+                response = requests.post(
+                    POST_ENDPOINT_URL.format(hostname=service_hostname(), port=database_port(database)),
+                    params={"mode": self.mode},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+            except Exception as e:
+                ok, error = False, str(e)
+                logging.error(f"Background ingest into {database} failed: {e}")
+            finished = time.time()
+            with self.lock:
+                self.running = None
+                self.last_finished[database] = finished
+                self.stats["completed" if ok else "failed"] += 1
+                self.history.append({"database": database, "ok": ok, "error": error, "lag_s": started - enqueued,
+                                     "duration_s": finished - started, "finished": finished})
+
+    def as_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.lock:
+            history = list(self.history)
+            waiting = dict(self.waiting)
+            stats = dict(self.stats)
+            running = self.running
+        span = now - history[0]["finished"] + history[0]["duration_s"] if history else 0
+        return {
+            **stats,
+            "mode": self.mode,
+            "min_interval_s": self.min_interval,
+            "running": running,
+            "waiting": sorted(waiting),
+            # Lag: how long triggered runs wait for the worker
+            "oldest_waiting_s": now - min(waiting.values()) if waiting else 0.0,
+            "mean_lag_s": sum(h["lag_s"] for h in history) / len(history) if history else None,
+            "mean_duration_s": sum(h["duration_s"] for h in history) / len(history) if history else None,
+            "runs_per_hour": len(history) / span * 3600 if span > 0 else None,
+            "last_runs": history[-5:],
+        }
+
+
+_shared = None
+_shared_guard = threading.Lock()
+
+
+def ingest_queue() -> IngestQueue:
+    """Process-wide ingest queue; its worker starts on first use"""
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = IngestQueue()
+        return _shared
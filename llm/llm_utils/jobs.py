@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any
+
+from llm_utils.langchain_pipeline import RAGApplication, RELATED_BATCH_SIZE, to_documents
+from llm_utils.retrievers import check_database, retriever
+
+JOB_STATUSES = ("queued", "running", "completed", "failed", "cancelled", "interrupted")
+FINISHED_STATUSES = ("completed", "failed", "cancelled", "interrupted")
+
+# Questions answered at once across every job; also the size of the thread pool running them
+JOB_WORKER_BUDGET = int(os.getenv("JOB_WORKER_BUDGET", 16))
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", "data/jobs")
+# Progress is written to job.json at most this often while a job runs
+JOB_SAVE_INTERVAL = float(os.getenv("JOB_SAVE_INTERVAL_SECONDS", 1))
+
+
+class Job:
+    """One batch of questions against one database, persisted under JOB_STATE_DIR/<id>/.
+
+    job.json        status and progress counters
+    questions.json  the questions, so an interrupted job can be resumed
+    results.jsonl   one line per answer, appended as answers complete; a question that failed and
+                    was retried on resume has several, and its last one counts
+    """
+
+    def __init__(self, job_id: str, questions: List[str], database: str, max_workers: int, run_id: str,
+                 state_dir: str = JOB_STATE_DIR):
+        self.id = job_id
+        self.questions = questions
+        self.database = database
+        self.max_workers = max_workers
+        self.run_id = run_id
+        self.path = os.path.join(state_dir, job_id)
+        self.status = "queued"
+        self.error = None
+        self.completed = 0
+        self.failed = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.task: Optional[asyncio.Task] = None
+        self.saved_at = 0.0
+
+    @property
+    def total(self) -> int:
+        return len(self.questions)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0
+        rate = self.completed / elapsed if elapsed else 0
+        remaining = self.total - self.completed
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "database": self.database,
+            "run_id": self.run_id,
+            "max_workers": self.max_workers,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "progress": self.completed / self.total if self.total else 1.0,
+            "elapsed_seconds": elapsed,
+            "questions_per_second": rate,
+            "eta_seconds": remaining / rate if rate and self.status == "running" else None,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    def save(self, force: bool = True):
+        now = time.time()
+        if not force and now - self.saved_at < JOB_SAVE_INTERVAL:
+            return
+        self.saved_at = now
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, "job.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        os.replace(tmp, os.path.join(self.path, "job.json"))
+
+    def save_questions(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "questions.json"), "w") as f:
+            json.dump(self.questions, f)
+
+    @property
+    def results_path(self) -> str:
+        return os.path.join(self.path, "results.jsonl")
+
+    def append_result(self, record: Dict[str, Any]):
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def outcomes(self) -> Dict[int, bool]:
+        """Success of the latest stored answer per question index"""
+        if not os.path.exists(self.results_path):
+            return {}
+        outcomes = {}
+        with open(self.results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                # A line cut off by a crash has no newline and no complete record
+                if line.endswith("\n"):
+                    record = json.loads(line)
+                    outcomes[record["index"]] = bool(record["success"])
+        return outcomes
+
+    def count(self, outcomes: Dict[int, bool]):
+        """Progress counters from the latest answer per question"""
+        self.completed = len(outcomes)
+        self.failed = sum(1 for ok in outcomes.values() if not ok)
+
+    def read_results(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Stored answers in completion order, paged"""
+        if not os.path.exists(self.results_path):
+            return []
+        results = []
+        with open(self.results_path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                # Skip blank lines and a last line cut off by a crash or still being written
+                if i < offset or not line.strip() or not line.endswith("\n"):
+                    continue
+                if len(results) >= limit:
+                    break
+                results.append(json.loads(line))
+        return results
+
+    def read_from(self, position: int = 0):
+        """Answers appended after byte position, and the position to continue from"""
+        if not os.path.exists(self.results_path):
+            return [], position
+        results = []
+        with open(self.results_path, "rb") as f:
+            f.seek(position)
+            for line in f:
+                # A line still being written has no newline yet; pick it up next time
+                if not line.endswith(b"\n"):
+                    break
+                position += len(line)
+                results.append(json.loads(line))
+        return results, position
+
+    @classmethod
+    def load(cls, path: str) -> "Job":
+        with open(os.path.join(path, "job.json")) as f:
+            state = json.load(f)
+        with open(os.path.join(path, "questions.json")) as f:
+            questions = json.load(f)
+        job = cls(state["job_id"], questions, state["database"], state["max_workers"], state["run_id"],
+                  os.path.dirname(path))
+        job.status = state["status"]
+        job.error = state.get("error")
+        job.completed = state["completed"]
+        job.failed = state["failed"]
+        job.created = state["created"]
+        job.started = state.get("started")
+        job.finished = state.get("finished")
+        # job.json is only written every JOB_SAVE_INTERVAL; the results are the record of progress
+        job.count(job.outcomes())
+        return job
+
+
+class JobManager:
+    """Runs batch jobs in the background of the LangChain service.
+
+    Every job shares one thread pool of JOB_WORKER_BUDGET threads, which caps the questions in
+    flight across all jobs; each job additionally keeps at most max_workers questions in flight.
+    Context is fetched through /related-articles/batch a chunk ahead of the answers that need it,
+    and a chunk's answers are queued as soon as the previous chunk's have all started, so workers
+    do not wait for a chunk's slowest answer.
+    """
+
+    def __init__(self, app: RAGApplication, worker_budget: int = JOB_WORKER_BUDGET, state_dir: str = JOB_STATE_DIR):
+        self.app = app
+        self.worker_budget = worker_budget
+        self.state_dir = state_dir
+        self.executor = ThreadPoolExecutor(max_workers=worker_budget, thread_name_prefix="job-worker")
+        self.jobs: Dict[str, Job] = {}
+        self.load()
+
+    def load(self):
+        """Pick up jobs from earlier runs; those that were still going are marked interrupted"""
+        if not os.path.isdir(self.state_dir):
+            return
+        for job_id in sorted(os.listdir(self.state_dir)):
+            path = os.path.join(self.state_dir, job_id)
+            try:
+                job = Job.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Skipping unreadable job {path}: {e}")
+                continue
+            if job.status not in FINISHED_STATUSES:
+                job.status = "interrupted"
+                job.save()
+            self.jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def submit(self, questions: List[str], database: str, max_workers: int, run_id: str) -> Job:
+        check_database(database)
+        job = Job(uuid.uuid4().hex[:12], questions, database, min(max_workers, self.worker_budget), run_id,
+                  self.state_dir)
+        job.save_questions()
+        job.save()
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self.run(job))
+        return job
+
+    def resume(self, job: Job) -> Job:
+        """Continue a job with the questions it has not answered, or whose answer failed"""
+        retry_failed = job.status == "completed" and job.failed > 0
+        if job.status not in ("interrupted", "cancelled", "failed") and not retry_failed:
+            raise ValueError(f"Job {job.id} is {job.status} and cannot be resumed")
+        job.status, job.error, job.finished = "queued", None, None
+        job.save()
+        job.task = asyncio.create_task(self.run(job))
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        if job.task is None or job.task.done():
+            return False
+        return job.task.cancel()
+
+    async def run(self, job: Job):
+        loop = asyncio.get_running_loop()
+        limiter = asyncio.Semaphore(job.max_workers)
+        outcomes = job.outcomes()
+        job.count(outcomes)
+        # Failed answers are asked again; their earlier records stay in results.jsonl
+        pending = [i for i in range(job.total) if not outcomes.get(i)]
+        chunks = [pending[i:i + RELATED_BATCH_SIZE] for i in range(0, len(pending), RELATED_BATCH_SIZE)]
+
+        def contexts_for(chunk):
+            try:
+                rows = retriever(job.database).related_batch([job.questions[i] for i in chunk])
+                return [to_documents(r) for r in rows]
+            except Exception as e:
+                logging.warning(f"Job {job.id}: batch retrieval failed, retrieving per question: {e}")
+                return [None] * len(chunk)
+
+        async def answer(index, context):
+            async with limiter:
+                started = time.time()
+                result = await loop.run_in_executor(
+                    self.executor, self.app.answer_question, job.questions[index], job.database, context, job.run_id
+                )
+                ok = not str(result.get("answer", "")).startswith("Error:")
+                job.append_result({
+                    "index": index,
+                    "question": job.questions[index],
+                    "success": ok,
+                    "duration": time.time() - started,
+                    "answer": result,
+                })
+                outcomes[index] = ok
+                job.count(outcomes)
+                job.save(force=False)
+
+        inflight = set()
+
+        async def drain(limit):
+            """Wait until at most `limit` answers are unfinished; the first error fails the job"""
+            nonlocal inflight
+            while len(inflight) > limit:
+                finished, inflight = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    task.result()
+
+        job.status = "running"
+        job.started = job.started or time.time()
+        job.save()
+        try:
+            next_contexts = loop.run_in_executor(self.executor, contexts_for, chunks[0]) if chunks else None
+            for n, chunk in enumerate(chunks):
+                contexts = await next_contexts
+                # Fetch the next chunk's context while this one is being answered
+                if n + 1 < len(chunks):
+                    next_contexts = loop.run_in_executor(self.executor, contexts_for, chunks[n + 1])
+                inflight |= {asyncio.ensure_future(answer(i, c)) for i, c in zip(chunk, contexts)}
+                # Queue the next chunk once none of these is still waiting for a worker
+                await drain(job.max_workers)
+            await drain(0)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job.status, job.error = "failed", str(e)
+        finally:
+            for task in inflight:
+                task.cancel()
+            job.finished = time.time()
+            job.save()
@@ -1,9 +1,20 @@
+import os
+import json
 import time
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
+import asyncio
+from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, model_validator
 from llm_utils.langchain_pipeline import RAGApplication
-from llm_utils.async_pipeline import AsyncPipeline
+from llm_utils.async_pipeline import AsyncPipeline, SETTLED
+from llm_utils.jobs import JobManager, FINISHED_STATUSES
+from llm_utils.retrievers import retriever_stats
+from llm_utils.llm_scheduler import llm_scheduler
+from llm_utils.ingest_queue import ingest_queue
 from typing import List, Optional
+from services.common.metrics import metrics_sink
+
+JOB_MAX_QUESTIONS = int(os.getenv("JOB_MAX_QUESTIONS", 100000))
 
 
 class BatchQuestionRequest(BaseModel):
@@ -12,6 +23,8 @@ class BatchQuestionRequest(BaseModel):
     max_workers: Optional[int] = Field(2, ge=1, le=10)
     run_id: Optional[str] = Field("test-run-1")
     database: Optional[str] = Field("clickhouse", description="Database to use for the query")
+    adaptive: Optional[bool] = Field(False, description="Adjust concurrency at runtime, starting from max_workers")
+    target_p95_ms: Optional[float] = Field(None, gt=0, description="p95 latency target for adaptive mode")
 
 
 class MultiBatchRequest(BaseModel):
@@ -19,12 +32,37 @@ class MultiBatchRequest(BaseModel):
     max_workers: Optional[int] = Field(2, ge=1, le=10)
     run_id: Optional[str] = Field("multi-batch-run")
     database: Optional[str] = Field("clickhouse", description="Database to use for the queries")
+    adaptive: Optional[bool] = Field(False, description="Adjust concurrency at runtime, starting from max_workers")
+    target_p95_ms: Optional[float] = Field(None, gt=0, description="p95 latency target for adaptive mode")
+
+
+class JobRequest(BaseModel):
+    queries: Optional[List[str]] = Field(None, description="Questions to answer, or use query and batch_size")
+    query: Optional[str] = Field(None)
+    batch_size: Optional[int] = Field(1, ge=1)
+    max_workers: Optional[int] = Field(2, ge=1)
+    run_id: Optional[str] = Field("job-run")
+    database: Optional[str] = Field("clickhouse", description="Database to use for the queries")
+
+    @model_validator(mode="after")
+    def check_questions(self):
+        count = len(self.queries) if self.queries else (self.batch_size if self.query else 0)
+        if count == 0:
+            raise ValueError("Provide queries, or query with batch_size")
+        if count > JOB_MAX_QUESTIONS:
+            raise ValueError(f"A job may hold at most {JOB_MAX_QUESTIONS} questions")
+        return self
+
+    def questions(self) -> List[str]:
+        return list(self.queries) if self.queries else [self.query] * self.batch_size
 
 
 class LangchainController:
     def __init__(self):
         self.app = FastAPI()
-        self.pipeline = RAGApplication(name="Langchain Guardian RAG Pipeline")
+        self.metrics = metrics_sink("langchain")
+        self.pipeline = RAGApplication(name="Langchain Guardian RAG Pipeline", metrics=self.metrics)
+        self.jobs = JobManager(self.pipeline)
         self._register_routes()
 
     def _register_routes(self):
@@ -32,6 +70,73 @@ class LangchainController:
         def answer_question(query: str, database: str):
             return self.answer_question(query, database)
 
+        @self.app.get("/answer-question-race")
+        def answer_question_race(query: str, databases: Optional[List[str]] = Query(None), first_wins: bool = False):
+            return self.answer_question_race(query, databases, first_wins)
+
+        @self.app.post("/jobs")
+        async def submit_job(request: JobRequest):
+            return self.submit_job(request)
+
+        @self.app.get("/jobs")
+        async def list_jobs():
+            return [job.summary() for job in self.jobs.jobs.values()]
+
+        @self.app.get("/jobs/{job_id}")
+        async def job_status(job_id: str):
+            return self.get_job(job_id).summary()
+
+        @self.app.get("/jobs/{job_id}/results")
+        async def job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+            job = self.get_job(job_id)
+            return {**job.summary(), "offset": offset, "results": job.read_results(offset, limit)}
+
+        @self.app.get("/jobs/{job_id}/stream")
+        async def job_stream(job_id: str, offset: int = Query(0, ge=0)):
+            return StreamingResponse(self.stream_job(self.get_job(job_id), offset), media_type="application/x-ndjson")
+
+        @self.app.post("/jobs/{job_id}/cancel")
+        async def cancel_job(job_id: str):
+            job = self.get_job(job_id)
+            return {"job_id": job_id, "cancelled": self.jobs.cancel(job)}
+
+        @self.app.post("/jobs/{job_id}/resume")
+        async def resume_job(job_id: str):
+            try:
+                return self.jobs.resume(self.get_job(job_id)).summary()
+            except ValueError as e:
+                raise HTTPException(409, str(e))
+
+        @self.app.get("/metrics-sink")
+        async def metrics_sink_status():
+            """Buffered, written and dropped request metrics of this service"""
+            return self.metrics.stats()
+
+        @self.app.get("/tracing")
+        async def tracing_status():
+            """Trace mode, sampling rate and how many questions were traced or skipped"""
+            return self.pipeline.tracing.stats()
+
+        @self.app.get("/retrievers")
+        async def retrievers():
+            """Per database: retrieval mode, deadline/hedging/circuit-breaker counters"""
+            return retriever_stats()
+
+        @self.app.get("/llm-scheduler")
+        async def llm_scheduler_status():
+            """RPM/TPM budgets, calls waiting, and queueing delay vs model latency per run"""
+            return llm_scheduler().as_dict()
+
+        @self.app.get("/ingest-queue")
+        async def ingest_queue_status():
+            """Background ingest runs triggered by the post step: dedupes, lag, duration and throughput"""
+            return ingest_queue().as_dict()
+
+        @self.app.get("/adaptive-concurrency")
+        async def adaptive_concurrency():
+            """Concurrency each database settled on in its latest adaptive batch"""
+            return SETTLED
+
         @self.app.get("/answer-question-batch")
         async def answer_question_batch(request: BatchQuestionRequest):
             return await self.answer_question_batch(request)
@@ -40,6 +145,36 @@ class LangchainController:
         async def answer_questions_multi_batch(request: MultiBatchRequest):
             return await self.answer_questions_multi_batch(request)
 
+    def get_job(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(404, f"Unknown job: {job_id}")
+        return job
+
+    def submit_job(self, request: JobRequest):
+        try:
+            job = self.jobs.submit(request.questions(), request.database, request.max_workers, request.run_id)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        return job.summary()
+
+    async def stream_job(self, job, offset: int = 0, poll_interval: float = 0.5):
+        """NDJSON stream of results from offset onward, with a progress line after each poll, until the job ends"""
+        position, seen = 0, 0
+        while True:
+            finished = job.status in FINISHED_STATUSES
+            results, position = job.read_from(position)
+            for result in results:
+                seen += 1
+                if seen > offset:
+                    yield json.dumps({"type": "result", **result}, default=str) + "\n"
+            yield json.dumps({"type": "progress", **job.summary()}) + "\n"
+            # Read once more after the job ends so no trailing result is missed
+            if finished and not results:
+                return
+            if not results:
+                await asyncio.sleep(poll_interval)
+
     def answer_question(self, query: str, database: str):
         start_time = time.time()
         answer = self.pipeline.answer_question(query, database)
@@ -57,12 +192,34 @@ class LangchainController:
             }
         }
 
-    async def answer_question_batch(self, request: BatchQuestionRequest):
+    def answer_question_race(self, query: str, databases: Optional[List[str]], first_wins: bool):
+        start_time = time.time()
+        try:
+            answer = self.pipeline.race_question(query, databases, first_wins)
+        except ValueError as e:
+            return {"status": "error", "error": str(e), "query": query}
+        end_time = time.time()
+
+        return {
+            "status": "success",
+            "query": query,
+            "answer": answer,
+            "total_duration": end_time - start_time,
+            "metadata": {
+                "start_time": start_time,
+                "end_time": end_time,
+                "first_wins": first_wins
+            }
+        }
+
+    async def answer_question_batch(self, request: BatchQuestionRequest, on_result=None):
         try:
-            async_pipeline = AsyncPipeline(max_concurrency=request.max_workers, run_name=request.run_id, database=request.database)
+            async_pipeline = AsyncPipeline(max_concurrency=request.max_workers, run_name=request.run_id, database=request.database,
+                                           app=self.pipeline, adaptive=request.adaptive,
+                                           target_p95_ms=request.target_p95_ms)
             start_time = time.time()
             queries = [request.query] * request.batch_size
-            answers = await async_pipeline.run_batch(queries)
+            answers = await async_pipeline.run_batch(queries, on_result)
             end_time = time.time()
             total_duration = end_time - start_time
 
@@ -75,6 +232,7 @@ class LangchainController:
                 "total_duration": total_duration,
                 "avg_duration_per_query": total_duration / request.batch_size,
                 "answers": answers,
+                "concurrency": async_pipeline.limiter.summary() if async_pipeline.limiter else None,
                 "metadata": {
                     "start_time": start_time,
                     "end_time": end_time,
@@ -92,11 +250,13 @@ class LangchainController:
                 "run_id": request.run_id
             }
 
-    async def answer_questions_multi_batch(self, request: MultiBatchRequest):
+    async def answer_questions_multi_batch(self, request: MultiBatchRequest, on_result=None):
         try:
-            async_pipeline = AsyncPipeline(max_concurrency=request.max_workers, run_name=request.run_id, database=request.database)
+            async_pipeline = AsyncPipeline(max_concurrency=request.max_workers, run_name=request.run_id, database=request.database,
+                                           app=self.pipeline, adaptive=request.adaptive,
+                                           target_p95_ms=request.target_p95_ms)
             start_time = time.time()
-            answers = await async_pipeline.run_batch(request.queries)
+            answers = await async_pipeline.run_batch(request.queries, on_result)
             end_time = time.time()
             total_duration = end_time - start_time
 
@@ -117,6 +277,7 @@ class LangchainController:
                 "total_duration": total_duration,
                 "avg_duration_per_query": total_duration / len(request.queries),
                 "results": results,
+                "concurrency": async_pipeline.limiter.summary() if async_pipeline.limiter else None,
                 "metadata": {
                     "start_time": start_time,
                     "end_time": end_time,
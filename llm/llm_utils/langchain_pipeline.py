@@ -1,6 +1,7 @@
-from enum import Enum
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from typing import List, Dict, Any
 from anthropic import Anthropic
@@ -8,36 +9,48 @@ from langchain_anthropic import ChatAnthropic
 from langchain.schema import Document
 from langchain.prompts import PromptTemplate
 from pydantic import SecretStr
-import requests
 
 # === LangGraph imports ===
 from langgraph.graph import StateGraph, START
 from typing_extensions import TypedDict
 
-load_dotenv()
+from llm_utils.tracing import tracing
+from llm_utils.llm_scheduler import ScheduledLLM, FakeLLM
+from llm_utils.ingest_queue import ingest_queue
+from llm_utils.retrievers import (
+    Database, RELATED_BATCH_SIZE, check_database, database_names, database_port, fetch_related,
+    fetch_related_batch, retriever, service_hostname
+)
 
-POST_ENDPOINT_URL = "http://{hostname}:{port}/upload-articles"
+load_dotenv()
 
-# 1. Define the shared state for orchestration
-class Database(Enum):
-    CLICKHOUSE = ("clickhouse", 8000)
-    POSTGRES = ("postgres", 8001)
-    CASSANDRA = ("cassandra", 8003)
+# anthropic: Claude through ChatAnthropic; fake: llm_utils.llm_scheduler.FakeLLM, no API key needed
+LLM_BACKEND = os.getenv("LLM_BACKEND", "anthropic")
 
+# Backend whose exact (brute-force cosine) search is the reference answer in race mode
+RACE_REFERENCE = os.getenv("RACE_REFERENCE_DATABASE", "clickhouse")
 
+# 1. Define the shared state for orchestration
 class State(TypedDict):
     question: str
     context: List[Document]
     answer: str
+    database: str
     port: int
+    # Outcome of the post step's ingest trigger (queued or deduplicated)
+    ingest: Dict[str, Any]
+    # Run the question belongs to; the LLM scheduler queues runs fairly
+    run_name: str
+    # Stage timings and LLM token usage, reported to the metrics sink. generate_ms is model
+    # latency only; time waiting for the LLM rate budget is llm_queue_ms
+    retrieve_ms: float
+    llm_queue_ms: float
+    generate_ms: float
+    usage: Dict[str, int]
 
 
-# 2. Step 1: retrieve relevant articles
-def retrieve(state: State) -> Dict[str, Any]:
-    hostname = "localhost" if os.getenv("LOCAL_STREAMLIT_SERVER", False) else "host.docker.internal"
-    docs = requests.get(f"http://{hostname}:{state.get('port')}/related-articles?query={state['question']}").json()
-    # convert to LangChain Documents
-    documents = [
+def to_documents(docs: list) -> List[Document]:
+    return [
         Document(
             page_content=body,
             metadata={
@@ -49,7 +62,90 @@ def retrieve(state: State) -> Dict[str, Any]:
         )
         for url, title, body, pub_date, score in docs
     ]
-    return {"context": documents}
+
+
+# 2. Step 1: retrieve relevant articles
+def retrieve(state: State) -> Dict[str, Any]:
+    # Batch runs fetch every question's context up front
+    if state.get("context") is not None:
+        return {}
+    started = time.perf_counter()
+    docs = retriever(state["database"]).related(state["question"])
+    # convert to LangChain Documents
+    return {"context": to_documents(docs), "retrieve_ms": (time.perf_counter() - started) * 1000}
+
+
+def jaccard(a, b) -> float:
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def recall(found, expected) -> float:
+    expected = set(expected)
+    if not expected:
+        return 1.0
+    return len(expected & set(found)) / len(expected)
+
+
+def race_retrieve(question: str, databases: List[str] = None, first_wins: bool = False,
+                  timeout: float = 30) -> Dict[str, Any]:
+    """Send the same question to several database services at once.
+
+    Every backend is timed from the same start instant, so cache state and time-of-day drift
+    affect all of them equally. Results are compared by URL against the reference backend's
+    exact answer (Jaccard and recall) when the reference took part.
+
+    With first_wins, the call returns as soon as one backend answers successfully; backends
+    still in flight are reported as pending and their responses are discarded.
+    """
+    databases = databases or database_names()
+    for database in databases:
+        check_database(database)
+
+    def timed_fetch(database):
+        started = time.perf_counter()
+        rows = retriever(database).related(question, timeout)
+        return rows, (time.perf_counter() - started) * 1000
+
+    backends = {database: {"status": "pending"} for database in databases}
+    winner, finish_order = None, []
+    executor = ThreadPoolExecutor(max_workers=len(databases))
+    try:
+        futures = {executor.submit(timed_fetch, database): database for database in databases}
+        for future in as_completed(futures):
+            database = futures[future]
+            try:
+                rows, latency_ms = future.result()
+                backends[database] = {"status": "success", "latency_ms": latency_ms, "rows": rows}
+                finish_order.append(database)
+                winner = winner or database
+            except Exception as e:
+                logging.error(f"Race retrieval from {database} failed: {e}")
+                backends[database] = {"status": "error", "error": str(e)}
+            if first_wins and winner:
+                break
+    finally:
+        # Do not wait for stragglers when the first answer is all that is needed
+        executor.shutdown(wait=not first_wins, cancel_futures=True)
+
+    urls = {db: [row[0] for row in r["rows"]] for db, r in backends.items() if r["status"] == "success"}
+    reference = urls.get(RACE_REFERENCE)
+    for database, result in backends.items():
+        if result["status"] != "success":
+            continue
+        result["rank"] = finish_order.index(database) + 1
+        if reference is not None:
+            result["jaccard"] = jaccard(urls[database], reference)
+            result["recall"] = recall(urls[database], reference)
+
+    return {
+        "question": question,
+        "winner": winner,
+        "reference": RACE_REFERENCE if reference is not None else None,
+        "backends": backends,
+    }
 
 
 # 3. Step 2: generate answer with Claude
@@ -64,50 +160,34 @@ def generate(state: State, app: "RAGApplication") -> Dict[str, Any]:
     )
     prompt_str = app.rag_prompt.format(question=state["question"], context=ctx)
     if (os.getenv("USE_LLM", "false") == "true"):
-        response = app.llm.invoke(prompt_str)
-        return {"answer": response.content}
+        response, queue_ms, model_ms = app.llm.timed_invoke(prompt_str, state.get("run_name"))
+        return {
+            "answer": response.content,
+            "llm_queue_ms": queue_ms,
+            "generate_ms": model_ms,
+            "usage": getattr(response, "usage_metadata", None) or {},
+        }
     else:
         return {"answer": "This is a placeholder answer. Replace with actual generation logic."}
 
-def post(state: State, endpoint_url=None):
-    """Post results to the specified endpoint"""
+def post(state: State) -> Dict[str, Any]:
+    """Trigger a background ingest run into the question's database without waiting for it"""
     """IF YOU WANT TO USE THE POST STEP, SET USE_POST TO TRUE IN THE .ENV FILE"""
     if (os.getenv("USE_POST", "false") == "true"):
-        if not endpoint_url:
-            hostname = "localhost" if os.getenv("LOCAL_STREAMLIT_SERVER", False) else "host.docker.internal"
-            endpoint_url = POST_ENDPOINT_URL.format(port=state.get('port', 8000), hostname=hostname)
-        
-        try:
-            response = requests.post(
-                endpoint_url,
-                json={},
-                timeout=30,
-                headers={'Content-Type': 'application/json'}
-            )
-            response.raise_for_status()
-            return {"status": "success", "response": response.json() if response.content else {}}
-        except requests.exceptions.RequestException as e:
-            return {"status": "error", "error": str(e)}
-    else:
-        return {"status": "success", "response": {"message": "Post step executed successfully"}}
+        # Deduplicated per database; the run itself happens on the ingest queue's worker
+        return {"ingest": ingest_queue().enqueue(state["database"])}
+    return {}
 
 
 class RAGApplication:
-    def __init__(self, name: str, max_articles: int = 5):
+    def __init__(self, name: str, max_articles: int = 5, metrics=None):
         # — your existing initialization —
         self.max_articles = max_articles
-        self.anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY is required")
-
-        self.llm = ChatAnthropic(
-            model_name="claude-3-5-sonnet-latest",
-            api_key=SecretStr(api_key),
-            temperature=0.1,
-            timeout=60,
-            stop=[]
-        )
+        # Optional services.common.metrics sink; every answered question is recorded to it
+        self.metrics = metrics
+        self.tracing = tracing()
+        # Every call goes through the process-wide RPM/TPM scheduler (see llm_utils.llm_scheduler)
+        self.llm = ScheduledLLM(FakeLLM() if LLM_BACKEND == "fake" else self.anthropic_llm())
         self.rag_prompt = PromptTemplate(
             input_variables=["question", "context"],
             template="""
@@ -132,19 +212,43 @@ class RAGApplication:
         builder.add_edge(START, "post")
         self.graph = builder.compile(name=name)
 
-    def answer_question(self, question: str, database: str) -> Dict[str, Any]:
-        """Invoke the orchestrated RAG graph in one call."""
+    def anthropic_llm(self):
+        self.anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY is required")
+
+        return ChatAnthropic(
+            model_name="claude-3-5-sonnet-latest",
+            api_key=SecretStr(api_key),
+            temperature=0.1,
+            timeout=60,
+            stop=[]
+        )
+
+    def answer_question(self, question: str, database: str, context: List[Document] = None,
+                        run_name: str = None) -> Dict[str, Any]:
+        """Invoke the orchestrated RAG graph in one call.
+
+        A pre-fetched context skips the per-question retrieval. Whether the run is traced is
+        decided here, per question (see llm_utils.tracing).
+        """
+        started = time.perf_counter()
         try:
             # run through retrieve → generate
-            if database not in [db.value[0] for db in Database]:
-                raise ValueError(f"Invalid database: {database}. Must be one of {[db.value[0] for db in Database]}.")
-            
-            result_state = self.graph.invoke({"question": question,
-                                              "port": Database[database.upper()].value[1],
-                                              "config": {"tags": [f"{database}"]}})
+            check_database(database)
+
+            with self.tracing.run(run_name, tags=[database], metadata={"database": database}) as config:
+                result_state = self.graph.invoke({"question": question,
+                                                  "context": context,
+                                                  "database": database,
+                                                  "port": database_port(database),
+                                                  "run_name": run_name},
+                                                 config=config)
             # unpack
             answer = result_state["answer"]
             docs: List[Document] = result_state["context"]
+            self.record_metrics(database, started, "ok", len(docs), result_state)
 
             return {
                 "question": question,
@@ -163,6 +267,7 @@ class RAGApplication:
             }
         except Exception as e:
             logging.error(f"RAG pipeline failed: {e}")
+            self.record_metrics(database, started, "error")
             return {
                 "question": question,
                 "answer": f"Error: {e}",
@@ -170,6 +275,53 @@ class RAGApplication:
                 "articles_used": 0
             }
 
+    def record_metrics(self, database: str, started: float, status: str, rows: int = 0, state: Dict[str, Any] = None):
+        if self.metrics is None:
+            return
+        state = state or {}
+        usage = state.get("usage") or {}
+        self.metrics.record(
+            "/answer-question",
+            (time.perf_counter() - started) * 1000,
+            database=database,
+            status=status,
+            stages={"retrieve_ms": state.get("retrieve_ms"), "llm_queue_ms": state.get("llm_queue_ms"),
+                    "generate_ms": state.get("generate_ms")},
+            rows=rows,
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0),
+        )
+
+    def race_question(self, question: str, databases: List[str] = None, first_wins: bool = False) -> Dict[str, Any]:
+        """Retrieve from several databases at once and answer from the fastest one.
+
+        Retrieval runs outside the LangGraph graph, so the post step is skipped.
+        """
+        race = race_retrieve(question, databases, first_wins)
+        winner = race["winner"]
+        if winner is None:
+            answer = "Error: every database failed to respond"
+        else:
+            documents = to_documents(race["backends"][winner]["rows"])
+            answer = generate({"question": question, "context": documents}, self)["answer"]
+
+        return {
+            "question": question,
+            "answer": answer,
+            "answered_from": winner,
+            "reference": race["reference"],
+            "backends": {
+                database: {
+                    **{key: value for key, value in result.items() if key != "rows"},
+                    "context": [
+                        {"title": title, "url": url, "publication_date": pub_date, "similarity_score": score}
+                        for url, title, _, pub_date, score in result.get("rows", [])
+                    ]
+                }
+                for database, result in race["backends"].items()
+            }
+        }
+
 
 # === Example usage ===
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+# Budgets shared by every run in the process; set them a little under the account's rate limits
+LLM_RPM = float(os.getenv("LLM_RPM", 50))
+LLM_TPM = float(os.getenv("LLM_TPM", 40000))
+# Output tokens assumed per call until the response reports its usage (ChatAnthropic's max_tokens)
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", 1024))
+# Rough characters per token of English prose, used to estimate prompts locally
+CHARS_PER_TOKEN = 4
+
+DEFAULT_RUN = "default"
+
+
+def estimate_tokens(prompt: str, output_tokens: int = LLM_OUTPUT_TOKEN_ESTIMATE) -> int:
+    """Local estimate of a call's input + output tokens, without a tokenizer round trip"""
+    return len(prompt) // CHARS_PER_TOKEN + 1 + output_tokens
+
+
+class TokenBucket:
+    """Holds up to `per_minute` units and refills continuously at per_minute / 60 a second"""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.clock = clock
+        self.level = per_minute
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (amounts over capacity only need a full bucket)"""
+        self.refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """Requests-per-minute and tokens-per-minute budgets in front of every LLM call in the process.
+
+    Calls that would overrun a budget wait in a queue per run (a batch, job or single question)
+    and runs take turns, so a large batch cannot starve a single question queued behind it.
+    Token costs are estimated locally before the call and corrected with the reported usage
+    afterwards; an underestimate is paid back out of the budget of later calls.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.queues: Dict[str, deque] = {}
+        # Runs with calls waiting, in the order they get their next turn
+        self.turns: deque = deque()
+        self.condition = threading.Condition()
+        self.stats = {
+            "calls": 0, "queued_calls": 0, "queue_ms": 0.0, "max_queue_ms": 0.0, "model_ms": 0.0,
+            "estimated_tokens": 0, "actual_tokens": 0, "errors": 0,
+        }
+        self.runs: Dict[str, Dict[str, float]] = {}
+
+    def acquire(self, run: str, tokens: int) -> float:
+        """Block until it is this run's turn and both budgets allow the call; returns seconds queued"""
+        started = time.perf_counter()
+        ticket = object()
+        with self.condition:
+            if run not in self.queues:
+                self.queues[run] = deque()
+                self.turns.append(run)
+            self.queues[run].append(ticket)
+            while True:
+                if self.turns[0] == run and self.queues[run][0] is ticket:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait <= 0:
+                        break
+                    self.condition.wait(wait)
+                else:
+                    self.condition.wait()
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.queues[run].popleft()
+            self.turns.popleft()
+            if self.queues[run]:
+                self.turns.append(run)
+            else:
+                del self.queues[run]
+            self.condition.notify_all()
+
+            queued = time.perf_counter() - started
+            self.stats["calls"] += 1
+            self.stats["queued_calls"] += queued > 0.001
+            self.stats["queue_ms"] += queued * 1000
+            self.stats["max_queue_ms"] = max(self.stats["max_queue_ms"], queued * 1000)
+            self.stats["estimated_tokens"] += tokens
+            per_run = self.runs.setdefault(run, {"calls": 0, "queue_ms": 0.0})
+            per_run["calls"] += 1
+            per_run["queue_ms"] += queued * 1000
+        return queued
+
+    def settle(self, estimated: int, actual: Optional[int], model_ms: float, ok: bool = True):
+        """Charge the difference between the reported and the estimated tokens"""
+        actual = actual or estimated
+        with self.condition:
+            self.tokens.refill()
+            self.tokens.level -= actual - estimated
+            self.stats["actual_tokens"] += actual
+            self.stats["model_ms"] += model_ms
+            self.stats["errors"] += not ok
+            self.condition.notify_all()
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.condition:
+            calls = self.stats["calls"]
+            return {
+                **self.stats,
+                "rpm": self.requests.capacity,
+                "tpm": self.tokens.capacity,
+                "waiting": sum(len(queue) for queue in self.queues.values()),
+                "mean_queue_ms": self.stats["queue_ms"] / calls if calls else 0.0,
+                "mean_model_ms": self.stats["model_ms"] / calls if calls else 0.0,
+                "runs": {run: dict(stats) for run, stats in self.runs.items()},
+            }
+
+
+class ScheduledLLM:
+    """An LLM whose calls go through the scheduler; everything else is delegated to the wrapped LLM"""
+
+    def __init__(self, llm, scheduler: LLMScheduler = None):
+        self.llm = llm
+        self.scheduler = scheduler or llm_scheduler()
+
+    def timed_invoke(self, prompt: str, run: str = None) -> Tuple[Any, float, float]:
+        """(response, queue ms, model ms) of one call"""
+        estimated = estimate_tokens(prompt)
+        queued = self.scheduler.acquire(run or DEFAULT_RUN, estimated)
+        started = time.perf_counter()
+        response, usage = None, {}
+        try:
+            response = self.llm.invoke(prompt)
+            usage = getattr(response, "usage_metadata", None) or {}
+            return response, queued * 1000, (time.perf_counter() - started) * 1000
+        finally:
+            actual = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+            self.scheduler.settle(estimated, actual, (time.perf_counter() - started) * 1000, response is not None)
+
+    def invoke(self, prompt: str, run: str = None):
+        return self.timed_invoke(prompt, run)[0]
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+class FakeLLM:
+    """Stand-in for the chat model (LLM_BACKEND=fake): sleeps `latency` seconds and reports
+    token usage like ChatAnthropic does, so scheduling can be exercised without the API"""
+
+    def __init__(self, latency: float = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", 0.5)),
+                 output_tokens: int = 200):
+        self.latency = latency
+        self.output_tokens = output_tokens
+
+    def invoke(self, prompt: str):
+        time.sleep(self.latency)
+        return SimpleNamespace(
+            content=f"Fake answer to a {len(prompt)}-character prompt.",
+            usage_metadata={"input_tokens": len(prompt) // CHARS_PER_TOKEN, "output_tokens": self.output_tokens},
+        )
+
+
+_shared = None
+_shared_guard = threading.Lock()
+
+
+def llm_scheduler() -> LLMScheduler:
+    """Process-wide scheduler configured from the environment"""
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = LLMScheduler()
+            logging.info(f"LLM scheduler: {_shared.requests.capacity:.0f} RPM, {_shared.tokens.capacity:.0f} TPM")
+        return _shared
@@ -0,0 +1,202 @@
+import os
+import time
+import threading
+import http.client
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+# Longest a retrieval may take end to end, hedge included
+RETRIEVAL_DEADLINE_SECONDS = float(os.getenv("RETRIEVAL_DEADLINE_SECONDS", 10))
+# A duplicate request is sent once the first has been out longer than this percentile of recent
+# retrieval latencies; 0 disables hedging
+RETRIEVAL_HEDGE_PERCENTILE = float(os.getenv("RETRIEVAL_HEDGE_PERCENTILE", 95))
+# Latencies the hedge delay is computed from; no hedging until the window has this many samples
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+# Consecutive failures that open a backend's circuit, and how long it stays open before a trial call
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", 30))
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def backend_failure(error: BaseException) -> bool:
+    """Whether an error says the backend is unhealthy: a timeout, a connection error or a 5xx.
+
+    A 4xx answer, or an error raised by the caller's own code, is about the request; counting it
+    would let a few bad queries open the circuit for every caller.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError, requests.Timeout, requests.ConnectionError)):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status_code", None)
+    # The DAOs raise http.client.HTTPException(status, detail)
+    if status is None and isinstance(error, http.client.HTTPException) and error.args and isinstance(error.args[0], int):
+        status = error.args[0]
+    return status is not None and status >= 500
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures; open -> half-open after `reset_seconds`.
+
+    While half-open a single trial call is let through: success closes the circuit, failure
+    opens it again for another reset period.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state, self.trial_in_flight = "half-open", False
+            if self.state == "closed":
+                return True
+            if self.state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.state, self.failures = "closed", 0
+                return
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state, self.opened_at = "open", time.monotonic()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.opened}
+
+
+class RetrievalPolicy:
+    """Deadline, hedging and circuit breaking around one backend's retrieval calls.
+
+    Each attempt runs on the policy's thread pool, so the caller stops waiting at the deadline
+    even when the backend never answers (the abandoned attempt ends with its own timeout). With
+    hedging on, a duplicate attempt is sent once the first has been out for the recent latency
+    percentile and whichever answers first wins. "recovered_ms" adds up, for hedge wins, how much
+    later the first attempt finished: the tail latency the hedge took off. Only missed deadlines
+    and backend failures (see backend_failure) count towards opening the circuit; any other error
+    is passed on and counts as an answer from a live backend.
+    """
+
+    def __init__(self, name: str, deadline: float = RETRIEVAL_DEADLINE_SECONDS,
+                 hedge_percentile: float = RETRIEVAL_HEDGE_PERCENTILE, breaker: CircuitBreaker = None,
+                 max_workers: int = 32):
+        self.name = name
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"retrieve-{name}")
+        self.latencies = deque(maxlen=HEDGE_WINDOW)
+        self.stats = {
+            "calls": 0, "errors": 0, "deadline_exceeded": 0, "short_circuited": 0,
+            "hedged": 0, "hedge_wins": 0, "recovered_ms": 0.0,
+        }
+        self.lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds before a duplicate attempt is sent, or None while hedging is off or warming up"""
+        with self.lock:
+            if not self.hedge_percentile or len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(self.hedge_percentile / 100 * (len(ordered) - 1))))]
+
+    def attempt(self, fn: Callable, args, timeout: float):
+        started = time.perf_counter()
+        result = fn(*args, timeout=timeout)
+        finished = time.perf_counter()
+        with self.lock:
+            self.latencies.append(finished - started)
+        return result, finished
+
+    def call(self, fn: Callable, *args, deadline: float = None, hedge: bool = True):
+        """fn(*args, timeout=seconds) under the deadline, hedged unless hedge is False"""
+        with self.lock:
+            self.stats["calls"] += 1
+        if not self.breaker.allow():
+            with self.lock:
+                self.stats["short_circuited"] += 1
+            raise CircuitOpenError(f"Circuit for {self.name} is open after repeated failures")
+
+        deadline = deadline or self.deadline
+        end = time.perf_counter() + deadline
+        primary = self.executor.submit(self.attempt, fn, args, deadline)
+        pending, error = {primary}, None
+        delay = self.hedge_delay() if hedge else None
+        hedge_at = time.perf_counter() + delay if delay is not None and delay < deadline else None
+
+        while pending:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            wait_until = min(end, hedge_at) if hedge_at else end
+            done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            if hedge_at and time.perf_counter() >= hedge_at and primary in pending:
+                hedge_at = None
+                pending.add(self.executor.submit(self.attempt, fn, args, max(0.0, end - time.perf_counter())))
+                with self.lock:
+                    self.stats["hedged"] += 1
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                result, finished = future.result()
+                if future is not primary:
+                    self.record_hedge_win(primary, finished)
+                self.breaker.record(True)
+                return result
+            # The first attempt failed before its hedge went out; there is nothing left to wait for
+            if not pending and error is not None:
+                break
+
+        timed_out = error is None or bool(pending)
+        self.breaker.record(not timed_out and not backend_failure(error))
+        with self.lock:
+            if timed_out:
+                self.stats["deadline_exceeded"] += 1
+            else:
+                self.stats["errors"] += 1
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"Retrieval from {self.name} exceeded its {deadline:.1f}s deadline")
+
+    def record_hedge_win(self, primary, answered: float):
+        with self.lock:
+            self.stats["hedge_wins"] += 1
+
+        def recovered(future):
+            if future.exception() is None:
+                _, finished = future.result()
+                with self.lock:
+                    self.stats["recovered_ms"] += (finished - answered) * 1000
+
+        primary.add_done_callback(recovered)
+
+    def as_dict(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        with self.lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "deadline_s": self.deadline,
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_delay_ms": delay * 1000 if delay is not None else None,
+            "circuit": self.breaker.as_dict(),
+        }
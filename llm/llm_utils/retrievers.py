@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+# services.common lives at the repository root (mounted at /opt/rag in the langchain container)
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _on_path(path: str):
+    """Make path importable without adding it again on every import or DAO load"""
+    if path not in sys.path:
+        sys.path.append(path)
+
+
+_on_path(ROOT)
+from services.common.responses import MEDIA_TYPES, accept_header, decode_rows, decode_batch
+from llm_utils.retrieval_policy import RetrievalPolicy
+
+RELATED_ENDPOINT_URL = "http://{hostname}:{port}/related-articles"
+RELATED_BATCH_ENDPOINT_URL = "http://{hostname}:{port}/related-articles/batch"
+# Queries per /related-articles/batch request; must not exceed the services' RELATED_ARTICLES_MAX_BATCH
+RELATED_BATCH_SIZE = int(os.getenv("RELATED_BATCH_SIZE", 64))
+# Batch retrievals search many questions at once, so they get a deadline of their own
+RETRIEVAL_BATCH_DEADLINE_SECONDS = float(os.getenv("RETRIEVAL_BATCH_DEADLINE_SECONDS", 120))
+
+# Wire format asked of the database services: json, msgpack or arrow (falls back to json)
+RELATED_RESPONSE_FORMAT = os.getenv("RELATED_RESPONSE_FORMAT", "msgpack")
+if RELATED_RESPONSE_FORMAT not in MEDIA_TYPES:
+    raise ValueError(f"Invalid RELATED_RESPONSE_FORMAT: {RELATED_RESPONSE_FORMAT}. Must be one of {list(MEDIA_TYPES)}.")
+
+# remote: the database service's HTTP API; in-process: the service's DAO loaded into this process.
+# RETRIEVAL_MODE sets the default, RETRIEVAL_MODE_<DATABASE> overrides it per backend.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "remote")
+
+
+class Database(Enum):
+    CLICKHOUSE = ("clickhouse", 8000)
+    POSTGRES = ("postgres", 8001)
+    CASSANDRA = ("cassandra", 8003)
+    NUMPY = ("numpy", 8004)
+
+
+def database_names() -> List[str]:
+    return [db.value[0] for db in Database]
+
+
+def check_database(database: str):
+    if database not in database_names():
+        raise ValueError(f"Invalid database: {database}. Must be one of {database_names()}.")
+
+
+def database_port(database: str) -> int:
+    return Database[database.upper()].value[1]
+
+
+def service_hostname() -> str:
+    return "localhost" if os.getenv("LOCAL_STREAMLIT_SERVER", False) else "host.docker.internal"
+
+
+def fetch_related(port: int, question: str, timeout: float = None) -> list:
+    """Raw (url, title, body, publication_date, score) rows from one database service"""
+    response = requests.get(
+        RELATED_ENDPOINT_URL.format(hostname=service_hostname(), port=port),
+        params={"query": question},
+        headers={"Accept": accept_header(RELATED_RESPONSE_FORMAT)},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return decode_rows(response.content, response.headers.get("content-type"))
+
+
+def fetch_related_batch(port: int, questions: List[str], timeout: float = None) -> List[list]:
+    """Rows for several questions via /related-articles/batch, one list per question in order.
+
+    Duplicate questions are only searched once.
+    """
+    unique = list(dict.fromkeys(questions))
+    rows = {}
+    for start in range(0, len(unique), RELATED_BATCH_SIZE):
+        chunk = unique[start:start + RELATED_BATCH_SIZE]
+        response = requests.post(
+            RELATED_BATCH_ENDPOINT_URL.format(hostname=service_hostname(), port=port),
+            json={"queries": chunk},
+            headers={"Accept": accept_header(RELATED_RESPONSE_FORMAT)},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        rows.update(zip(chunk, decode_batch(response.content, response.headers.get("content-type"))))
+    return [rows[question] for question in questions]
+
+
+class RemoteRetriever:
+    """Retrieval over the database service's HTTP API, with deadlines, hedging and a circuit breaker"""
+    mode = "remote"
+
+    def __init__(self, database: str):
+        self.database = database
+        self.port = database_port(database)
+        self.policy = RetrievalPolicy(database)
+
+    def related(self, question: str, timeout: float = None) -> list:
+        return self.policy.call(fetch_related, self.port, question, deadline=timeout)
+
+    def related_batch(self, questions: List[str], timeout: float = None) -> List[list]:
+        # A hedge would repeat the whole batch's search, so batches only get the deadline
+        return self.policy.call(fetch_related_batch, self.port, questions, hedge=False,
+                                deadline=timeout or RETRIEVAL_BATCH_DEADLINE_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, **self.policy.as_dict()}
+
+
+# database -> (service directory, module, DAO class), as in scripts/embedding_snapshot.py
+DAOS = {
+    "clickhouse": ("clickhouse", "services.clickhouse.clickhouse_dao", "ClickhouseDao"),
+    "postgres": ("postgres", "services.postgres.postgres_dao", "PostgresDao"),
+    "cassandra": ("cassandra", "services.cassandra.cassandra_dao", "CassandraDao"),
+    "numpy": ("numpy_store", "services.numpy_store.numpy_store_dao", "NumpyStoreDao"),
+}
+
+
+class InProcessRetriever:
+    """Retrieval by calling the backend's DAO directly, skipping serialization and the HTTP hop.
+
+    The DAO is created on first use and shared by every run in the process, so its client,
+    session and encoder are set up once. The services run their DAO calls one at a time on the
+    event loop, and the DAOs are written for that, so calls here are serialized the same way.
+    The backend's client library and connection settings must be available in this process.
+    Calls get the same deadline and circuit breaker as remote ones but are not hedged, since a
+    duplicate would only queue behind the first.
+
+    A DAO call cannot be interrupted: one that outlives its deadline keeps running and keeps the
+    DAO busy. Calls behind it wait for the DAO at most until their own deadline and then fail
+    with TimeoutError, which counts towards the circuit breaker, instead of queueing for ever.
+    """
+    mode = "in-process"
+
+    def __init__(self, database: str):
+        self.database = database
+        self.dao = None
+        self.lock = threading.Lock()
+        self.policy = RetrievalPolicy(database)
+        # DAO calls made and the time callers spent waiting for one another
+        self.counters = {"calls": 0, "wait_ms": 0.0}
+
+    def load_dao(self):
+        service_dir, module_name, class_name = DAOS[self.database]
+        # Some services import their siblings by flat module name
+        _on_path(os.path.join(ROOT, "services", service_dir))
+        return getattr(importlib.import_module(module_name), class_name)()
+
+    def call(self, timeout: Optional[float], method: str, *args, **kwargs):
+        """DAO method call, after waiting at most `timeout` seconds for the calls ahead of it"""
+        requested = time.perf_counter()
+        if not self.lock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+            raise TimeoutError(f"The {self.database} DAO is still busy with an earlier call")
+        try:
+            self.counters["wait_ms"] += (time.perf_counter() - requested) * 1000
+            self.counters["calls"] += 1
+            if self.dao is None:
+                logging.info(f"Loading the {self.database} DAO for in-process retrieval...")
+                self.dao = self.load_dao()
+            return getattr(self.dao, method)(*args, **kwargs)
+        finally:
+            self.lock.release()
+
+    def related(self, question: str, timeout: float = None) -> list:
+        return self.policy.call(self.search, question, deadline=timeout, hedge=False)
+
+    def related_batch(self, questions: List[str], timeout: float = None) -> List[list]:
+        return self.policy.call(self.search_batch, questions, hedge=False,
+                                deadline=timeout or RETRIEVAL_BATCH_DEADLINE_SECONDS)
+
+    def search(self, question: str, timeout: float = None) -> list:
+        return list(self.call(timeout, "related_articles", question))
+
+    def search_batch(self, questions: List[str], timeout: float = None) -> List[list]:
+        end = time.perf_counter() + timeout if timeout is not None else None
+        unique = list(dict.fromkeys(questions))
+        rows = {}
+        for start in range(0, len(unique), RELATED_BATCH_SIZE):
+            chunk = unique[start:start + RELATED_BATCH_SIZE]
+            remaining = end - time.perf_counter() if end is not None else None
+            rows.update(zip(chunk, self.call(remaining, "related_articles_batch", chunk)))
+        return [list(rows[question]) for question in questions]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "dao_calls": self.counters["calls"], "dao_wait_ms": self.counters["wait_ms"],
+                **self.policy.as_dict()}
+
+
+# mode -> factory(database); register_retriever adds new ways of reaching a backend
+RETRIEVERS: Dict[str, Callable[[str], object]] = {
+    "remote": RemoteRetriever,
+    "in-process": InProcessRetriever,
+}
+
+_retrievers: Dict[tuple, object] = {}
+_lock = threading.Lock()
+
+
+def register_retriever(mode: str, factory: Callable[[str], object]):
+    """Make factory(database) available as RETRIEVAL_MODE=<mode>"""
+    RETRIEVERS[mode] = factory
+
+
+def retrieval_mode(database: str) -> str:
+    mode = os.getenv(f"RETRIEVAL_MODE_{database.upper()}") or RETRIEVAL_MODE
+    if mode not in RETRIEVERS:
+        raise ValueError(f"Invalid retrieval mode for {database}: {mode}. Must be one of {list(RETRIEVERS)}.")
+    return mode
+
+
+def retriever(database: str, mode: Optional[str] = None):
+    """Process-wide retriever for a database in the given (or configured) mode"""
+    check_database(database)
+    mode = mode or retrieval_mode(database)
+    if mode not in RETRIEVERS:
+        raise ValueError(f"Invalid retrieval mode: {mode}. Must be one of {list(RETRIEVERS)}.")
+    with _lock:
+        key = (database, mode)
+        if key not in _retrievers:
+            _retrievers[key] = RETRIEVERS[mode](database)
+        return _retrievers[key]
+
+
+def retriever_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every retriever created in this process, keyed by database/mode"""
+    with _lock:
+        clients = list(_retrievers.items())
+    return {f"{database}/{mode}": client.stats() for (database, mode), client in clients if hasattr(client, "stats")}
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+from llm_utils import adaptive_concurrency
+from llm_utils.adaptive_concurrency import AIMDLimiter
+
+FAST, SLOW = 0.05, 0.5
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(adaptive_concurrency, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def limiter(**kwargs) -> AIMDLimiter:
+    return AIMDLimiter(**{"initial": 4, "target_p95": 0.1, "max_limit": 6, "backoff": 0.5, "window": 10, **kwargs})
+
+
+def saturate(limiter: AIMDLimiter):
+    """As if every slot under the current limit had been in use"""
+    limiter.peak_in_flight = limiter.limit
+
+
+def test_limit_is_judged_once_per_window(clock):
+    aimd = limiter()
+    saturate(aimd)
+    # A window at limit 4 is max(4, 5) samples
+    for _ in range(4):
+        aimd.record(FAST)
+    assert aimd.limit == 4
+    aimd.record(FAST)
+    assert aimd.limit == 5
+    # A fresh window starts at the new limit, without the samples taken at the old one
+    assert len(aimd.samples) == 0 and aimd.since_adjustment == 0
+
+
+def test_no_growth_without_load(clock):
+    aimd = limiter()
+    aimd.peak_in_flight = 2
+    for _ in range(15):
+        aimd.record(FAST)
+    assert aimd.limit == 4 and aimd.history == [(0.0, 4)]
+
+
+def test_backoff_on_slow_window_and_on_error(clock):
+    aimd = limiter()
+    for _ in range(5):
+        aimd.record(SLOW)
+    assert aimd.limit == 2
+    # Errors back off at once, down to min_limit
+    aimd.record(FAST, ok=False)
+    aimd.record(FAST, ok=False)
+    assert aimd.limit == 1
+    summary = aimd.summary()
+    assert summary["errors"] == 2 and summary["adjustments"] == 3
+
+
+def test_growth_stops_at_max_limit(clock):
+    aimd = limiter(max_limit=5)
+    for _ in range(3):
+        saturate(aimd)
+        for _ in range(5):
+            aimd.record(FAST)
+    assert aimd.limit == 5
+
+
+def test_settled_weighs_the_second_half_of_the_run(clock):
+    aimd = limiter()
+    clock.now = 2
+    saturate(aimd)
+    for _ in range(5):
+        aimd.record(FAST)
+    clock.now = 6
+    for _ in range(5):
+        aimd.record(SLOW)
+    assert [limit for _, limit in aimd.history] == [4, 5, 2]
+    clock.now = 10
+    # Second half is t=5..10: limit 5 for one second, then 2 for four
+    assert aimd.settled() == pytest.approx((5 * 1 + 2 * 4) / 5)
+    assert aimd.summary()["settled_limit"] == 2.6
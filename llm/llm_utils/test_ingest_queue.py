@@ -0,0 +1,82 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from llm_utils import ingest_queue
+from llm_utils.ingest_queue import IngestQueue
+
+
+class Uploader:
+    """Stands in for requests.post to /upload-articles; calls block until `release` is set"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = []
+        self.release = threading.Event()
+        self.error = error
+
+    def __call__(self, url, params=None, timeout=None):
+        self.calls.append((url, params))
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+
+def until(condition, timeout: float = 5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def uploader(monkeypatch):
+    uploader = Uploader()
+    monkeypatch.setattr(ingest_queue.requests, "post", uploader)
+    return uploader
+
+
+def test_duplicate_triggers_collapse(uploader):
+    queue = IngestQueue(min_interval=60, timeout=1, mode="incremental")
+    assert queue.enqueue("numpy")["status"] == "queued"
+    until(lambda: queue.running == "numpy")
+
+    # Running, waiting and recently finished runs all absorb new triggers
+    assert queue.enqueue("numpy")["status"] == "deduplicated"
+    assert queue.enqueue("postgres")["status"] == "queued"
+    assert queue.enqueue("postgres")["status"] == "deduplicated"
+    stats = queue.as_dict()
+    assert stats["running"] == "numpy" and stats["waiting"] == ["postgres"] and stats["oldest_waiting_s"] > 0
+
+    uploader.release.set()
+    until(lambda: queue.as_dict()["completed"] == 2)
+    assert queue.enqueue("numpy")["status"] == "deduplicated"
+
+    stats = queue.as_dict()
+    assert (stats["triggered"], stats["enqueued"], stats["deduplicated"]) == (5, 2, 3)
+    assert [params for _, params in uploader.calls] == [{"mode": "incremental"}] * 2
+    assert uploader.calls[0][0].endswith(":8004/upload-articles")
+    assert uploader.calls[1][0].endswith(":8001/upload-articles")
+    # postgres waited behind numpy's run
+    runs = stats["last_runs"]
+    assert [run["database"] for run in runs] == ["numpy", "postgres"]
+    assert runs[1]["lag_s"] > runs[0]["lag_s"] and runs[0]["duration_s"] > 0
+    assert stats["mean_lag_s"] > 0 and stats["runs_per_hour"] > 0
+
+
+def test_failed_runs_are_counted(monkeypatch):
+    uploader = Uploader(error=requests.ConnectionError("refused"))
+    uploader.release.set()
+    monkeypatch.setattr(ingest_queue.requests, "post", uploader)
+    queue = IngestQueue(min_interval=0, timeout=1)
+
+    queue.enqueue("clickhouse")
+    until(lambda: queue.as_dict()["failed"] == 1)
+    assert "refused" in queue.as_dict()["last_runs"][0]["error"]
+    # Without a minimum interval the next trigger runs again
+    assert queue.enqueue("clickhouse")["status"] == "queued"
+    until(lambda: queue.as_dict()["failed"] == 2)
@@ -0,0 +1,133 @@
+import json
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from llm_utils import jobs
+from llm_utils.jobs import Job, JobManager
+
+CHUNK = 4
+
+
+class FakeApp:
+    """Answers question "i" with its context; the first answer to each question in `fail` is an error"""
+
+    def __init__(self, latency: float = 0.01, fail=()):
+        self.latency = latency
+        self.fail = set(fail)
+        self.calls = {}
+        self.events = []
+        self.lock = threading.Lock()
+
+    def answer_question(self, question, database, context, run_id):
+        index = int(question)
+        with self.lock:
+            self.calls[index] = self.calls.get(index, 0) + 1
+            first = self.calls[index] == 1
+        time.sleep(self.latency)
+        with self.lock:
+            self.events.append(("answered", index))
+        if index in self.fail and first:
+            return {"answer": "Error: backend unavailable"}
+        return {"answer": f"ok {context}"}
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Questions of every /related-articles/batch call, in call order"""
+    batches = []
+
+    def related_batch(questions):
+        batches.append(list(questions))
+        return [f"context for {q}" for q in questions]
+
+    monkeypatch.setattr(jobs, "retriever", lambda database: SimpleNamespace(related_batch=related_batch))
+    monkeypatch.setattr(jobs, "to_documents", lambda rows: rows)
+    monkeypatch.setattr(jobs, "check_database", lambda database: None)
+    monkeypatch.setattr(jobs, "RELATED_BATCH_SIZE", CHUNK)
+    return batches
+
+
+def submit(manager: JobManager, total: int, max_workers: int = 4) -> Job:
+    return manager.submit([str(i) for i in range(total)], "numpy", max_workers, "run")
+
+
+def test_context_is_fetched_a_chunk_ahead(batches, tmp_path):
+    app = FakeApp(latency=0.05)
+    fetched = {}
+
+    async def main():
+        job = submit(JobManager(app, worker_budget=4, state_dir=str(tmp_path)), 10)
+        while not job.task.done():
+            fetched.setdefault(len(batches), len(app.events))
+            await asyncio.sleep(0.005)
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "completed" and job.completed == 10 and job.failed == 0
+    assert batches == [["0", "1", "2", "3"], ["4", "5", "6", "7"], ["8", "9"]]
+    # The second chunk's context was requested before the first chunk had been answered
+    assert fetched[2] < CHUNK
+    # Every answer got its own question's context
+    for record in job.read_results(limit=100):
+        assert record["answer"]["answer"] == f"ok context for {record['index']}"
+
+
+def test_cancel(batches, tmp_path):
+    manager = JobManager(FakeApp(latency=0.1), worker_budget=4, state_dir=str(tmp_path))
+
+    async def main():
+        job = submit(manager, 40, max_workers=2)
+        await asyncio.sleep(0.25)
+        assert manager.cancel(job)
+        await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "cancelled" and 0 < job.completed < 40
+    with open(f"{job.path}/job.json") as f:
+        assert json.load(f)["status"] == "cancelled"
+    # Nothing left to cancel
+    assert not manager.cancel(job)
+
+
+def test_resume_retries_failed_answers(batches, tmp_path):
+    app = FakeApp(fail={1, 6})
+    manager = JobManager(app, worker_budget=4, state_dir=str(tmp_path))
+
+    async def main():
+        job = submit(manager, 8)
+        await job.task
+        assert job.status == "completed" and job.failed == 2
+        manager.resume(job)
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "completed" and job.completed == 8 and job.failed == 0
+    # Only the failed questions were asked again, with their context fetched again
+    assert batches[-1] == ["1", "6"]
+    assert sorted(i for i, n in app.calls.items() if n > 1) == [1, 6]
+    # Both answers are kept; the latest one counts, also after a restart
+    assert len(job.read_results(limit=100)) == 10
+    loaded = JobManager(app, worker_budget=4, state_dir=str(tmp_path)).get(job.id)
+    assert loaded.completed == 8 and loaded.failed == 0
+    # A complete job without failures has nothing to resume
+    with pytest.raises(ValueError):
+        manager.resume(loaded)
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    job = Job("job", ["a", "b"], "numpy", 1, "run", str(tmp_path))
+    job.save_questions()
+    job.append_result({"index": 0, "question": "a", "success": True})
+    with open(job.results_path, "a", encoding="utf-8") as f:
+        f.write('{"index": 1, "quest')
+
+    assert [r["index"] for r in job.read_results()] == [0]
+    assert job.outcomes() == {0: True}
+    results, position = job.read_from(0)
+    assert len(results) == 1 and job.read_from(position) == ([], position)
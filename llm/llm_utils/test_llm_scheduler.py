@@ -0,0 +1,91 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_utils.llm_scheduler import FakeLLM, LLMScheduler, ScheduledLLM, TokenBucket, estimate_tokens
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drained(rpm: float, tpm: float) -> LLMScheduler:
+    """A scheduler whose budgets start empty, so every call waits for its refill"""
+    scheduler = LLMScheduler(rpm, tpm)
+    scheduler.requests.level = scheduler.tokens.level = 0
+    return scheduler
+
+
+def test_token_bucket_refills_continuously():
+    clock = Clock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == 1.0
+    clock.now = 0.5
+    assert bucket.wait_time(1) == 0.5
+    clock.now = 120
+    # Never above capacity, and amounts over capacity only need a full bucket
+    assert bucket.wait_time(1000) == 0.0
+    assert bucket.level == 60
+
+
+def test_settle_charges_actual_tokens():
+    clock = Clock()
+    scheduler = LLMScheduler(60, 6000, clock)
+    scheduler.acquire("run", 1000)
+    assert scheduler.tokens.level == 5000
+    # The response used 1500 tokens, not the 1000 estimated: later calls pay for the difference
+    scheduler.settle(1000, 1500, model_ms=10)
+    assert scheduler.tokens.level == 4500
+    # Without reported usage the estimate stands
+    scheduler.settle(1000, None, model_ms=10)
+    assert scheduler.tokens.level == 4500
+    assert scheduler.as_dict()["actual_tokens"] == 2500
+
+
+def test_rpm_budget_holds():
+    llm = ScheduledLLM(FakeLLM(latency=0), drained(rpm=600, tpm=10 ** 9))
+    started = time.perf_counter()
+    for _ in range(5):
+        llm.invoke("question")
+    # 10 requests a second once the budget is spent
+    assert time.perf_counter() - started >= 0.45
+
+
+def test_tpm_budget_holds():
+    prompt = "x" * 400
+    cost = estimate_tokens(prompt)
+    # FakeLLM reports the same usage as estimated, so settle does not refund anything
+    fake = FakeLLM(latency=0, output_tokens=cost - len(prompt) // 4)
+    llm = ScheduledLLM(fake, drained(rpm=10 ** 6, tpm=cost * 600))
+    started = time.perf_counter()
+    for _ in range(4):
+        llm.invoke(prompt)
+    assert time.perf_counter() - started >= 0.35
+
+
+def test_runs_take_turns():
+    """A single question queued behind a batch is not served after the whole batch"""
+    order, guard = [], threading.Lock()
+
+    class Recording(FakeLLM):
+        def invoke(self, prompt):
+            with guard:
+                order.append(prompt)
+            return super().invoke(prompt)
+
+    llm = ScheduledLLM(Recording(latency=0), drained(rpm=1200, tpm=10 ** 9))
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        batch = [executor.submit(llm.invoke, "batch", "batch") for _ in range(8)]
+        time.sleep(0.02)
+        single = [executor.submit(llm.invoke, "single", "single") for _ in range(2)]
+        for future in batch + single:
+            future.result()
+
+    assert order.count("batch") == 8 and order.count("single") == 2
+    # Round robin: the single run's calls alternate with the batch instead of waiting behind it
+    assert max(i for i, run in enumerate(order) if run == "single") <= 4
@@ -0,0 +1,130 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from llm_utils.retrieval_policy import HEDGE_MIN_SAMPLES, CircuitBreaker, CircuitOpenError, RetrievalPolicy
+from llm_utils.retrievers import InProcessRetriever
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def failing(error):
+    def fn(*args, timeout):
+        raise error
+    return fn
+
+
+def test_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(threshold=2, reset_seconds=0.05)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    # One trial call at a time while half-open
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and breaker.as_dict()["times_opened"] == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_only_backend_failures_open_the_circuit():
+    policy = RetrievalPolicy("test", deadline=1, breaker=CircuitBreaker(threshold=2, reset_seconds=60))
+    for error in (http_error(404), http_error(422), ValueError("bad question")):
+        for _ in range(3):
+            with pytest.raises(type(error)):
+                policy.call(failing(error))
+    assert policy.breaker.state == "closed"
+
+    for error in (http_error(503), requests.ConnectionError("refused")):
+        with pytest.raises(type(error)):
+            policy.call(failing(error))
+    assert policy.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        policy.call(failing(ValueError()))
+    assert policy.as_dict()["short_circuited"] == 1
+
+
+def test_client_error_closes_a_half_open_circuit():
+    policy = RetrievalPolicy("test", deadline=1, breaker=CircuitBreaker(threshold=1, reset_seconds=0.05))
+    with pytest.raises(requests.Timeout):
+        policy.call(failing(requests.Timeout()))
+    time.sleep(0.06)
+    # The backend answered, if only to refuse the request: the trial call must not leave the circuit stuck
+    with pytest.raises(requests.HTTPError):
+        policy.call(failing(http_error(400)))
+    assert policy.breaker.state == "closed"
+
+
+def test_hedge_fires_after_warm_up():
+    policy = RetrievalPolicy("test", deadline=2, hedge_percentile=50)
+    calls = []
+
+    def fn(question, timeout):
+        calls.append(question)
+        # The first attempt of the slow question stalls; its duplicate answers right away
+        if question == "slow" and calls.count("slow") == 1:
+            time.sleep(0.5)
+        else:
+            time.sleep(0.01)
+        return question
+
+    for _ in range(HEDGE_MIN_SAMPLES - 1):
+        policy.call(fn, "fast")
+    assert policy.hedge_delay() is None
+    policy.call(fn, "fast")
+    assert policy.hedge_delay() is not None
+
+    started = time.perf_counter()
+    assert policy.call(fn, "slow") == "slow"
+    assert time.perf_counter() - started < 0.4
+    stats = policy.as_dict()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    # Nothing is hedged once the caller opts out
+    policy.call(fn, "fast", hedge=False)
+    assert policy.as_dict()["hedged"] == 1
+
+
+def test_deadline_expiry():
+    policy = RetrievalPolicy("test", hedge_percentile=0, breaker=CircuitBreaker(threshold=1, reset_seconds=60))
+
+    def stalls(timeout):
+        time.sleep(0.5)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        policy.call(stalls, deadline=0.1)
+    assert time.perf_counter() - started < 0.3
+    assert policy.as_dict()["deadline_exceeded"] == 1
+    assert policy.breaker.state == "open"
+
+
+def test_in_process_calls_stop_waiting_for_a_stuck_dao():
+    class StuckDao:
+        def related_articles(self, question):
+            time.sleep(0.5)
+            return []
+
+    retriever = InProcessRetriever("numpy")
+    retriever.dao = StuckDao()
+    stuck = threading.Thread(target=retriever.search, args=("first",))
+    stuck.start()
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        retriever.search("second", timeout=0.1)
+    assert time.perf_counter() - started < 0.3
+    stuck.join()
+    assert retriever.search("third", timeout=1) == []
@@ -0,0 +1,13 @@
+import os
+import sys
+
+from llm_utils import retrievers
+from llm_utils.retrievers import ROOT, InProcessRetriever
+
+
+def test_loading_daos_does_not_grow_sys_path(monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.setitem(retrievers.DAOS, "fake", ("numpy_store", "json", "JSONDecoder"))
+    for _ in range(3):
+        InProcessRetriever("fake").load_dao()
+    assert sys.path.count(os.path.join(ROOT, "services", "numpy_store")) == 1
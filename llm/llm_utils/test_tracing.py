@@ -0,0 +1,55 @@
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+
+from llm_utils.tracing import FileTracer, Tracing, truncate
+
+
+def test_truncate():
+    long = "x" * 50
+    assert truncate(long, 10) == f"{'x' * 10}... [50 chars]"
+    assert truncate("short", 10) == "short"
+    assert truncate(long, 0) == long
+    # Nested inputs keep their shape; documents become dicts; other values pass through
+    values = {"question": long, "context": [Document(page_content=long, metadata={"url": long})], "k": 5}
+    assert truncate(values, 10) == {
+        "question": truncate(long, 10),
+        "context": [{"page_content": truncate(long, 10), "metadata": {"url": truncate(long, 10)}}],
+        "k": 5,
+    }
+
+
+def test_sampling(tmp_path):
+    random.seed(7)
+    tracing = Tracing(mode="file", sample_rate=0.25, path=str(tmp_path / "traces.jsonl"))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        callbacks = list(executor.map(lambda _: tracing.callbacks(), range(2000)))
+
+    stats = tracing.stats()
+    # Every question is counted once, from however many threads
+    assert stats["sampled"] + stats["skipped"] == 2000
+    assert stats["sampled"] == sum(1 for c in callbacks if c)
+    assert 400 < stats["sampled"] < 600
+    assert all(isinstance(c[0], FileTracer) for c in callbacks if c)
+
+
+def test_off_and_full_rates(tmp_path):
+    assert Tracing(mode="off", sample_rate=1.0).callbacks() == []
+    full = Tracing(mode="file", sample_rate=1.0, path=str(tmp_path / "traces.jsonl"))
+    assert all(full.callbacks() for _ in range(50))
+    assert full.stats()["skipped"] == 0
+
+
+def test_traced_run_is_written_truncated(tmp_path):
+    from langchain_core.runnables import RunnableLambda
+
+    path = tmp_path / "traces.jsonl"
+    tracing = Tracing(mode="file", sample_rate=1.0, max_chars=8, path=str(path))
+    with tracing.run(run_name="question", tags=["numpy"]) as config:
+        RunnableLambda(lambda question: question.upper()).invoke("a long question", config=config)
+
+    (trace,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert trace["name"] == "question" and trace["tags"] == ["numpy"]
+    assert trace["outputs"]["output"] == "A LONG Q... [15 chars]"
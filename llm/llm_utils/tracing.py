@@ -0,0 +1,155 @@
+import os
+import json
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from langchain_core.tracers import LangChainTracer
+from langchain_core.tracers.base import BaseTracer
+from langsmith import Client
+from langsmith.run_helpers import tracing_context
+
+# langsmith: send sampled runs to LangSmith; file: append them to TRACE_FILE; off: no tracing.
+# Defaults to langsmith when LANGSMITH_TRACING=true, else off.
+TRACE_MODES = ("langsmith", "file", "off")
+# Fraction of questions traced; each question is traced whole or not at all
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+# Strings (article bodies, prompts, answers) are cut to this many characters in traces; 0 keeps them whole
+TRACE_MAX_FIELD_CHARS = int(os.getenv("TRACE_MAX_FIELD_CHARS", 1000))
+TRACE_FILE = os.getenv("TRACE_FILE", "data/traces/traces.jsonl")
+
+
+def truncate(value: Any, max_chars: int = TRACE_MAX_FIELD_CHARS) -> Any:
+    """Copy of a run's inputs or outputs with long strings cut short; Documents become dicts"""
+    if not max_chars:
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}... [{len(value)} chars]"
+    if isinstance(value, dict):
+        return {key: truncate(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [truncate(item, max_chars) for item in value]
+    if hasattr(value, "page_content") and hasattr(value, "metadata"):
+        return {"page_content": truncate(value.page_content, max_chars),
+                "metadata": truncate(dict(value.metadata), max_chars)}
+    return value
+
+
+class FileTracer(BaseTracer):
+    """Writes each finished root run, with its child runs, as one JSON line.
+
+    For offline runs: the trace has the same shape as in LangSmith but never leaves the host.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str = TRACE_FILE, max_chars: int = TRACE_MAX_FIELD_CHARS, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_chars = max_chars
+
+    def to_dict(self, run) -> Dict[str, Any]:
+        return {
+            "id": str(run.id),
+            "name": run.name,
+            "run_type": run.run_type,
+            "start_time": run.start_time.isoformat() if run.start_time else None,
+            "end_time": run.end_time.isoformat() if run.end_time else None,
+            "tags": run.tags or [],
+            "metadata": (run.extra or {}).get("metadata", {}),
+            "inputs": truncate(run.inputs, self.max_chars),
+            "outputs": truncate(run.outputs, self.max_chars),
+            "error": run.error,
+            "child_runs": [self.to_dict(child) for child in run.child_runs],
+        }
+
+    def _persist_run(self, run) -> None:
+        line = json.dumps(self.to_dict(run), default=str)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Tracing:
+    """Decides per question whether its graph run is traced, and where the trace goes.
+
+    LANGSMITH_TRACING on its own traces every run in full. Runs started through run() are instead
+    traced only when sampled, through a tracer that truncates long fields before they are sent,
+    so the cost of tracing scales with TRACE_SAMPLE_RATE and TRACE_MAX_FIELD_CHARS.
+    """
+
+    def __init__(self, mode: Optional[str] = None, sample_rate: float = TRACE_SAMPLE_RATE,
+                 max_chars: int = TRACE_MAX_FIELD_CHARS, path: str = TRACE_FILE):
+        default = "langsmith" if os.getenv("LANGSMITH_TRACING", "false").lower() == "true" else "off"
+        self.mode = mode or os.getenv("TRACE_MODE", default)
+        if self.mode not in TRACE_MODES:
+            raise ValueError(f"Invalid trace mode: {self.mode}. Must be one of {TRACE_MODES}.")
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.path = path
+        self.client = None
+        if self.mode == "langsmith":
+            hide = lambda values: truncate(values, self.max_chars)
+            self.client = Client(hide_inputs=hide, hide_outputs=hide)
+        self.sampled = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def tracer(self):
+        if self.mode == "langsmith":
+            return LangChainTracer(client=self.client)
+        return FileTracer(self.path, self.max_chars)
+
+    def callbacks(self) -> List[BaseTracer]:
+        """Tracer for one run, or none when tracing is off or the run is not sampled"""
+        sampled = self.mode != "off" and random.random() < self.sample_rate
+        with self.lock:
+            if sampled:
+                self.sampled += 1
+            else:
+                self.skipped += 1
+        return [self.tracer()] if sampled else []
+
+    @contextmanager
+    def run(self, run_name: Optional[str] = None, tags: List[str] = None, metadata: Dict[str, Any] = None):
+        """Config for one graph invocation; LANGSMITH_TRACING's own tracing is off inside the block"""
+        config = {"callbacks": self.callbacks(), "tags": tags or [], "metadata": metadata or {}}
+        if run_name:
+            config["run_name"] = run_name
+        with untraced():
+            yield config
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            sampled, skipped = self.sampled, self.skipped
+        return {
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "max_field_chars": self.max_chars,
+            "sampled": sampled,
+            "skipped": skipped,
+        }
+
+
+@contextmanager
+def untraced():
+    """Runs inside are not traced automatically, whatever LANGSMITH_TRACING says"""
+    with tracing_context(enabled=False):
+        yield
+
+
+_shared = None
+_shared_guard = threading.Lock()
+
+
+def tracing() -> Tracing:
+    """Process-wide Tracing configured from the environment"""
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = Tracing()
+            logging.info(f"Tracing: {_shared.stats()}")
+        return _shared
@@ -0,0 +1,190 @@
+"""Export/import a portable embedding snapshot so every backend can be loaded with the same corpus.
+
+A snapshot is a directory holding:
+    embeddings.npy    float32 (N, dim) matrix, read back memory-mapped
+    articles.parquet  url, title, body, publication_date in the same row order
+    manifest.json     row count, dimension, model, reduction and source backend
+
+Usage (from the repository root):
+    python -m scripts.embedding_snapshot export --backend postgres --path snapshots/guardian
+    python -m scripts.embedding_snapshot import --backend clickhouse --path snapshots/guardian
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import importlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services.common.reduction import embedding_space
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EMBEDDINGS_FILE = "embeddings.npy"
+ARTICLES_FILE = "articles.parquet"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+# backend -> (service directory, module, DAO class)
+DAOS = {
+    "clickhouse": ("clickhouse", "services.clickhouse.clickhouse_dao", "ClickhouseDao"),
+    "postgres": ("postgres", "services.postgres.postgres_dao", "PostgresDao"),
+    "cassandra": ("cassandra", "services.cassandra.cassandra_dao", "CassandraDao"),
+    "numpy": ("numpy_store", "services.numpy_store.numpy_store_dao", "NumpyStoreDao"),
+}
+
+ARTICLE_SCHEMA = pa.schema([
+    ("url", pa.string()),
+    ("title", pa.string()),
+    ("body", pa.string()),
+    ("publication_date", pa.timestamp("ms", tz="UTC")),
+])
+
+
+def load_dao(backend: str):
+    """Instantiate the DAO for a backend"""
+    if backend not in DAOS:
+        raise ValueError(f"Invalid backend: {backend}. Must be one of {list(DAOS)}.")
+    service_dir, module_name, class_name = DAOS[backend]
+    # Some services import their siblings by flat module name
+    sys.path.append(os.path.join(ROOT, "services", service_dir))
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)()
+
+
+def to_datetime(value):
+    """Normalize the publication dates the backends hand back (datetime or ISO string) to UTC"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def export_snapshot(dao, path: str, source: str, batch_size: int = 1000):
+    """Dump every article and embedding from a DAO into a snapshot directory"""
+    os.makedirs(path, exist_ok=True)
+    raw_path = os.path.join(path, EMBEDDINGS_FILE + ".raw")
+    count, dim = 0, None
+
+    # Row count is unknown up front, so embeddings are streamed to a raw file and wrapped in an .npy at the end
+    with open(raw_path, "wb") as raw, pq.ParquetWriter(os.path.join(path, ARTICLES_FILE), ARTICLE_SCHEMA) as writer:
+        for rows in dao.export_articles(batch_size):
+            if not rows:
+                continue
+            embeddings = np.asarray([row[4] for row in rows], dtype=np.float32)
+            if dim is None:
+                dim = embeddings.shape[1]
+            elif embeddings.shape[1] != dim:
+                raise ValueError(f"Inconsistent embedding dimension: {embeddings.shape[1]} != {dim}")
+            raw.write(embeddings.tobytes())
+
+            writer.write_table(pa.table({
+                "url": [row[0] for row in rows],
+                "title": [row[1] for row in rows],
+                "body": [row[2] for row in rows],
+                "publication_date": [to_datetime(row[3]) for row in rows],
+            }, schema=ARTICLE_SCHEMA))
+            count += len(rows)
+            logging.info(f"Exported {count} articles...")
+
+    dim = dim or 0
+    out = np.lib.format.open_memmap(os.path.join(path, EMBEDDINGS_FILE), mode="w+", dtype=np.float32, shape=(count, dim))
+    if count:
+        out[:] = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(count, dim))
+    out.flush()
+    del out
+    os.remove(raw_path)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "source": source,
+        "model": embedding_space().name,
+        # Projection version (see services/common/reduction.py), None for full-dimension vectors
+        "reduction": embedding_space().version,
+        "count": count,
+        "dim": dim,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info(f"Snapshot written to {path}: {count} articles, dim={dim}")
+    return manifest
+
+
+def read_manifest(path: str):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+    return manifest
+
+
+def read_snapshot(path: str, batch_size: int = 1000):
+    """Yield (url, title, body, publication_date, embedding) row batches from a snapshot"""
+    manifest = read_manifest(path)
+
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+    if embeddings.shape[0] != manifest["count"]:
+        raise ValueError(f"Snapshot is corrupt: {embeddings.shape[0]} embeddings for {manifest['count']} articles")
+
+    offset = 0
+    for batch in pq.ParquetFile(os.path.join(path, ARTICLES_FILE)).iter_batches(batch_size=batch_size):
+        columns = batch.to_pydict()
+        n = batch.num_rows
+        block = embeddings[offset:offset + n]
+        yield list(zip(columns["url"], columns["title"], columns["body"], columns["publication_date"], block))
+        offset += n
+
+
+def import_snapshot(dao, path: str, batch_size: int = 1000):
+    """Bulk load a snapshot into a DAO without re-embedding anything"""
+    # Vectors from another model would land in this model's table and be silently wrong
+    # (or another projection of the same model)
+    space = embedding_space()
+    manifest = read_manifest(path)
+    if manifest["model"] != space.name:
+        raise ValueError(f"Snapshot holds {manifest['model']} embeddings but EMBEDDING_MODEL is {space.model.key} "
+                         f"({space.name})")
+    if manifest.get("reduction") != space.version:
+        raise ValueError(f"Snapshot holds {manifest.get('reduction') or 'full-dimension'} embeddings but the "
+                         f"configured reduction is {space.version or 'none'}")
+    loaded = 0
+    for rows in read_snapshot(path, batch_size):
+        loaded += dao.insert_articles(rows) or 0
+        logging.info(f"Loaded {loaded} articles...")
+    logging.info(f"Snapshot {path} imported: {loaded} articles inserted")
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a portable embedding snapshot")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("--backend", required=True, choices=list(DAOS))
+    parser.add_argument("--path", required=True, help="Snapshot directory")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    dao = load_dao(args.backend)
+    if args.action == "export":
+        export_snapshot(dao, args.path, args.backend, args.batch_size)
+    else:
+        import_snapshot(dao, args.path, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import os
 import logging
-import requests
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 from cassandra.cluster import Cluster
 from cassandra.query import SimpleStatement
+from services.common.dedupe import ArticleDeduper
+from services.common.ingest import IngestInProgress, guardian_pages
+from services.common.near_duplicates import collapse, mark_stored
+from services.common.parallel_encode import encode_texts
+from services.common.reduction import embedding_space
+from services.common.result_cache import corpus_version
 
 # Configure logging
 logging.basicConfig(
@@ -14,11 +18,57 @@ logging.basicConfig(
 )
 
 
-def pull_docs(total_needed: int = 1000, page_size: int = 1):
+def index_name(table: str, name: str) -> str:
+    """Index names are per keyspace, so the per-model tables prefix theirs"""
+    return name if table == "articles" else f"{table}_{name}"
+
+
+def ensure_table(session, keyspace: str, table: str, dim: int):
+    """Create an embedding model's articles table with its SAI indexes"""
+    session.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            url text PRIMARY KEY,
+            title text,
+            body text,
+            publication_date timestamp,
+            vector vector<float, {dim}>,
+            content_hash text
+        );
+    """)
+
+    columns = session.execute(f"""
+        SELECT column_name FROM system_schema.columns
+        WHERE keyspace_name = '{keyspace}' AND table_name = '{table}';
+    """)
+
+    if 'content_hash' not in [row.column_name for row in columns]:
+        session.execute(f"ALTER TABLE {table} ADD content_hash text;")
+
+    rows = session.execute(f"""
+        SELECT index_name FROM system_schema.indexes
+        WHERE keyspace_name = '{keyspace}' AND table_name = '{table}';
+    """)
+
+    existing_indexes = [row.index_name for row in rows]
+
+    if index_name(table, 'ann_index') not in existing_indexes:
+        session.execute(f"""
+            CREATE CUSTOM INDEX IF NOT EXISTS {index_name(table, 'ann_index')} ON {table}(vector)
+            USING 'StorageAttachedIndex';
+        """)
+
+    if index_name(table, 'publication_date_index') not in existing_indexes:
+        session.execute(f"""
+            CREATE CUSTOM INDEX IF NOT EXISTS {index_name(table, 'publication_date_index')} ON {table}(publication_date)
+            USING 'StorageAttachedIndex';
+        """)
+
+
+def pull_docs(total_needed: int = 1000, page_size: int = 1, mode: str = "latest",
+              from_date: str = None, to_date: str = None):
 
     load_dotenv()
     API_KEY = os.getenv("GUARDIAN_API_KEY")
-    BASE = "https://content.guardianapis.com/search"
     all_articles = []
     pages = total_needed // page_size
 
@@ -35,95 +85,109 @@ def pull_docs(total_needed: int = 1000, page_size: int = 1):
     """)
     session.set_keyspace(keyspace)
 
-    session.execute(f"""
-        CREATE TABLE IF NOT EXISTS articles (
-            url text PRIMARY KEY,
-            title text,
-            body text,
-            publication_date text,
-            vector vector<float, 384>
-        );
-    """)
+    embedding = embedding_space()
+    table = embedding.table("articles")
+    ensure_table(session, keyspace, table, embedding.dim)
 
-    rows = session.execute(f"""
-        SELECT index_name FROM system_schema.indexes
-        WHERE keyspace_name = '{keyspace}' AND table_name = 'articles';
+    model = embedding.encoder()
+    articles_inserted = 0
+    articles_updated = 0
+    articles_skipped = 0
+    articles_collapsed = 0
+
+    lookup_cql = SimpleStatement(f"SELECT url, content_hash FROM {table} WHERE url IN %s")
+    insert_cql = SimpleStatement(f"""
+        INSERT INTO {table} (url, title, body, publication_date, vector, content_hash)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        IF NOT EXISTS;
+    """)
+    # Plain INSERT is an upsert in Cassandra; used to overwrite articles whose content changed
+    update_cql = SimpleStatement(f"""
+        INSERT INTO {table} (url, title, body, publication_date, vector, content_hash)
+        VALUES (%s, %s, %s, %s, %s, %s);
     """)
 
-    existing_indexes = [row.index_name for row in rows]
+    def stored_hashes(urls):
+        stored = {}
+        # Keep IN lists small; each entry is a separate partition read
+        for start in range(0, len(urls), 100):
+            for row in session.execute(lookup_cql, (tuple(urls[start:start + 100]),)):
+                stored[row.url] = row.content_hash
+        return stored
 
-    if 'ann_index' not in existing_indexes:
-        session.execute("""
-            CREATE CUSTOM INDEX IF NOT EXISTS ann_index ON articles(vector)
-            USING 'StorageAttachedIndex';
-        """)
+    deduper = ArticleDeduper(stored_hashes)
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    articles_inserted = 0
-    articles_skipped = 0
+    def stored_texts():
+        return [(row.url, row.title, row.body) for row in session.execute(f"SELECT url, title, body FROM {table}")]
 
     try:
-        for page in range(1, pages + 1):
-            params = {
-                "api-key": API_KEY,
-                "order-by": "newest",
-                "page-size": page_size,
-                "page": page,
-                "show-fields": "all",
-            }
-
-            logging.info(f"--- Fetching page {page} ---")
-            logging.debug(f"Request URL: {BASE}")
-
-            resp = requests.get(BASE, params=params)
-
-            data = resp.json().get("response", {})
-            results = data.get("results", [])
+        pages_iter = guardian_pages(API_KEY, "cassandra", page_size, pages, mode, from_date, to_date)
+        for page, results in enumerate(pages_iter, start=1):
             all_articles.extend(results)
 
-            logging.info(f"Fetched {len(results)} items from page {page}")
-
-            if not results:
-                logging.warning("No results returned, stopping...")
-                break
+            logging.info(f"Fetched {len(results)} items from page {page} ({mode})")
+
+            articles = [
+                {
+                    "url": result['fields']['shortUrl'],
+                    "title": result['fields']['headline'],
+                    "body": result['fields']['bodyText'],
+                    "publication_date": result['fields']['firstPublicationDate'],
+                }
+                for result in results
+            ]
+
+            # Only new or modified articles reach the encoder
+            new, modified, unchanged = deduper.split(articles)
+            articles_skipped += len(unchanged)
+            for article in unchanged:
+                logging.info(f"  ⏭️  SKIPPED (unchanged): {article['title'][:50]}...")
+
+            # Near-copies of stored articles under new URLs collapse into the stored one
+            canonical = collapse("cassandra", new, stored_texts)
+            articles_collapsed += len(new) - len(canonical)
+            to_embed = canonical + modified
+            modified_urls = {a["url"] for a in modified}
+            embeddings = encode_texts(model, [a["body"] for a in to_embed]) if to_embed else []
 
             # Process each article
-            for i, result in enumerate(results):
-                article = result['fields']
-                url = article['shortUrl']
-                title = article['headline']
-                body = article['bodyText']
-                publication_date = article['firstPublicationDate']
-
+            for article, embedding in zip(to_embed, embeddings):
+                title = article["title"]
                 logging.info(f"  Title: {title[:100]}...")
 
-                embedding = model.encode(body)
-                embedding_list = [float(x) for x in embedding]
-
-                insert_cql = SimpleStatement(f"""
-                    INSERT INTO articles (url, title, body, publication_date, vector)
-                    VALUES (%s, %s, %s, %s, %s)
-                    IF NOT EXISTS;
-                """)
+                params = (article["url"], title, article["body"], article["publication_date"],
+                          [float(x) for x in embedding], article["content_hash"])
 
-                result = session.execute(insert_cql, (url, title, body, publication_date, embedding_list))
-
-                if result.was_applied:
+                if article["url"] in modified_urls:
+                    session.execute(update_cql, params)
+                    articles_updated += 1
+                    logging.info(f"  🔄 UPDATED: {title[:50]}...")
+                elif session.execute(insert_cql, params).was_applied:
                     articles_inserted += 1
                     logging.info(f"  ✅ INSERTED: {title[:50]}...")
                 else:
                     articles_skipped += 1
                     logging.info(f"  ⏭️  SKIPPED (duplicate): {title[:50]}...")
+                deduper.mark_stored([article])
+                mark_stored("cassandra", [article])
+            # Results the service cached before this page no longer reflect the table
+            if to_embed:
+                corpus_version("cassandra", table).bump()
 
-            logging.info(f"Page {page} summary: {articles_inserted} inserted, {articles_skipped} skipped")
+            logging.info(f"Page {page} summary: {articles_inserted} inserted, {articles_updated} updated, {articles_skipped} skipped")
 
         logging.info("=== FINAL SUMMARY ===")
         logging.info(f"Articles inserted: {articles_inserted}")
+        logging.info(f"Articles updated (content changed): {articles_updated}")
         logging.info(f"Articles skipped (duplicates): {articles_skipped}")
-        logging.info(f"Total processed: {articles_inserted + articles_skipped}")
+        logging.info(f"Articles collapsed (near-duplicates): {articles_collapsed}")
+        logging.info(f"Total processed: {articles_inserted + articles_updated + articles_skipped}")
 
         cluster.shutdown()
         return True
+    except IngestInProgress:
+        cluster.shutdown()
+        return "skipped"
     except Exception as e:
         logging.error(f"❌ Pipeline failed: {e}")
         cluster.shutdown()
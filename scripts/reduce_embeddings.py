@@ -0,0 +1,98 @@
+"""Fit a PCA projection on a backend's corpus and load the reduced vectors into their own table.
+
+The projection is fitted on the full-dimension embeddings a backend already stores and saved under
+PROJECTION_PATH as <model>/<version>.npz; `load` re-projects those same stored vectors (no
+re-embedding) into the table for that version. Services pick it up with EMBEDDING_REDUCTION=pca:<dim>
+(PROJECTION_VERSION pins a version, otherwise the latest fit is used). Matryoshka truncation needs no
+fit: `load --method truncate` fills the truncated table directly.
+
+Usage (from the repository root):
+    python -m scripts.reduce_embeddings fit --backend postgres --dim 128
+    python -m scripts.reduce_embeddings load --backend postgres --dim 128
+    python -m scripts.reduce_embeddings load --backend numpy --method truncate --dim 256
+"""
+import os
+import logging
+import argparse
+
+import numpy as np
+
+from scripts.embedding_snapshot import DAOS, load_dao
+from services.common.embedding_models import embedding_model
+from services.common.reduction import fit_pca
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def full_dao(backend: str):
+    """DAO over the model's full-dimension table"""
+    os.environ["EMBEDDING_REDUCTION"] = "none"
+    return load_dao(backend)
+
+
+def reduced_dao(backend: str, method: str, dim: int, version: str = None):
+    """DAO over the table of one projection version, which its encoder applies to queries"""
+    os.environ["EMBEDDING_REDUCTION"] = f"{method}:{dim}"
+    if version:
+        os.environ["PROJECTION_VERSION"] = version
+    else:
+        os.environ.pop("PROJECTION_VERSION", None)
+    return load_dao(backend)
+
+
+def fit(backend: str, dim: int, sample: int = None, batch_size: int = 1000):
+    """Fit and save a PCA projection on (a prefix sample of) the stored embeddings"""
+    blocks, count = [], 0
+    for rows in full_dao(backend).export_articles(batch_size):
+        blocks.append(np.asarray([row[4] for row in rows], dtype=np.float32))
+        count += len(rows)
+        if sample and count >= sample:
+            break
+    if not blocks:
+        raise ValueError(f"No embeddings stored in {backend} to fit a projection on")
+    embeddings = np.concatenate(blocks)[:sample]
+    projection = fit_pca(embedding_model().key, embeddings, dim)
+    file = projection.save()
+    logging.info(f"Projection {projection.version} fitted on {projection.fitted_rows} rows keeps "
+                 f"{projection.explained_variance:.1%} of the variance; saved to {file}")
+    return projection
+
+
+def load(backend: str, method: str, dim: int, version: str = None, batch_size: int = 1000):
+    """Project the stored full-dimension vectors into the reduced table"""
+    source = full_dao(backend)
+    target = reduced_dao(backend, method, dim, version)
+    loaded = 0
+    for rows in source.export_articles(batch_size):
+        vectors = target.model.project([row[4] for row in rows])
+        loaded += target.insert_articles([(*row[:4], vector) for row, vector in zip(rows, vectors)]) or 0
+        logging.info(f"Loaded {loaded} articles...")
+    logging.info(f"{loaded} {target.embedding.version} vectors loaded into "
+                 f"{getattr(target, 'table', None) or getattr(target, 'data_dir', None)}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit or load a reduced embedding space")
+    parser.add_argument("action", choices=["fit", "load"])
+    parser.add_argument("--backend", required=True, choices=list(DAOS))
+    parser.add_argument("--dim", type=int, required=True)
+    parser.add_argument("--method", choices=["pca", "truncate"], default="pca")
+    parser.add_argument("--version", help="PCA version to load (default: the latest fit for --dim)")
+    parser.add_argument("--sample", type=int, help="Fit on the first N stored embeddings only")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.action == "fit":
+        fit(args.backend, args.dim, args.sample, args.batch_size)
+    else:
+        load(args.backend, args.method, args.dim, args.version, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import requests
 import os
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 import clickhouse_connect
+from services.common.encoder import load_encoder
+from services.common.parallel_encode import encode_texts
+from services.common.quantization import clickhouse_int8_expression, clickhouse_binary_expression
 
 load_dotenv()
 
@@ -11,7 +13,7 @@ class GuardianVectorizer:
     def __init__(self):
         self.API_KEY = os.getenv("GUARDIAN_API_KEY")
         self.BASE = "https://content.guardianapis.com/search"
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')  # Lightweight model for embeddings
+        self.model = load_encoder()  # Lightweight model for embeddings; backend set by ENCODER_BACKEND
         self.client = None
 
     def connect_clickhouse(self):
@@ -44,14 +46,18 @@ class GuardianVectorizer:
         except Exception as e:
             print(f"Warning: Could not drop table: {e}")
 
-        create_table_query = """
+        create_table_query = f"""
         CREATE TABLE guardian_articles (
             url String NOT NULL,
             title String NOT NULL,
             body String NOT NULL,
             publication_date DateTime64(3, 'UTC'),
-            embedding Array(Float64) NOT NULL
+            embedding Array(Float64) NOT NULL,
+            content_hash String DEFAULT '',
+            embedding_i8 Array(Int8) MATERIALIZED {clickhouse_int8_expression()},
+            embedding_bin Array(UInt64) MATERIALIZED {clickhouse_binary_expression()}
         ) ENGINE = MergeTree()
+        PARTITION BY toYYYYMM(publication_date)
         ORDER BY (url, publication_date)
         """
 
@@ -111,12 +117,12 @@ class GuardianVectorizer:
         """Generate embeddings for articles"""
         embeddings = []
 
-        for article in articles:
-            # Combine title and body text for embedding
-            text_for_embedding = f"{article.get('title', '')} {article.get('body', '')}"
+        # Combine title and body text for embedding; encoded in one batch (across processes with ENCODE_WORKERS)
+        texts = [f"{article.get('title', '')} {article.get('body', '')}" for article in articles]
+        vectors = encode_texts(self.model, texts) if texts else []
 
-            # Generate embedding
-            embedding = self.model.encode(text_for_embedding).tolist()
+        for article, vector in zip(articles, vectors):
+            embedding = vector.tolist()
 
             # Add embedding to article data
             article_with_embedding = {
@@ -1,10 +1,17 @@
 from http.client import HTTPException
 
-from sentence_transformers import SentenceTransformer
 import os
+import time
 import logging
 from dotenv import load_dotenv
 from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement
+from scripts.pull_docs_cassandra import ensure_table, index_name
+from services.common.dedupe import content_hash
+from services.common.filters import date_range
+from services.common.reduction import embedding_space
+from services.common.result_cache import ResultCache
 
 # Configure logging
 logging.basicConfig(
@@ -21,12 +28,21 @@ class CassandraDao:
     def __init__(self):
         self.API_KEY = os.getenv("GUARDIAN_API_KEY")
         self.BASE = "https://content.guardianapis.com/search"
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The model's vectors, optionally reduced; each (model, projection) pair has its own table
+        self.embedding = embedding_space()
+        self.table = self.embedding.table("articles")
+        self.model = self.embedding.encoder()
+        # Top-k results per query vector, invalidated by every ingest into the table
+        self.results = ResultCache("cassandra", self.table)
         self.client = None
+        self.table_ready = False
+        self.last_stages = None
         logging.info("DAO initialized.")
 
     def connect_cassandra(self):
-        """Connect to Cassandra database"""
+        """Connect to Cassandra database, reusing the open session"""
+        if self.client is not None and not self.client.is_shutdown:
+            return True
         try:
             cassandra_host = os.getenv("CASSANDRA_HOST", "localhost")
             cassandra_port = int(os.getenv("CASSANDRA_PORT", 9042))
@@ -34,6 +50,9 @@ class CassandraDao:
 
             cluster = Cluster([cassandra_host], port=cassandra_port)
             self.client = cluster.connect(cassandra_keyspace)
+            if not self.table_ready:
+                ensure_table(self.client, cassandra_keyspace, self.table, self.embedding.dim)
+                self.table_ready = True
 
             logging.info("Connected to Cassandra successfully.")
             print("Connected to Cassandra successfully")
@@ -44,33 +63,159 @@ class CassandraDao:
             self.client = None
             return False
 
-    def related_articles(self, query: str, limit: int = 5):
+    def related_articles(self, query: str, limit: int = 5, from_date=None, to_date=None):
+        """ANN search over the SAI vector index, optionally restricted to a publication-date window.
+
+        The window is evaluated by an SAI index on publication_date alongside the ANN ordering.
+        """
         try:
+            encode_started = time.perf_counter()
+            emb = self.model.encode(query).tolist()
+            encode_ms = (time.perf_counter() - encode_started) * 1000
+            start, end = date_range(from_date, to_date)
+
+            # A cached top-k skips the connection as well as the search
+            cache_key = self.results.key(emb, limit=limit, from_date=start, to_date=end)
+            cached = self.results.get(cache_key)
+            if cached is not None:
+                self.last_stages = {"encode_ms": encode_ms, "search_ms": 0.0}
+                return cached
+
             if not self.connect_cassandra():
                 raise HTTPException(500, "Failed to connect to database")
             conn = self.client
             if conn is None:
                 raise HTTPException(500, "Database connection is None")
 
-            emb = self.model.encode(query).tolist()
+            conditions, params = [], []
+            if start:
+                conditions.append("publication_date >= ?")
+                params.append(start)
+            if end:
+                conditions.append("publication_date < ?")
+                params.append(end)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            if conditions:
+                self.ensure_date_index()
 
-            query_cql = """
+            query_cql = f"""
                 SELECT url, title, body, publication_date
-                FROM articles
+                FROM {self.table}
+                {where}
                 ORDER BY vector ANN OF ?
                 LIMIT ?
             """
 
+            search_started = time.perf_counter()
             prepared = self.client.prepare(query_cql)
-            rows = self.client.execute(prepared, (emb, limit))
+            rows = self.client.execute(prepared, (*params, emb, limit))
 
             results = [(row.url, row.title, row.body, row.publication_date, "No Similarity Score") for row in rows]
+            self.last_stages = {"encode_ms": encode_ms, "search_ms": (time.perf_counter() - search_started) * 1000}
 
             if not results:
                 raise HTTPException(404, "No matches found")
 
+            self.results.put(cache_key, results, self.last_stages["search_ms"])
             return results
 
+        except ValueError:
+            # Bad date window, or date filters on a text publication_date; the controller answers 400
+            raise
         except Exception as e:
             logging.error(f"Exception in /search endpoint: {e}", exc_info=True)
             raise HTTPException(500, str(e))
+
+    def related_articles_batch(self, queries, limit: int = 5):
+        """ANN search for several queries: one forward pass, then concurrent executes of one prepared statement"""
+        try:
+            if not self.connect_cassandra():
+                raise HTTPException(500, "Failed to connect to database")
+            if self.client is None:
+                raise HTTPException(500, "Database connection is None")
+
+            embeddings = self.model.encode(list(queries), batch_size=len(queries))
+            prepared = self.client.prepare(f"""
+                SELECT url, title, body, publication_date
+                FROM {self.table}
+                ORDER BY vector ANN OF ?
+                LIMIT ?
+            """)
+            outcomes = execute_concurrent_with_args(
+                self.client, prepared, [(embedding.tolist(), limit) for embedding in embeddings],
+                concurrency=int(os.getenv("CASSANDRA_BATCH_CONCURRENCY", 32))
+            )
+
+            results = []
+            for success, rows in outcomes:
+                if not success:
+                    raise rows
+                results.append([(row.url, row.title, row.body, row.publication_date, "No Similarity Score")
+                                for row in rows])
+            return results
+
+        except Exception as e:
+            logging.error(f"Exception in /search batch endpoint: {e}", exc_info=True)
+            raise HTTPException(500, str(e))
+
+    def ensure_date_index(self):
+        """Create the SAI index that serves publication-date filters"""
+        table = self.client.cluster.metadata.keyspaces[self.client.keyspace].tables[self.table]
+        if table.columns["publication_date"].cql_type != "timestamp":
+            raise ValueError("publication_date is stored as text; date filters need the TIMESTAMP column "
+                             "from init/01-schema.cql")
+        self.client.execute(f"""
+            CREATE CUSTOM INDEX IF NOT EXISTS {index_name(self.table, 'publication_date_index')} ON {self.table}(publication_date)
+            USING 'StorageAttachedIndex'
+        """)
+
+    def export_articles(self, batch_size: int = 1000):
+        """Stream every stored article with its embedding, in batches of row tuples"""
+        if not self.connect_cassandra():
+            raise HTTPException(500, "Failed to connect to database")
+
+        statement = SimpleStatement(
+            f"SELECT url, title, body, publication_date, vector FROM {self.table}",
+            fetch_size=batch_size
+        )
+        batch = []
+        for row in self.client.execute(statement):
+            batch.append((row.url, row.title, row.body, row.publication_date, row.vector))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def insert_articles(self, rows, concurrency: int = 64):
+        """Bulk insert pre-embedded (url, title, body, publication_date, embedding) rows"""
+        if not self.connect_cassandra():
+            raise HTTPException(500, "Failed to connect to database")
+
+        # The schema file declares publication_date as TIMESTAMP but pull_docs creates it as text
+        table = self.client.cluster.metadata.keyspaces[self.client.keyspace].tables[self.table]
+        as_text = table.columns["publication_date"].cql_type == "text"
+
+        prepared = self.client.prepare(
+            f"INSERT INTO {self.table} (url, title, body, publication_date, vector, content_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)"
+        )
+        params = [
+            (
+                url,
+                title,
+                body,
+                publication_date.isoformat() if as_text and hasattr(publication_date, "isoformat") else publication_date,
+                [float(x) for x in embedding],
+                content_hash(title, body)
+            )
+            for url, title, body, publication_date, embedding in rows
+        ]
+        results = execute_concurrent_with_args(self.client, prepared, params, concurrency=concurrency,
+                                               raise_on_first_error=False)
+        self.results.bump()
+        failures = [result for success, result in results if not success]
+        if failures:
+            logging.error(f"{len(failures)} of {len(params)} inserts into {self.table} failed, first: {failures[0]}")
+            raise RuntimeError(f"{len(failures)} of {len(params)} inserts into {self.table} failed: {failures[0]}")
+        return len(params)
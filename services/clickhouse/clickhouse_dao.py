@@ -1,11 +1,25 @@
 import clickhouse_connect
-from sentence_transformers import SentenceTransformer
 import os
+import time
+import numpy as np
 import logging
 import requests
 from pydantic import BaseModel
 from datetime import datetime
 from dotenv import load_dotenv
+from services.common.batch import group_by_query
+from services.common.dedupe import ArticleDeduper, content_hash
+from services.common.filters import date_range
+from services.common.ingest import IngestInProgress, guardian_pages
+from services.common.near_duplicates import collapse, mark_stored
+from services.common.parallel_encode import encode_texts
+from services.common.reduction import embedding_space
+from services.common.result_cache import ResultCache
+from services.common.quantization import (
+    quantization_level, candidate_count, quantize_int8, binary_words,
+    clickhouse_int8_expression, clickhouse_binary_expression
+)
+from services.common.rerank import embedding_matrix, rerank as rerank_candidates
 
 # Configure logging
 logging.basicConfig(
@@ -30,9 +44,18 @@ class ClickhouseDao:
     def __init__(self):
         self.API_KEY = os.getenv("GUARDIAN_API_KEY")
         self.BASE = "https://content.guardianapis.com/search"
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The model's vectors, optionally reduced; each (model, projection) pair has its own table
+        self.embedding = embedding_space()
+        self.table = self.embedding.table("guardian_articles")
+        self.model = self.embedding.encoder()
+        # Top-k results per query vector, invalidated by every insert or delete
+        self.results = ResultCache("clickhouse", self.table)
         self.client = None
+        self.last_read_rows = None
+        self.last_stages = None
         self.connect_clickhouse()
+        self.ensure_schema()
+        self.deduper = ArticleDeduper(self.stored_hashes)
         logging.info("DAO initialized.")
 
     def connect_clickhouse(self):
@@ -54,6 +77,106 @@ class ClickhouseDao:
             self.client = None
             return False
 
+    def ensure_schema(self):
+        """Create the model's table if needed and add columns introduced after it was first created"""
+        if self.client is None:
+            return
+        try:
+            # Each embedding model has its own table, so several models' vectors can coexist
+            self.client.command(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                url String NOT NULL,
+                title String NOT NULL,
+                body String NOT NULL,
+                publication_date DateTime64(3, 'UTC'),
+                embedding Array(Float64) NOT NULL,
+                content_hash String DEFAULT '',
+                embedding_i8 Array(Int8) MATERIALIZED {clickhouse_int8_expression()},
+                embedding_bin Array(UInt64) MATERIALIZED {clickhouse_binary_expression(dim=self.embedding.dim)}
+            ) ENGINE = MergeTree()
+            PARTITION BY toYYYYMM(publication_date)
+            ORDER BY (url, publication_date)
+            """)
+            self.client.command(
+                f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS content_hash String DEFAULT ''"
+            )
+
+            # Compact codes for quantized candidate search; MATERIALIZED so every insert path fills them
+            existing = {row[0] for row in self.client.query(
+                "SELECT name FROM system.columns WHERE database = currentDatabase() AND table = %(table)s",
+                parameters={"table": self.table}
+            ).result_rows}
+            quantized_columns = {
+                "embedding_i8": f"Array(Int8) MATERIALIZED {clickhouse_int8_expression()}",
+                "embedding_bin": f"Array(UInt64) MATERIALIZED {clickhouse_binary_expression(dim=self.embedding.dim)}",
+            }
+            for name, definition in quantized_columns.items():
+                if name not in existing:
+                    self.client.command(f"ALTER TABLE {self.table} ADD COLUMN {name} {definition}")
+                    # Backfill rows written before the column existed (runs as a background mutation)
+                    self.client.command(f"ALTER TABLE {self.table} MATERIALIZE COLUMN {name}")
+
+            if not self.partition_key():
+                logging.warning(f"{self.table} is not partitioned; date filters will scan every part. "
+                                "Run ClickhouseDao().repartition_by_month() to migrate.")
+        except Exception as e:
+            logging.error(f"Failed to update {self.table} schema: {e}")
+
+    def partition_key(self) -> str:
+        return self.client.query(
+            "SELECT partition_key FROM system.tables WHERE database = currentDatabase() AND name = %(table)s",
+            parameters={"table": self.table}
+        ).result_rows[0][0]
+
+    def repartition_by_month(self):
+        """Rebuild the model's table with monthly partitions so date filters prune whole partitions"""
+        partition_key = self.partition_key()
+        if partition_key:
+            logging.info(f"{self.table} already partitioned by {partition_key}.")
+            return False
+
+        staging = f"{self.table}_repartitioned"
+        logging.info(f"Repartitioning {self.table} by month...")
+        self.client.command(f"DROP TABLE IF EXISTS {staging}")
+        self.client.command(
+            f"""
+            CREATE TABLE {staging} AS {self.table}
+            ENGINE = MergeTree()
+            PARTITION BY toYYYYMM(publication_date)
+            ORDER BY (url, publication_date)
+            """
+        )
+        self.client.command(
+            f"""
+            INSERT INTO {staging} (url, title, body, publication_date, embedding, content_hash)
+            SELECT url, title, body, publication_date, embedding, content_hash FROM {self.table}
+            """
+        )
+        self.client.command(f"EXCHANGE TABLES {self.table} AND {staging}")
+        self.client.command(f"DROP TABLE {staging}")
+        logging.info(f"{self.table} repartitioned.")
+        return True
+
+    def stored_hashes(self, urls):
+        """Map each already-stored URL to its content hash"""
+        result = self.client.query(
+            f"SELECT url, any(content_hash) FROM {self.table} WHERE url IN %(urls)s GROUP BY url",
+            parameters={"urls": urls}
+        )
+        return dict(result.result_rows)
+
+    def stored_texts(self):
+        """(url, title, body) of every stored article, for seeding the near-duplicate index"""
+        return self.client.query(f"SELECT url, title, body FROM {self.table}").result_rows
+
+    def delete_articles(self, urls):
+        """Remove stored rows for the given URLs so they can be re-inserted"""
+        self.client.command(
+            f"DELETE FROM {self.table} WHERE url IN %(urls)s",
+            parameters={"urls": urls}
+        )
+        self.results.bump()
+
     def fetch_guardian_articles(self, page_size=10, total_needed=50):
         """Fetch articles from Guardian API"""
         all_articles = []
@@ -82,19 +205,34 @@ class ClickhouseDao:
         print(f"Total articles fetched: {len(all_articles)}")
         return all_articles
 
-    def generate_embeddings(self, articles):
-        """Generate embeddings for articles"""
-        logging.info(f"Generating embeddings for {len(articles)} articles.")
-        rows = []
+    def parse_articles(self, articles):
+        """Extract the stored fields from raw Guardian API results"""
+        parsed = []
         for article in articles:
             fields = article.get('fields', {})
-            url = fields.get('shortUrl', '')
-            title = fields.get('headline', '')
-            body = fields.get('bodyText', '')
-            publication_date = fields.get('firstPublicationDate', '2024-01-01T00:00:00Z')
-            embedding = self.model.encode(body).tolist()
-            row = [url, title, body, publication_date, embedding]
-            rows.append(row)
+            parsed.append({
+                "url": fields.get('shortUrl', ''),
+                "title": fields.get('headline', ''),
+                "body": fields.get('bodyText', ''),
+                "publication_date": fields.get('firstPublicationDate', '2024-01-01T00:00:00Z'),
+            })
+        return parsed
+
+    def generate_embeddings(self, articles):
+        """Generate embeddings for parsed articles"""
+        logging.info(f"Generating embeddings for {len(articles)} articles.")
+        embeddings = encode_texts(self.model, [article["body"] for article in articles])
+        rows = [
+            [
+                article["url"],
+                article["title"],
+                article["body"],
+                article["publication_date"],
+                embedding.tolist(),
+                article.get("content_hash") or content_hash(article["title"], article["body"])
+            ]
+            for article, embedding in zip(articles, embeddings)
+        ]
         logging.info("Embeddings generated.")
         return rows
 
@@ -113,10 +251,11 @@ class ClickhouseDao:
                 logging.info(f"Inserting {len(articles_with_embeddings)} rows into ClickHouse...")
                 print('Inserting rows into ClickHouse...')
                 self.client.insert(
-                    'guardian_articles',
+                    self.table,
                     articles_with_embeddings,
-                    column_names=['url', 'title', 'body', 'publication_date', 'embedding']
+                    column_names=['url', 'title', 'body', 'publication_date', 'embedding', 'content_hash']
                 )
+                self.results.bump()
                 logging.info("Rows inserted successfully.")
                 return True
         except Exception as e:
@@ -124,14 +263,80 @@ class ClickhouseDao:
             print(f"Single record failed: {e}")
             return False
 
-    def related_articles(self, query: str, limit: int = 5):
-        """Search for similar articles using vector similarity"""
+    def export_articles(self, batch_size: int = 1000):
+        """Stream every stored article with its embedding, in batches of row tuples"""
+        if self.client is None:
+            logging.error("No ClickHouse connection available.")
+            return
+
+        with self.client.query_row_block_stream(
+            f"SELECT url, title, body, publication_date, embedding FROM {self.table}",
+            settings={"max_block_size": batch_size}
+        ) as stream:
+            for block in stream:
+                yield block
+
+    def insert_articles(self, rows):
+        """Bulk insert pre-embedded (url, title, body, publication_date, embedding) rows.
+
+        The MergeTree does not dedupe by URL, so URLs already stored (or repeated in the batch) are
+        dropped first; re-importing a snapshot leaves the table as it was, like on the other backends.
+        """
+        stored = set(self.stored_hashes(list({row[0] for row in rows}))) if rows else set()
+        new = []
+        for url, title, body, publication_date, embedding in rows:
+            if url in stored:
+                continue
+            stored.add(url)
+            new.append([url, title, body, publication_date, [float(x) for x in embedding], content_hash(title, body)])
+        if not new or not self.upload_to_clickhouse(new):
+            return 0
+        return len(new)
+
+    def related_articles(self, query: str, limit: int = 5, quantization: str = None,
+                         from_date=None, to_date=None):
+        """Search for similar articles using vector similarity.
+
+        With int8 or binary quantization, candidates are ranked over the compact codes and only
+        the best candidate_count(limit) are re-ranked exactly against the Float64 embeddings.
+        A publication-date window is applied before ranking; with monthly partitions ClickHouse
+        prunes every partition outside it.
+        """
         if self.client is None:
             print("No ClickHouse connection available")
             return []
 
+        level = quantization_level(quantization)
+        if level == "halfvec":
+            raise ValueError("halfvec quantization is only available in Postgres")
+
+        date_filter, parameters = self.date_filter(from_date, to_date)
+
         # Generate embedding for the query
-        query_embedding = self.model.encode(query).tolist()
+        encode_started = time.perf_counter()
+        embedding = self.model.encode(query)
+        query_embedding = embedding.tolist()
+        encode_ms = (time.perf_counter() - encode_started) * 1000
+
+        cache_key = self.results.key(embedding, limit=limit, quantization=level, **parameters)
+        cached = self.results.get(cache_key)
+        if cached is not None:
+            self.last_stages = {"encode_ms": encode_ms, "search_ms": 0.0}
+            self.last_read_rows = 0
+            return cached
+
+        candidate_order = self.candidate_order(level, embedding)
+
+        filters = [date_filter] if date_filter else []
+        if level != "none":
+            candidate_filter = f" WHERE {date_filter}" if date_filter else ""
+            # url is the primary key prefix, so the outer scan only reads the candidates' granules
+            filters.append(f"""url IN (
+            SELECT url FROM {self.table}{candidate_filter}
+            ORDER BY {candidate_order}
+            LIMIT {candidate_count(limit)}
+        )""")
+        where = f"\n        WHERE {' AND '.join(filters)}" if filters else ""
 
         # Search query using cosine similarity
         search_query = f"""
@@ -141,29 +346,187 @@ class ClickhouseDao:
             body,
             publication_date,
             cosineDistance(embedding, {query_embedding}) as distance
-        FROM guardian_articles
+        FROM {self.table}{where}
         ORDER BY distance ASC
         LIMIT {limit}
         """
 
         try:
-            result = self.client.query(search_query)
+            search_started = time.perf_counter()
+            result = self.client.query(search_query, parameters=parameters or None)
+            self.last_stages = {"encode_ms": encode_ms, "search_ms": (time.perf_counter() - search_started) * 1000}
+            self.last_read_rows = int(result.summary.get("read_rows", 0)) if result.summary else None
+            self.results.put(cache_key, result.result_rows, self.last_stages["search_ms"])
             return result.result_rows
         except Exception as e:
             print(f"Search failed: {e}")
             return []
 
-    def upload_articles(self):
+    @staticmethod
+    def date_filter(from_date=None, to_date=None):
+        """SQL condition for a publication-date window (empty without one) and its parameters"""
+        start, end = date_range(from_date, to_date)
+        conditions, parameters = [], {}
+        if start:
+            conditions.append("publication_date >= %(from_date)s")
+            parameters["from_date"] = start.replace(tzinfo=None)
+        if end:
+            conditions.append("publication_date < %(to_date)s")
+            parameters["to_date"] = end.replace(tzinfo=None)
+        return " AND ".join(conditions), parameters
+
+    @staticmethod
+    def candidate_order(level: str, embedding) -> str:
+        """ORDER BY expression ranking rows for a query; over the compact codes when quantized"""
+        if level == "int8":
+            return f"dotProduct(embedding_i8, {quantize_int8(embedding).tolist()}) DESC"
+        if level == "binary":
+            return f"arraySum(arrayMap((a, b) -> bitCount(bitXor(a, b)), embedding_bin, {binary_words(embedding)})) ASC"
+        return f"cosineDistance(embedding, {np.asarray(embedding).tolist()}) ASC"
+
+    def related_articles_columnar(self, query: str, limit: int = 5, candidates: int = None, rerank: str = "exact",
+                                  mmr_lambda: float = 0.5, min_score: float = None, quantization: str = None,
+                                  from_date=None, to_date=None):
+        """Search with client-side re-ranking over Arrow columns.
+
+        The top candidates (candidate_count(limit) by default), embeddings included, come back as one
+        Arrow table. The embedding column is viewed as a NumPy matrix without building per-row
+        Python objects, re-scored and re-ranked in NumPy (exact, mmr or threshold), and only the
+        final rows are materialized. With int8 or binary quantization the candidates are ranked
+        over the compact codes and the exact re-scoring happens here instead of in ClickHouse.
+        Rows keep the (url, title, body, publication_date, distance) contract. Needs pyarrow.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError("rerank needs pyarrow, which is not installed in this service") from None
+
+        if self.client is None:
+            print("No ClickHouse connection available")
+            return []
+
+        level = quantization_level(quantization)
+        if level == "halfvec":
+            raise ValueError("halfvec quantization is only available in Postgres")
+
+        date_filter, parameters = self.date_filter(from_date, to_date)
+        where = f"\n        WHERE {date_filter}" if date_filter else ""
+
+        encode_started = time.perf_counter()
+        embedding = self.model.encode(query)
+        encode_ms = (time.perf_counter() - encode_started) * 1000
+
+        search_query = f"""
+        SELECT url, title, body, publication_date, embedding
+        FROM {self.table}{where}
+        ORDER BY {self.candidate_order(level, embedding)}
+        LIMIT {candidates or candidate_count(limit)}
+        """
+
+        try:
+            search_started = time.perf_counter()
+            table = self.client.query_arrow(search_query, parameters=parameters or None, use_strings=True)
+            fetch_ms = (time.perf_counter() - search_started) * 1000
+
+            rerank_started = time.perf_counter()
+            embeddings = embedding_matrix(table.column("embedding"), len(embedding))
+            idx, scores = rerank_candidates(embeddings, embedding, limit, rerank, mmr_lambda, min_score)
+            final = table.drop_columns(["embedding"]).take(pa.array(idx, pa.int64()))
+            self.last_stages = {
+                "encode_ms": encode_ms,
+                "search_ms": fetch_ms,
+                "rerank_ms": (time.perf_counter() - rerank_started) * 1000,
+            }
+            self.last_read_rows = table.num_rows
+            return [(*row, 1.0 - float(score)) for row, score in zip(zip(*final.to_pydict().values()), scores)]
+        except Exception as e:
+            print(f"Columnar search failed: {e}")
+            return []
+
+    def related_articles_batch(self, queries, limit: int = 5):
+        """Exact search for several queries in one pass over the table.
+
+        The queries are encoded in a single forward pass and ARRAY JOINed against every article,
+        so the embedding column is read once for the whole batch; LIMIT BY keeps each query's top rows.
+        """
+        if self.client is None:
+            print("No ClickHouse connection available")
+            return [[] for _ in queries]
+
+        embeddings = self.model.encode(list(queries), batch_size=len(queries))
+        query_vectors = [(i, embedding.tolist()) for i, embedding in enumerate(embeddings)]
+
+        search_query = f"""
+        SELECT
+            q.1 AS query_index,
+            url,
+            title,
+            body,
+            publication_date,
+            cosineDistance(embedding, q.2) AS distance
+        FROM {self.table}
+        ARRAY JOIN {query_vectors} AS q
+        ORDER BY query_index ASC, distance ASC
+        LIMIT {limit} BY query_index
+        """
+
+        try:
+            result = self.client.query(search_query)
+            return group_by_query(result.result_rows, len(queries))
+        except Exception as e:
+            print(f"Batch search failed: {e}")
+            return [[] for _ in queries]
+
+    def storage_stats(self):
+        """On-disk bytes of the full-precision and quantized embedding columns"""
+        rows = self.client.query(
+            """
+            SELECT name, data_compressed_bytes, data_uncompressed_bytes
+            FROM system.columns
+            WHERE database = currentDatabase() AND table = %(table)s AND name LIKE 'embedding%%'
+            """,
+            parameters={"table": self.table}
+        ).result_rows
+        names = {"embedding": "none", "embedding_i8": "int8", "embedding_bin": "binary"}
+        return {
+            names[name]: {"compressed_bytes": compressed, "uncompressed_bytes": uncompressed}
+            for name, compressed, uncompressed in rows if name in names
+        }
+
+    def store_page(self, results):
+        """Dedupe, vectorize and upload one page of raw Guardian results"""
+        articles = self.parse_articles(results)
+
+        # Only new or modified articles reach the encoder
+        new, modified, unchanged = self.deduper.split(articles)
+        if modified:
+            self.delete_articles([article["url"] for article in modified])
+        # Near-copies of stored articles under new URLs collapse into the stored one
+        to_embed = collapse("clickhouse", new, self.stored_texts) + modified
+        if not to_embed:
+            logging.info(f"All {len(articles)} articles already stored or near-duplicates, nothing to embed.")
+            return True
+
+        articles_with_embeddings = self.generate_embeddings(to_embed)
+        success = self.upload_to_clickhouse(articles_with_embeddings)
+        if success:
+            self.deduper.mark_stored(to_embed)
+            mark_stored("clickhouse", to_embed)
+        return success
+
+    def upload_articles(self, page_size=1, total_needed=10, mode="latest", from_date=None, to_date=None):
         """Run the complete pipeline to fetch, vectorize and upload Guardian articles"""
-        logging.info("Starting Guardian article vectorization pipeline...")
+        logging.info(f"Starting Guardian article vectorization pipeline ({mode})...")
+        pages = (total_needed + page_size - 1) // page_size
         try:
-            articles = self.fetch_guardian_articles(1, 10)
-            articles_with_embeddings = self.generate_embeddings(articles)
-            success = self.upload_to_clickhouse(articles_with_embeddings)
-            if success:
-                logging.info("Pipeline completed successfully")
-                return True
-            return False
+            # Each page is stored before the next is requested, which is what advances the checkpoint
+            for results in guardian_pages(self.API_KEY, "clickhouse", page_size, pages, mode, from_date, to_date):
+                if not self.store_page(results):
+                    return False
+            logging.info("Pipeline completed successfully")
+            return True
+        except IngestInProgress:
+            return "skipped"
         except Exception as e:
             logging.error(f"Pipeline failed: {e}")
             return False
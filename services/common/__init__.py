@@ -0,0 +1 @@
+# Helpers shared by the database services
\ No newline at end of file
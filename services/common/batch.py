@@ -0,0 +1,20 @@
+import os
+from typing import List
+
+from pydantic import BaseModel, Field
+
+# Upper bound on queries per /related-articles/batch request
+MAX_BATCH_QUERIES = int(os.getenv("RELATED_ARTICLES_MAX_BATCH", 256))
+
+
+class RelatedArticlesBatch(BaseModel):
+    queries: List[str] = Field(..., min_items=1, max_items=MAX_BATCH_QUERIES)
+    limit: int = Field(5, ge=1, le=100)
+
+
+def group_by_query(rows, n: int) -> list:
+    """Split (query_index, *row) result rows into one list of rows per query, in query order"""
+    grouped = [[] for _ in range(n)]
+    for query_index, *row in rows:
+        grouped[int(query_index)].append(tuple(row))
+    return grouped
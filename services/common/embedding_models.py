@@ -0,0 +1,42 @@
+import os
+import re
+from typing import NamedTuple
+
+
+class EmbeddingModel(NamedTuple):
+    key: str
+    name: str
+    dim: int
+    # Trained so that a prefix of the vector is itself a usable embedding (Matryoshka representation learning)
+    matryoshka: bool = False
+
+
+# Models every backend can index side by side; dimensions are multiples of 64 so the binary codes fit
+# UInt64 words. Keys name the per-model tables, so they must stay stable once data is ingested.
+EMBEDDING_MODELS = {
+    "minilm": EmbeddingModel("minilm", "all-MiniLM-L6-v2", 384),
+    "multi-qa-minilm": EmbeddingModel("multi-qa-minilm", "multi-qa-MiniLM-L6-cos-v1", 384),
+    "bge-small": EmbeddingModel("bge-small", "BAAI/bge-small-en-v1.5", 384),
+    "bge-base": EmbeddingModel("bge-base", "BAAI/bge-base-en-v1.5", 768),
+    "mpnet": EmbeddingModel("mpnet", "all-mpnet-base-v2", 768),
+    "mxbai-large": EmbeddingModel("mxbai-large", "mixedbread-ai/mxbai-embed-large-v1", 1024, matryoshka=True),
+}
+
+# The tables created before models were configurable hold this model's vectors and keep their names
+DEFAULT_MODEL = "minilm"
+
+
+def embedding_model(key: str = None) -> EmbeddingModel:
+    """Resolve the requested model, falling back to the EMBEDDING_MODEL environment variable"""
+    key = key or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+    if key not in EMBEDDING_MODELS:
+        raise ValueError(f"Invalid embedding model: {key}. Must be one of {list(EMBEDDING_MODELS)}.")
+    return EMBEDDING_MODELS[key]
+
+
+def table_name(base: str, key: str = None) -> str:
+    """Per-model table: the base name for the default model, base_<key> for the others"""
+    model = embedding_model(key)
+    if model.key == DEFAULT_MODEL:
+        return base
+    return f"{base}_{re.sub(r'[^a-z0-9]+', '_', model.key.lower())}"
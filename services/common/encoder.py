@@ -0,0 +1,72 @@
+import os
+import logging
+import platform
+from functools import lru_cache
+
+from sentence_transformers import SentenceTransformer
+
+from services.common.embedding_models import embedding_model
+
+# torch: PyTorch (the default); onnx: ONNX Runtime; openvino: OpenVINO. The last two need the
+# sentence-transformers[onnx] / [openvino] extras installed.
+ENCODER_BACKENDS = ("torch", "onnx", "openvino")
+
+# int8 weights published alongside the ONNX/OpenVINO exports of the sentence-transformers models
+ONNX_INT8_FILES = {
+    "arm64": "onnx/model_qint8_arm64.onnx",
+    "avx512_vnni": "onnx/model_qint8_avx512_vnni.onnx",
+    "avx512": "onnx/model_qint8_avx512.onnx",
+    "avx2": "onnx/model_quint8_avx2.onnx",
+}
+OPENVINO_INT8_FILE = "openvino/openvino_model_qint8_quantized.xml"
+
+
+def cpu_isa() -> str:
+    """Best instruction set the int8 ONNX kernels can use on this host"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def encoder_settings(backend: str = None, int8: bool = None):
+    """Resolve the backend and int8 flag, falling back to ENCODER_BACKEND and ENCODER_INT8"""
+    backend = backend or os.getenv("ENCODER_BACKEND", "torch")
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Invalid encoder backend: {backend}. Must be one of {ENCODER_BACKENDS}.")
+    if int8 is None:
+        int8 = os.getenv("ENCODER_INT8", "false") == "true"
+    if int8 and backend == "torch":
+        raise ValueError("int8 encoding needs the onnx or openvino encoder backend")
+    return backend, int8
+
+
+@lru_cache(maxsize=None)
+def _load(model_name: str, backend: str, int8: bool, file_name: str):
+    model_kwargs = {"file_name": file_name} if file_name else None
+    model = SentenceTransformer(model_name, backend=backend, model_kwargs=model_kwargs)
+    logging.info(f"Loaded {model_name} encoder (backend={backend}, int8={int8}, file={file_name or 'default'}).")
+    return model
+
+
+def load_encoder(model_name: str = None, backend: str = None, int8: bool = None) -> SentenceTransformer:
+    """SentenceTransformer for the configured inference backend, shared by every caller in the process.
+
+    model_name defaults to the EMBEDDING_MODEL (see services/common/embedding_models.py). The
+    returned model has the usual encode() API whatever the backend. ENCODER_MODEL_FILE
+    overrides the weights file inside the model repository (e.g. a locally exported int8 ONNX file).
+    """
+    model_name = model_name or embedding_model().name
+    backend, int8 = encoder_settings(backend, int8)
+    file_name = os.getenv("ENCODER_MODEL_FILE") or None
+    if file_name is None and int8:
+        file_name = ONNX_INT8_FILES[cpu_isa()] if backend == "onnx" else OPENVINO_INT8_FILE
+    return _load(model_name, backend, int8, file_name)
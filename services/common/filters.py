@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+
+
+def _parse(value, end: bool = False):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        value = str(value)
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        # A bare date as the upper bound covers that whole day
+        if end and len(value) == 10:
+            parsed += timedelta(days=1)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def date_range(from_date=None, to_date=None):
+    """Normalize a publication-date window to UTC datetimes: from is inclusive, to is exclusive.
+
+    Accepts ISO-8601 dates or datetimes (or datetime objects); either bound may be None.
+    """
+    start, end = _parse(from_date), _parse(to_date, end=True)
+    if start and end and start >= end:
+        raise ValueError(f"Empty date range: from {from_date} to {to_date}")
+    return start, end
@@ -0,0 +1,199 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import requests
+
+GUARDIAN_SEARCH_URL = "https://content.guardianapis.com/search"
+INGEST_MODES = ("latest", "incremental", "backfill")
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class IngestInProgress(RuntimeError):
+    """Another ingest run for the same backend holds its lock"""
+
+
+def _backend_lock(backend: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(backend, threading.Lock())
+
+
+def publication_date(result: dict):
+    """firstPublicationDate of a raw Guardian result, falling back to webPublicationDate"""
+    return result.get("fields", {}).get("firstPublicationDate") or result.get("webPublicationDate")
+
+
+class IngestCheckpoint:
+    """Per-backend ingest state persisted as JSON: the newest publication date seen and the backfill cursor."""
+
+    def __init__(self, backend: str, state_dir: str = None):
+        self.backend = backend
+        state_dir = state_dir or os.getenv("INGEST_STATE_DIR", "data/ingest_state")
+        self.path = os.path.join(state_dir, f"{backend}.json")
+        self.latest = None
+        self.backfill = {"from": None, "to": None, "page": 1, "done": False}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            state = json.load(f)
+        self.latest = state.get("latest")
+        self.backfill.update(state.get("backfill", {}))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"backend": self.backend, "latest": self.latest, "backfill": self.backfill}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def observe(self, results):
+        """Advance the watermark past every result in a stored page"""
+        dates = [d for d in (publication_date(r) for r in results) if d]
+        if dates and (self.latest is None or max(dates) > self.latest):
+            self.latest = max(dates)
+
+    def as_dict(self):
+        return {"backend": self.backend, "latest": self.latest, "backfill": dict(self.backfill)}
+
+
+def fetch_page(api_key: str, page: int, page_size: int, **filters):
+    """Fetch one page of Guardian search results; returns (results, total pages)"""
+    params = {
+        "api-key": api_key,
+        "page-size": page_size,
+        "page": page,
+        "show-fields": "all",
+    }
+    params.update({key.replace("_", "-"): value for key, value in filters.items() if value is not None})
+    resp = requests.get(GUARDIAN_SEARCH_URL, params=params, timeout=30)
+    resp.raise_for_status()
+    data = resp.json().get("response", {})
+    return data.get("results", []), data.get("pages", 0)
+
+
+def guardian_pages(api_key: str, backend: str, page_size: int = 10, max_pages: int = 1, mode: str = "latest",
+                   from_date: str = None, to_date: str = None):
+    """Yield pages of raw Guardian results for one ingest run.
+
+    latest:      newest articles from page 1, the original behaviour. Leaves the checkpoint alone.
+    incremental: only articles first published on or after the persisted watermark, oldest first,
+                 so the watermark advances page by page. Only this mode moves the watermark: a
+                 latest or backfill run that saw newer articles would otherwise make the next
+                 incremental run skip everything published in between.
+    backfill:    walks from to_date (default: today) back towards from_date, resuming at the page
+                 recorded in its own cursor.
+
+    The checkpoint is saved only after the caller asks for the next page, i.e. once the previous
+    page has been stored, so an interrupted run resumes where it stopped. Runs for the same backend
+    are serialized; a run that finds another one in progress raises IngestInProgress on its first page.
+    """
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Invalid ingest mode: {mode}. Must be one of {INGEST_MODES}.")
+
+    lock = _backend_lock(backend)
+    if not lock.acquire(blocking=False):
+        logging.warning(f"Ingest already running for {backend}, skipping this run.")
+        raise IngestInProgress(f"Ingest already running for {backend}")
+
+    try:
+        checkpoint = IngestCheckpoint(backend)
+
+        if mode == "latest":
+            for page in range(1, max_pages + 1):
+                results, _ = fetch_page(api_key, page, page_size, order_by="newest")
+                if not results:
+                    break
+                yield results
+
+        elif mode == "incremental":
+            watermark = checkpoint.latest
+            since = watermark[:10] if watermark else None
+            order = "oldest" if since else "newest"
+            logging.info(f"Incremental ingest for {backend} since {watermark or 'the beginning'}")
+            page, yielded = 1, 0
+            while yielded < max_pages:
+                results, pages = fetch_page(api_key, page, page_size, order_by=order,
+                                            use_date="first-publication", from_date=since)
+                # from-date has day granularity: drop what the watermark already covers and do not
+                # count those pages, so a busy day cannot stall the watermark
+                if watermark:
+                    results = [r for r in results if (publication_date(r) or "") >= watermark]
+                if results:
+                    yield results
+                    yielded += 1
+                    checkpoint.observe(results)
+                    checkpoint.save()
+                if page >= pages:
+                    break
+                page += 1
+
+        else:
+            to_date = to_date or checkpoint.backfill["to"] or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            from_date = from_date if from_date is not None else checkpoint.backfill["from"]
+            if (from_date, to_date) != (checkpoint.backfill["from"], checkpoint.backfill["to"]):
+                # A new range restarts the cursor; the same range resumes it
+                checkpoint.backfill = {"from": from_date, "to": to_date, "page": 1, "done": False}
+            if checkpoint.backfill["done"]:
+                logging.info(f"Backfill for {backend} up to {to_date} already complete.")
+                return
+
+            start = checkpoint.backfill["page"]
+            logging.info(f"Backfill for {backend}: {checkpoint.backfill['from']}..{to_date} from page {start}")
+            for page in range(start, start + max_pages):
+                results, pages = fetch_page(api_key, page, page_size, order_by="newest",
+                                            use_date="first-publication",
+                                            from_date=checkpoint.backfill["from"], to_date=to_date)
+                if not results:
+                    checkpoint.backfill["done"] = True
+                    checkpoint.save()
+                    break
+                yield results
+                checkpoint.backfill["page"] = page + 1
+                checkpoint.backfill["done"] = page >= pages
+                checkpoint.save()
+                if checkpoint.backfill["done"]:
+                    break
+    finally:
+        lock.release()
+
+
+def schedule_periodic_ingest(app, job, env_var: str = "INGEST_INTERVAL_SECONDS"):
+    """Run `job` (a blocking callable) every N seconds in a worker thread while the FastAPI app is up.
+
+    Disabled unless the interval environment variable is set to a positive number. The loop is
+    started and cancelled by the app's lifespan, around whatever lifespan the app already has.
+    """
+    interval = float(os.getenv(env_var, 0) or 0)
+    if interval <= 0:
+        return
+
+    async def loop():
+        while True:
+            try:
+                await asyncio.to_thread(job)
+            except Exception as e:
+                logging.error(f"Periodic ingest failed: {e}")
+            await asyncio.sleep(interval)
+
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        logging.info(f"Periodic ingest every {interval} seconds.")
+        app.state.periodic_ingest = asyncio.create_task(loop())
+        try:
+            async with app_lifespan(app) as state:
+                yield state
+        finally:
+            app.state.periodic_ingest.cancel()
+
+    app.router.lifespan_context = lifespan
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+# HTTP interface of the ClickHouse server the Grafana dashboard reads, e.g. http://localhost:8124.
+# Metrics are not recorded when it is unset.
+METRICS_CLICKHOUSE_URL = os.getenv("METRICS_CLICKHOUSE_URL")
+METRICS_CLICKHOUSE_USER = os.getenv("METRICS_CLICKHOUSE_USER", "user")
+METRICS_CLICKHOUSE_PASSWORD = os.getenv("METRICS_CLICKHOUSE_PASSWORD", "default")
+METRICS_TABLE = os.getenv("METRICS_TABLE", "guardian.request_metrics")
+# Records held in memory at most; once full, new records are dropped and counted
+METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", 10000))
+METRICS_BATCH_SIZE = int(os.getenv("METRICS_BATCH_SIZE", 500))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", 2))
+METRICS_TTL_DAYS = int(os.getenv("METRICS_TTL_DAYS", 30))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    ts DateTime64(3, 'UTC'),
+    service LowCardinality(String),
+    database LowCardinality(String),
+    endpoint LowCardinality(String),
+    status LowCardinality(String),
+    duration_ms Float32,
+    stages Map(String, Float32),
+    rows UInt32,
+    input_tokens UInt32,
+    output_tokens UInt32,
+    run_name String
+) ENGINE = MergeTree
+PARTITION BY toYYYYMM(ts)
+ORDER BY (database, endpoint, ts)
+TTL toDateTime(ts) + INTERVAL {ttl_days} DAY
+"""
+
+
+class MetricsSink:
+    """Per-request records appended to a ClickHouse MergeTree table in the background.
+
+    record() only puts the row on a bounded in-memory queue, so a slow or unreachable ClickHouse
+    never holds up a request. A writer thread inserts the queue in batches of batch_size rows,
+    or whatever has arrived after flush_interval seconds, as one JSONEachRow insert each. A batch
+    that fails to insert is dropped and counted rather than retried.
+    """
+
+    def __init__(self, service: str, url: Optional[str] = METRICS_CLICKHOUSE_URL, table: str = METRICS_TABLE,
+                 buffer_size: int = METRICS_BUFFER_SIZE, batch_size: int = METRICS_BATCH_SIZE,
+                 flush_interval: float = METRICS_FLUSH_INTERVAL, post: Callable = None):
+        self.service = service
+        self.url = url
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.session = requests.Session()
+        self.session.auth = (METRICS_CLICKHOUSE_USER, METRICS_CLICKHOUSE_PASSWORD)
+        self.post = post or self.session.post
+        self.schema_ready = False
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"metrics-{service}", daemon=True)
+        self.thread.start()
+
+    def record(self, endpoint: str, duration_ms: float, database: str = "", status: str = "ok",
+               stages: Dict[str, float] = None, rows: int = 0, input_tokens: int = 0, output_tokens: int = 0,
+               run_name: str = ""):
+        try:
+            self.queue.put_nowait({
+                "ts": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                "service": self.service,
+                "database": database or self.service,
+                "endpoint": endpoint,
+                "status": status,
+                "duration_ms": duration_ms,
+                "stages": {name: value for name, value in (stages or {}).items() if value is not None},
+                "rows": rows or 0,
+                "input_tokens": input_tokens or 0,
+                "output_tokens": output_tokens or 0,
+                "run_name": run_name or "",
+            })
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    @contextmanager
+    def track(self, endpoint: str, **fields):
+        """Time the block and record it; the yielded dict can be filled in with rows, stages, ...
+
+        An exception escaping the block is recorded with status "error" and re-raised.
+        """
+        record = dict(fields)
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception:
+            record["status"] = "error"
+            raise
+        finally:
+            self.record(endpoint, (time.perf_counter() - started) * 1000, **record)
+
+    def ensure_schema(self):
+        if self.schema_ready:
+            return
+        database = self.table.split(".")[0] if "." in self.table else None
+        if database:
+            self.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        self.execute(SCHEMA.format(table=self.table, ttl_days=METRICS_TTL_DAYS))
+        self.schema_ready = True
+
+    def execute(self, query: str, body: bytes = None):
+        if body is None:
+            response = self.post(self.url, data=query.encode("utf-8"), timeout=10)
+        else:
+            response = self.post(self.url, params={"query": query}, data=body, timeout=10)
+        response.raise_for_status()
+
+    def write(self, batch: List[Dict[str, Any]]):
+        try:
+            self.ensure_schema()
+            body = "\n".join(json.dumps(row) for row in batch).encode("utf-8")
+            self.execute(f"INSERT INTO {self.table} FORMAT JSONEachRow", body)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logging.warning(f"Dropped {len(batch)} request metrics: {e}")
+
+    def run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                if len(batch) < self.batch_size:
+                    continue
+            except queue.Empty:
+                pass
+            if batch:
+                self.write(batch)
+                batch = []
+            deadline = time.monotonic() + self.flush_interval
+            if self.closed.is_set() and self.queue.empty():
+                return
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every record queued so far has been written or has failed to write"""
+        target = self.recorded
+        deadline = time.monotonic() + (timeout if timeout is not None else self.flush_interval * 2 + 10)
+        while self.written + self.failed < target:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        self.closed.set()
+        self.thread.join(timeout=self.flush_interval * 2 + 10)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "service": self.service,
+            "table": self.table,
+            "queued": self.queue.qsize(),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class NullSink:
+    """Stand-in used when METRICS_CLICKHOUSE_URL is not set"""
+
+    def record(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def track(self, endpoint: str, **fields):
+        yield dict(fields)
+
+    def flush(self, timeout: float = None) -> bool:
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+
+_sinks = {}
+_sinks_guard = threading.Lock()
+
+
+def metrics_sink(service: str):
+    """Process-wide sink for a service, or a NullSink when no metrics URL is configured"""
+    if not METRICS_CLICKHOUSE_URL:
+        return NullSink()
+    with _sinks_guard:
+        if service not in _sinks:
+            _sinks[service] = MetricsSink(service)
+            atexit.register(_sinks[service].close)
+        return _sinks[service]
@@ -0,0 +1,189 @@
+import os
+import logging
+import threading
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# collapse: near-copies of an already stored (or same-page) article are dropped before the
+# encoder, keeping the first one seen as the canonical row; off: every article is stored
+NEAR_DUPLICATE_MODES = ("collapse", "off")
+NEAR_DUPLICATES = os.getenv("NEAR_DUPLICATES", "collapse")
+# Estimated Jaccard similarity of word shingles above which two articles are near-duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+# 32 bands of 4 rows: pairs above 0.6 Jaccard share a bucket with > 98% probability
+BANDS = 32
+
+# Universal hashing (a * x + b) mod P over 32-bit shingle hashes; a < 2^31 keeps a * x inside uint64
+_PRIME = np.uint64(4294967291)
+_rng = np.random.default_rng(0)
+_A = _rng.integers(1, 2 ** 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 31, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """32-bit hashes of the overlapping word n-grams of a text"""
+    words = (text or "").lower().split()
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of a text's shingles; equal positions estimate their Jaccard similarity"""
+    hashes = shingles(text)
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def article_text(article: dict) -> str:
+    return f"{article.get('title') or ''}\n{article.get('body') or ''}"
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of the articles a store holds, used to collapse near-copies at ingest.
+
+    Live blog updates and syndicated copies share most of their text under different URLs; they
+    take index space and fill the top-k with redundant context. `seed` returns (url, title, body)
+    for what is already stored and is read on first use, so the index survives service restarts.
+    Articles with the same URL as a stored one are updates, never duplicates of themselves.
+    Only stored articles are indexed: callers report them with mark_stored once they are written,
+    so a page whose embedding or insert fails cannot swallow later copies of its articles.
+    """
+
+    def __init__(self, seed: Callable[[], Iterable[Tuple[str, str, str]]] = None,
+                 threshold: float = NEAR_DUPLICATE_THRESHOLD, bands: int = BANDS):
+        self.seed = seed
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: Dict[Tuple[int, bytes], set] = {}
+        self.stats = {"checked": 0, "duplicates": 0}
+        # Signatures of the canonical articles of the last split, waiting for mark_stored
+        self.pending: Dict[str, np.ndarray] = {}
+        self.seeded = False
+        self.lock = threading.Lock()
+
+    def _keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, url: str, signature: np.ndarray):
+        self.remove(url)
+        self.signatures[url] = signature
+        for key in self._keys(signature):
+            self.buckets.setdefault(key, set()).add(url)
+
+    def remove(self, url: str):
+        signature = self.signatures.pop(url, None)
+        if signature is not None:
+            for key in self._keys(signature):
+                self.buckets.get(key, set()).discard(url)
+
+    def match(self, url: str, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Most similar indexed article (other than url itself) at or above the threshold"""
+        candidates = set()
+        for key in self._keys(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(url)
+        best = max(((c, similarity(signature, self.signatures[c])) for c in candidates),
+                   key=lambda pair: pair[1], default=None)
+        return best if best and best[1] >= self.threshold else None
+
+    def ensure_seeded(self):
+        if self.seeded or self.seed is None:
+            return
+        count = 0
+        for url, title, body in self.seed():
+            self.add(url, minhash(article_text({"title": title, "body": body})))
+            count += 1
+        self.seeded = True
+        logging.info(f"Near-duplicate index seeded with {count} stored articles.")
+
+    def split(self, articles: Iterable[dict]) -> Tuple[List[dict], List[dict]]:
+        """Split articles into (canonical, duplicates); duplicates get `duplicate_of` and `similarity`.
+
+        Canonical articles are compared with the rest of the page as well, so near-copies on the
+        same page collapse too, but they are only indexed by mark_stored.
+        """
+        articles = list(articles)
+        canonical, duplicates = [], []
+        with self.lock:
+            self.ensure_seeded()
+            self.pending = {}
+            for article in articles:
+                signature = minhash(article_text(article))
+                found = self.match(article["url"], signature)
+                if not found:
+                    found = max(((url, similarity(signature, other)) for url, other in self.pending.items()
+                                 if url != article["url"]), key=lambda pair: pair[1], default=None)
+                    found = found if found and found[1] >= self.threshold else None
+                if found:
+                    article["duplicate_of"], article["similarity"] = found
+                    duplicates.append(article)
+                else:
+                    self.pending[article["url"]] = signature
+                    canonical.append(article)
+            self.stats["checked"] += len(articles)
+            self.stats["duplicates"] += len(duplicates)
+        for article in duplicates:
+            logging.info(f"  Near-duplicate of {article['duplicate_of']} ({article['similarity']:.2f}): "
+                         f"{article['title'][:50]}...")
+        return canonical, duplicates
+
+    def mark_stored(self, articles: Iterable[dict]):
+        """Index articles that have just been written to the store; updated ones are re-indexed"""
+        with self.lock:
+            self.ensure_seeded()
+            for article in articles:
+                # Updated articles were not split, and their text changed: sign them afresh
+                signature = self.pending.pop(article["url"], None)
+                self.add(article["url"], signature if signature is not None else minhash(article_text(article)))
+
+    def as_dict(self) -> dict:
+        checked = self.stats["checked"]
+        return {
+            "mode": NEAR_DUPLICATES,
+            "threshold": self.threshold,
+            "indexed": len(self.signatures),
+            "checked": checked,
+            "duplicates": self.stats["duplicates"],
+            # Share of ingested articles that never reached the store
+            "reduction": self.stats["duplicates"] / checked if checked else 0.0,
+        }
+
+
+_indexes: Dict[str, NearDuplicateIndex] = {}
+
+
+def near_duplicate_index(backend: str, seed: Callable[[], Iterable[Tuple[str, str, str]]] = None) -> NearDuplicateIndex:
+    """Process-wide index per backend, seeded from the first seed it is given"""
+    index = _indexes.setdefault(backend, NearDuplicateIndex())
+    if index.seed is None:
+        index.seed = seed
+    return index
+
+
+def collapse(backend: str, articles: List[dict], seed=None) -> List[dict]:
+    """Articles that should be stored: all of them when disabled, otherwise the canonical ones"""
+    if NEAR_DUPLICATES == "off" or not articles:
+        return articles
+    if NEAR_DUPLICATES not in NEAR_DUPLICATE_MODES:
+        raise ValueError(f"Invalid NEAR_DUPLICATES: {NEAR_DUPLICATES}. Must be one of {NEAR_DUPLICATE_MODES}.")
+    canonical, _ = near_duplicate_index(backend, seed).split(articles)
+    return canonical
+
+
+def mark_stored(backend: str, articles: List[dict]):
+    """Index articles once the backend has stored them, so later near-copies collapse into them"""
+    if NEAR_DUPLICATES == "off" or not articles:
+        return
+    near_duplicate_index(backend).mark_stored(articles)
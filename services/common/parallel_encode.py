@@ -0,0 +1,145 @@
+import os
+import sys
+import atexit
+import logging
+import importlib.util
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from services.common.embedding_models import embedding_model
+from services.common.encoder import load_encoder
+
+# Set in each worker process by _init_worker
+_worker_model = None
+
+_shared = None
+_shared_guard = threading.Lock()
+
+
+def _init_worker(slot_counter, threads: int, pin_cores: bool, model_name: str, backend: str, int8: bool):
+    """Pin the worker's thread count (and optionally its cores), then load its own encoder"""
+    global _worker_model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        with slot_counter.get_lock():
+            slot = slot_counter.value
+            slot_counter.value += 1
+        cores = sorted(os.sched_getaffinity(0))
+        mine = cores[slot * threads % len(cores):][:threads] or cores[:threads]
+        os.sched_setaffinity(0, mine)
+
+    # The ONNX and OpenVINO backends can run without torch; the thread variables above cover them
+    if importlib.util.find_spec("torch") is not None:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    _worker_model = load_encoder(model_name, backend, int8)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The parent owns the segment; workers must not unlink it when they exit
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _encode_into(shm_name: str, shape, start: int, texts, batch_size: int, normalize_embeddings: bool) -> int:
+    """Encode one chunk and write it straight into rows [start, start + len(texts)) of the shared buffer"""
+    shm = _attach(shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = _worker_model.encode(
+            texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings
+        )
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class ParallelEncoder:
+    """Encode large text lists across a pool of worker processes.
+
+    Each worker holds its own encoder and runs with a fixed thread count, so workers * threads
+    never oversubscribes the host. Embeddings are written by the workers into one shared-memory
+    matrix at their chunk's row offset, which keeps the output in input order without pickling
+    the vectors back to the parent.
+    """
+
+    def __init__(self, workers: int, threads_per_worker: int = None, model_name: str = None,
+                 backend: str = None, int8: bool = None, dim: int = None, pin_cores: bool = False):
+        # Defaults to the configured EMBEDDING_MODEL and its dimension
+        model = embedding_model()
+        model_name, dim = model_name or model.name, dim or model.dim
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.dim = dim
+        ctx = mp.get_context("spawn")
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(ctx.Value("i", 0), self.threads_per_worker, pin_cores, model_name, backend, int8)
+        )
+        logging.info(f"Parallel encoder started: {workers} workers x {self.threads_per_worker} threads.")
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = False) -> np.ndarray:
+        texts = list(texts)
+        n = len(texts)
+        if n == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        # A few chunks per worker evens out uneven article lengths
+        chunk = max(batch_size, -(-n // (self.workers * 4)))
+        shm = shared_memory.SharedMemory(create=True, size=n * self.dim * 4)
+        try:
+            futures = [
+                self.executor.submit(_encode_into, shm.name, (n, self.dim), start, texts[start:start + chunk],
+                                     batch_size, normalize_embeddings)
+                for start in range(0, n, chunk)
+            ]
+            for future in futures:
+                future.result()
+            return np.ndarray((n, self.dim), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parallel_encoder():
+    """Process-wide pool configured by ENCODE_WORKERS, or None when parallel encoding is off"""
+    global _shared
+    workers = int(os.getenv("ENCODE_WORKERS", 0) or 0)
+    if workers <= 1:
+        return None
+    with _shared_guard:
+        if _shared is None:
+            threads = int(os.getenv("ENCODE_THREADS_PER_WORKER", 0) or 0) or None
+            _shared = ParallelEncoder(workers, threads, pin_cores=os.getenv("ENCODE_PIN_CORES", "false") == "true")
+            atexit.register(_shared.close)
+        return _shared
+
+
+def encode_texts(model, texts, batch_size: int = 32, normalize_embeddings: bool = False) -> np.ndarray:
+    """Encode an ingest batch with the worker pool when ENCODE_WORKERS > 1, else with the in-process model"""
+    encoder = parallel_encoder()
+    if encoder is None or len(texts) < 2 * batch_size:
+        return model.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings)
+    embeddings = encoder.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings)
+    # The workers hold the plain model; a reduced encoder's projection is applied here
+    return model.project(embeddings) if hasattr(model, "project") else embeddings
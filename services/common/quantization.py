@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+# none: full precision only; halfvec: float16 (pgvector); int8: scalar quantization; binary: sign bits
+QUANTIZATION_LEVELS = ("none", "halfvec", "int8", "binary")
+
+# Components of the normalized MiniLM embeddings rarely exceed this magnitude; values beyond it saturate.
+# Changing it requires re-quantizing stored codes.
+INT8_CLIP = float(os.getenv("QUANTIZATION_INT8_CLIP", 0.3))
+
+# How many candidates per requested result are fetched from the compact codes before exact re-ranking
+RERANK_FACTOR = int(os.getenv("QUANTIZATION_RERANK_FACTOR", 10))
+
+
+def quantization_level(level: str = None) -> str:
+    """Resolve the requested level, falling back to the QUANTIZATION environment variable"""
+    level = level or os.getenv("QUANTIZATION", "none")
+    if level not in QUANTIZATION_LEVELS:
+        raise ValueError(f"Invalid quantization: {level}. Must be one of {QUANTIZATION_LEVELS}.")
+    return level
+
+
+def candidate_count(limit: int) -> int:
+    return max(limit, limit * RERANK_FACTOR)
+
+
+def quantize_int8(embeddings) -> np.ndarray:
+    """Symmetric scalar quantization to int8 with a fixed clip range"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return np.clip(np.rint(embeddings / INT8_CLIP * 127), -127, 127).astype(np.int8)
+
+
+def quantize_binary(embeddings) -> np.ndarray:
+    """Sign-bit quantization, packed 8 dimensions per byte"""
+    return np.packbits(np.asarray(embeddings) > 0, axis=-1)
+
+
+def binary_words(embedding) -> list:
+    """Sign bits of one embedding as UInt64 words; bit j of word w is dimension 64 * w + j"""
+    bits = (np.asarray(embedding) > 0).reshape(-1, 64).astype(np.uint64)
+    return [int(w) for w in (bits << np.arange(64, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)]
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance between each packed row and a packed query"""
+    return np.bitwise_count(np.bitwise_xor(codes, query_code)).sum(axis=1, dtype=np.int32)
+
+
+def clickhouse_int8_expression(column: str = "embedding") -> str:
+    """ClickHouse expression computing the same int8 codes as quantize_int8"""
+    return f"arrayMap(x -> toInt8(greatest(-127, least(127, round(x / {INT8_CLIP} * 127)))), {column})"
+
+
+def clickhouse_binary_expression(column: str = "embedding", dim: int = 384) -> str:
+    """ClickHouse expression computing the same UInt64 words as binary_words"""
+    return (
+        f"arrayMap(w -> arraySum(arrayMap(j -> bitShiftLeft(toUInt64({column}[w * 64 + j + 1] > 0), j), "
+        f"range(64))), range({dim // 64}))"
+    )
+
+
+def recall_at_k(approximate, exact) -> float:
+    """Fraction of the exact top-k that the approximate result also returned"""
+    exact = set(exact)
+    if not exact:
+        return 1.0
+    return len(exact & set(approximate)) / len(exact)
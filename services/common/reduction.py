@@ -0,0 +1,192 @@
+import os
+import glob
+import json
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import numpy as np
+
+from services.common.embedding_models import EmbeddingModel, embedding_model, table_name
+
+# none: store the model's full vectors; pca:<dim>: project onto the corpus' top principal components;
+# truncate:<dim>: keep the leading dimensions, for Matryoshka models only
+REDUCTION_METHODS = ("none", "pca", "truncate")
+
+# Fitted projections, one directory per model, one file per version
+PROJECTION_PATH = os.getenv("PROJECTION_PATH", "data/projections")
+
+
+def reduction_setting(setting: str = None) -> Tuple[str, Optional[int]]:
+    """Parse "none", "pca:<dim>" or "truncate:<dim>", falling back to EMBEDDING_REDUCTION"""
+    setting = setting or os.getenv("EMBEDDING_REDUCTION", "none")
+    method, _, dim = setting.partition(":")
+    if method not in REDUCTION_METHODS or (method == "none") != (not dim):
+        raise ValueError(f"Invalid embedding reduction: {setting}. Use none, pca:<dim> or truncate:<dim>.")
+    if method == "none":
+        return method, None
+    dim = int(dim)
+    # Binary quantization packs dimensions into UInt64 words
+    if dim <= 0 or dim % 64:
+        raise ValueError(f"Reduced dimension must be a positive multiple of 64, got {dim}")
+    return method, dim
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=-1, keepdims=True), 1e-12)
+
+
+class Projection:
+    """A versioned map from one model's embeddings to `dim` dimensions, L2-normalized afterwards.
+
+    PCA versions are named after a hash of the fitted matrix, so a table suffixed with the version
+    can only ever hold vectors from that exact projection; refitting creates a new version.
+    """
+
+    def __init__(self, model_key: str, method: str, dim: int, mean: np.ndarray = None,
+                 components: np.ndarray = None, fitted_rows: int = 0, explained_variance: float = None,
+                 created_at: str = None):
+        self.model_key = model_key
+        self.method = method
+        self.dim = dim
+        self.mean = mean
+        self.components = components
+        self.fitted_rows = fitted_rows
+        self.explained_variance = explained_variance
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+
+    @property
+    def version(self) -> str:
+        if self.method == "truncate":
+            return f"trunc{self.dim}"
+        digest = hashlib.sha256(self.mean.tobytes() + self.components.tobytes()).hexdigest()
+        return f"pca{self.dim}_{digest[:8]}"
+
+    def apply(self, embeddings) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        single = embeddings.ndim == 1
+        embeddings = np.atleast_2d(embeddings)
+        if self.method == "truncate":
+            reduced = embeddings[:, :self.dim]
+        else:
+            reduced = (embeddings - self.mean) @ self.components.T
+        reduced = normalize(reduced).astype(np.float32)
+        return reduced[0] if single else reduced
+
+    def save(self, path: str = PROJECTION_PATH) -> str:
+        directory = os.path.join(path, self.model_key)
+        os.makedirs(directory, exist_ok=True)
+        file = os.path.join(directory, f"{self.version}.npz")
+        np.savez(file, mean=self.mean, components=self.components, meta=json.dumps(self.as_dict()))
+        return file
+
+    @classmethod
+    def load(cls, file: str) -> "Projection":
+        with np.load(file) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(meta["model"], meta["method"], meta["dim"], data["mean"], data["components"],
+                       meta["fitted_rows"], meta["explained_variance"], meta["created_at"])
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model_key,
+            "method": self.method,
+            "dim": self.dim,
+            "version": self.version,
+            "fitted_rows": self.fitted_rows,
+            "explained_variance": self.explained_variance,
+            "created_at": self.created_at,
+        }
+
+
+def fit_pca(model_key: str, embeddings, dim: int) -> Projection:
+    """Principal components of a sample of the corpus' embeddings"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dim >= embeddings.shape[1] or dim > embeddings.shape[0]:
+        raise ValueError(f"Cannot fit {dim} components to {embeddings.shape[0]} x {embeddings.shape[1]} embeddings")
+    mean = embeddings.mean(axis=0)
+    _, singular, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+    variance = singular ** 2
+    return Projection(model_key, "pca", dim, mean.astype(np.float32), np.ascontiguousarray(vt[:dim], dtype=np.float32),
+                      len(embeddings), float(variance[:dim].sum() / variance.sum()))
+
+
+def truncation(model: EmbeddingModel, dim: int) -> Projection:
+    if not model.matryoshka:
+        raise ValueError(f"{model.name} is not a Matryoshka model; truncating it loses too much. Use pca:{dim}.")
+    if dim >= model.dim:
+        raise ValueError(f"Cannot truncate {model.dim}-dimensional {model.name} embeddings to {dim}")
+    return Projection(model.key, "truncate", dim)
+
+
+def find_projection(model_key: str, dim: int, version: str = None, path: str = PROJECTION_PATH) -> Projection:
+    """The pinned PCA version, or else the most recently fitted one for this model and dimension"""
+    pattern = f"{version}.npz" if version else f"pca{dim}_*.npz"
+    files = glob.glob(os.path.join(path, model_key, pattern))
+    if not files:
+        raise FileNotFoundError(f"No pca:{dim} projection for {model_key} in {path}; fit one with "
+                                f"python -m scripts.reduce_embeddings fit --dim {dim}")
+    projection = max((Projection.load(file) for file in files), key=lambda p: p.created_at)
+    if projection.dim != dim:
+        raise ValueError(f"Projection {projection.version} has {projection.dim} dimensions, not {dim}")
+    return projection
+
+
+class ProjectedEncoder:
+    """Encoder whose vectors come out projected, so ingest and queries always share a projection"""
+
+    def __init__(self, model, projection: Projection):
+        self.model = model
+        self.projection = projection
+
+    def encode(self, sentences, **kwargs):
+        return self.projection.apply(self.model.encode(sentences, **kwargs))
+
+    def project(self, embeddings) -> np.ndarray:
+        return self.projection.apply(embeddings)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class EmbeddingSpace:
+    """What a backend stores: one model's vectors, optionally reduced by one projection version"""
+
+    def __init__(self, model: EmbeddingModel, projection: Projection = None):
+        self.model = model
+        self.projection = projection
+
+    @property
+    def name(self) -> str:
+        return self.model.name
+
+    @property
+    def dim(self) -> int:
+        return self.projection.dim if self.projection else self.model.dim
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.projection.version if self.projection else None
+
+    def table(self, base: str) -> str:
+        """Per-model table, suffixed with the projection version when reduced"""
+        name = table_name(base, self.model.key)
+        return f"{name}_{self.version}" if self.projection else name
+
+    def encoder(self):
+        # Imported here so projections can be fitted and applied without sentence-transformers
+        from services.common.encoder import load_encoder
+
+        encoder = load_encoder(self.model.name)
+        return ProjectedEncoder(encoder, self.projection) if self.projection else encoder
+
+
+def embedding_space(key: str = None, reduction: str = None, version: str = None) -> EmbeddingSpace:
+    """The configured EMBEDDING_MODEL with its EMBEDDING_REDUCTION (PROJECTION_VERSION pins a PCA fit)"""
+    model = embedding_model(key)
+    method, dim = reduction_setting(reduction)
+    if method == "none":
+        return EmbeddingSpace(model)
+    if method == "truncate":
+        return EmbeddingSpace(model, truncation(model, dim))
+    return EmbeddingSpace(model, find_projection(model.key, dim, version or os.getenv("PROJECTION_VERSION")))
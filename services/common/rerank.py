@@ -0,0 +1,61 @@
+import numpy as np
+
+# exact: re-score candidates by cosine similarity; mmr: maximal marginal relevance over the
+# candidates; threshold: exact, keeping only candidates with similarity >= min_score
+RERANK_MODES = ("exact", "mmr", "threshold")
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def embedding_matrix(column, dim: int) -> np.ndarray:
+    """(n, dim) float32 view of an Arrow list<float> column, without per-row Python lists"""
+    values = column.combine_chunks().flatten().to_numpy(zero_copy_only=False)
+    return np.asarray(values, dtype=np.float32).reshape(-1, dim)
+
+
+def cosine_scores(embeddings: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every candidate row to the query"""
+    return normalize(embeddings) @ normalize(query)
+
+
+def mmr(embeddings: np.ndarray, scores: np.ndarray, k: int, mmr_lambda: float = 0.5) -> np.ndarray:
+    """Greedy maximal marginal relevance: each pick trades similarity to the query (scores)
+    against similarity to the candidates already picked. mmr_lambda=1 is plain top-k.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    unit = normalize(embeddings)
+    picked = np.empty(k, dtype=np.int64)
+    available = np.ones(n, dtype=bool)
+    # Highest similarity of each candidate to any picked one; nothing is picked yet
+    redundancy = np.zeros(n, dtype=np.float32)
+    for i in range(k):
+        gain = mmr_lambda * scores - (1 - mmr_lambda) * redundancy
+        gain[~available] = -np.inf
+        picked[i] = int(np.argmax(gain))
+        available[picked[i]] = False
+        similarity = unit @ unit[picked[i]]
+        redundancy = similarity if i == 0 else np.maximum(redundancy, similarity)
+    return picked
+
+
+def rerank(embeddings: np.ndarray, query: np.ndarray, k: int, mode: str = "exact", mmr_lambda: float = 0.5,
+           min_score: float = None):
+    """Indices of the final k candidates and their cosine similarities, best first (MMR: pick order)"""
+    if mode not in RERANK_MODES:
+        raise ValueError(f"Invalid rerank mode: {mode}. Must be one of {RERANK_MODES}.")
+    scores = cosine_scores(embeddings, query)
+    if mode == "mmr":
+        idx = mmr(embeddings, scores, k, mmr_lambda)
+    else:
+        idx = np.argsort(-scores, kind="stable")
+        if mode == "threshold" and min_score is not None:
+            idx = idx[scores[idx] >= min_score]
+        idx = idx[:k]
+    return idx, scores[idx]
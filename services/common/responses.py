@@ -0,0 +1,145 @@
+import importlib.util
+from datetime import date, datetime
+from typing import List, Optional, Tuple, Union
+
+import msgpack
+import orjson
+from fastapi import Response
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = {
+    "json": JSON,
+    "msgpack": MSGPACK,
+    "arrow": ARROW,
+}
+ALIASES = {"application/x-msgpack": MSGPACK, "*/*": JSON, "application/*": JSON}
+
+# Arrow IPC is only offered by services that have pyarrow installed
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+# (url, title, body, publication_date, score); Cassandra reports the score as a string
+ArticleRow = Tuple[str, str, str, Optional[datetime], Union[float, str, None]]
+COLUMNS = ("url", "title", "body", "publication_date", "score")
+
+
+def supported() -> List[str]:
+    return [JSON, MSGPACK] + ([ARROW] if ARROW_AVAILABLE else [])
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """First media type in the Accept header this service can produce, JSON if none is.
+
+    Clients list what they prefer first and end with application/json, so a service without
+    pyarrow still answers an Arrow request in a format the client understands.
+    """
+    for part in (accept or "").split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if "q=0" in params:
+            continue
+        media_type = ALIASES.get(media_type, media_type)
+        if media_type in supported():
+            return media_type
+    return JSON
+
+
+def _iso(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _arrow_table(rows, query_indices=None):
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    url, title, body, published, score = columns
+    published = [_iso(p) if isinstance(p, (datetime, date)) else p for p in published]
+    score = [_iso(s) if hasattr(s, "item") else s for s in score]
+    numeric = all(s is None or isinstance(s, (int, float)) for s in score)
+    arrays = {
+        "url": pa.array(url, pa.string()),
+        "title": pa.array(title, pa.string()),
+        "body": pa.array(body, pa.string()),
+        "publication_date": pa.array(published, pa.string()),
+        "score": pa.array(score, pa.float64() if numeric else pa.string()),
+    }
+    if query_indices is not None:
+        arrays = {"query_index": pa.array(query_indices, pa.int32()), **arrays}
+    return pa.table(arrays)
+
+
+def _arrow_bytes(table) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _arrow_read(body: bytes):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(body).read_all()
+
+
+def encode_rows(rows, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(rows, default=_iso, use_bin_type=True)
+    if media_type == ARROW:
+        return _arrow_bytes(_arrow_table(rows))
+    return orjson.dumps(rows, default=_iso, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def decode_rows(body: bytes, media_type: str = JSON) -> list:
+    """Rows as lists, whatever the wire format; dates arrive as ISO strings as with JSON"""
+    media_type = (media_type or JSON).split(";")[0].strip()
+    if media_type == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    if media_type == ARROW:
+        return [list(row) for row in zip(*_arrow_read(body).to_pydict().values())]
+    return orjson.loads(body)
+
+
+def encode_batch(groups, media_type: str = JSON) -> bytes:
+    """One list of rows per query; Arrow carries them flat with a query_index column"""
+    if media_type == ARROW:
+        flat = [row for rows in groups for row in rows]
+        indices = [i for i, rows in enumerate(groups) for _ in rows]
+        table = _arrow_table(flat, indices)
+        # The number of queries travels in the schema, so queries without rows survive the round trip
+        return _arrow_bytes(table.replace_schema_metadata({"queries": str(len(groups))}))
+    return encode_rows(groups, media_type)
+
+
+def decode_batch(body: bytes, media_type: str = JSON) -> List[list]:
+    media_type = (media_type or JSON).split(";")[0].strip()
+    if media_type != ARROW:
+        return decode_rows(body, media_type)
+    table = _arrow_read(body)
+    groups = [[] for _ in range(int(table.schema.metadata[b"queries"]))]
+    columns = table.to_pydict()
+    for query_index, *row in zip(*columns.values()):
+        groups[query_index].append(list(row))
+    return groups
+
+
+def rows_response(rows, accept: Optional[str] = None) -> Response:
+    """/related-articles result in the format the client asked for (orjson-encoded JSON by default)"""
+    media_type = negotiate(accept)
+    return Response(encode_rows(rows, media_type), media_type=media_type)
+
+
+def batch_response(groups, accept: Optional[str] = None) -> Response:
+    media_type = negotiate(accept)
+    return Response(encode_batch(groups, media_type), media_type=media_type)
+
+
+def accept_header(response_format: str) -> str:
+    """Accept header asking for response_format, with JSON as the fallback"""
+    preferred = MEDIA_TYPES[response_format]
+    return preferred if preferred == JSON else f"{preferred}, {JSON};q=0.5"
@@ -0,0 +1,183 @@
+import os
+import glob
+import time
+import pickle
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# off: every search hits the database; memory: per-process LRU; disk: LRU in front of a directory
+# shared by every process on the host (RESULT_CACHE_DIR)
+RESULT_CACHE_MODES = ("off", "memory", "disk")
+RESULT_CACHE = os.getenv("RESULT_CACHE", "memory")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Holds the corpus version files as well as the disk tier, so every process that ingests into or
+# searches a table must see the same directory: the default is the repository's data/result_cache
+# whatever the working directory, and the service containers mount that directory at RESULT_CACHE_DIR
+RESULT_CACHE_DIR = os.path.abspath(os.getenv("RESULT_CACHE_DIR", os.path.join(ROOT, "data", "result_cache")))
+
+
+class CorpusVersion:
+    """Counter bumped by every ingest into one table, kept in a file so other processes see it.
+
+    Concurrent bumps may land on the same number; any bump still moves past the version the
+    cached results were computed at, which is all invalidation needs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def current(self) -> int:
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        with self.lock:
+            version = self.current() + 1
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(str(version))
+            os.replace(tmp, self.path)
+        # Results cached on disk at older versions can never match again
+        for path in glob.glob(os.path.join(directory, "v*")):
+            if os.path.basename(path) != f"v{version}":
+                shutil.rmtree(path, ignore_errors=True)
+        return version
+
+
+def corpus_version(backend: str, table: str, directory: str = RESULT_CACHE_DIR) -> CorpusVersion:
+    """Version of one backend table's corpus; every ingest into the table bumps it"""
+    return CorpusVersion(os.path.join(directory, f"{backend}_{table}", "version"))
+
+
+class ResultCache:
+    """Top-k results per (query vector, search parameters) for one backend's table.
+
+    Entries are only valid for the corpus version they were computed at; an ingest bumps the
+    version (see bump) and every older entry stops matching. Each entry remembers how long its
+    search took, so a hit adds that to the latency saved.
+    """
+
+    def __init__(self, backend: str, table: str, mode: str = RESULT_CACHE, size: int = RESULT_CACHE_SIZE,
+                 directory: str = RESULT_CACHE_DIR):
+        if mode not in RESULT_CACHE_MODES:
+            raise ValueError(f"Invalid RESULT_CACHE: {mode}. Must be one of {RESULT_CACHE_MODES}.")
+        self.backend = backend
+        self.mode = mode
+        self.size = size
+        self.directory = os.path.join(directory, f"{backend}_{table}")
+        self.version = corpus_version(backend, table, directory)
+        self.memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.memory_version = None
+        self.stats = {"lookups": 0, "memory_hits": 0, "disk_hits": 0, "saved_ms": 0.0, "invalidations": 0}
+        self.lock = threading.Lock()
+
+    def key(self, vector, **params) -> str:
+        """v<corpus version>/<hash of the query vector and parameters>.
+
+        The version is read here, before the search, so results are never stored under a
+        version that an ingest finishing mid-search has already replaced.
+        """
+        if self.mode == "off":
+            return ""
+        digest = hashlib.sha256(np.asarray(vector, dtype=np.float32).tobytes())
+        digest.update(repr(sorted((name, str(value)) for name, value in params.items())).encode("utf-8"))
+        return f"v{self.version.current()}/{digest.hexdigest()}"
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached rows for the key, or None"""
+        if self.mode == "off":
+            return None
+        started = time.perf_counter()
+        version = int(key.split("/")[0][1:])
+        with self.lock:
+            self.stats["lookups"] += 1
+            # A key from before the latest ingest cannot hit; a newer one retires the older entries
+            if self.memory_version is not None and version < self.memory_version:
+                return None
+            if self.memory_version != version:
+                self.memory.clear()
+                self.memory_version = version
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+        if entry is None and self.mode == "disk":
+            try:
+                with open(self.entry_path(key), "rb") as f:
+                    entry = pickle.load(f)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                entry = None
+            if entry is not None:
+                with self.lock:
+                    self.stats["disk_hits"] += 1
+                    self.remember(key, entry)
+        if entry is None:
+            return None
+        rows, search_ms = entry
+        with self.lock:
+            self.stats["saved_ms"] += max(0.0, search_ms - (time.perf_counter() - started) * 1000)
+        return rows
+
+    def put(self, key: str, rows, search_ms: float):
+        if self.mode == "off" or not rows:
+            return
+        entry = (list(rows), search_ms)
+        with self.lock:
+            # An ingest finished during the search; its results may already be stale
+            if int(key.split("/")[0][1:]) != self.memory_version:
+                return
+            self.remember(key, entry)
+        if self.mode == "disk":
+            path = self.entry_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    pickle.dump(entry, f)
+                os.replace(tmp, path)
+            except OSError as e:
+                logging.warning(f"Result cache could not write {path}: {e}")
+
+    def remember(self, key: str, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def bump(self):
+        """Invalidate every cached result; called after each ingest into the table"""
+        version = self.version.bump()
+        with self.lock:
+            self.memory.clear()
+            self.memory_version = version
+            self.stats["invalidations"] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            entries = len(self.memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        return {
+            "mode": self.mode,
+            "corpus_version": self.version.current(),
+            "entries": entries,
+            "capacity": self.size,
+            **stats,
+            "hit_rate": hits / stats["lookups"] if stats["lookups"] else 0.0,
+        }
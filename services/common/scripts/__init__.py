@@ -0,0 +1 @@
+# This file makes tests a Python package
\ No newline at end of file
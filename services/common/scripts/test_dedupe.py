@@ -0,0 +1,38 @@
+from services.common.dedupe import ArticleDeduper, content_hash
+
+
+def test_dedupe_split():
+    """Only new or modified articles should be handed to the encoder"""
+    stored = {
+        "https://gu.com/p/a": content_hash("A", "unchanged body"),
+        "https://gu.com/p/b": content_hash("B", "old body"),
+        "https://gu.com/p/c": None,
+    }
+    lookups = []
+
+    def lookup(urls):
+        lookups.append(list(urls))
+        return {url: stored[url] for url in urls if url in stored}
+
+    deduper = ArticleDeduper(lookup)
+    articles = [
+        {"url": "https://gu.com/p/a", "title": "A", "body": "unchanged body"},
+        {"url": "https://gu.com/p/b", "title": "B", "body": "new body"},
+        {"url": "https://gu.com/p/c", "title": "C", "body": "legacy row"},
+        {"url": "https://gu.com/p/d", "title": "D", "body": "brand new"},
+    ]
+    new, modified, unchanged = deduper.split(articles)
+
+    assert [a["url"] for a in new] == ["https://gu.com/p/d"]
+    assert [a["url"] for a in modified] == ["https://gu.com/p/b"]
+    assert [a["url"] for a in unchanged] == ["https://gu.com/p/a", "https://gu.com/p/c"]
+
+    # Once stored, a second pass is answered from the local URL map without touching the store
+    deduper.mark_stored(new + modified)
+    new, modified, unchanged = deduper.split([dict(a) for a in articles])
+    assert not new and not modified
+    assert len(lookups) == 1
+
+
+if __name__ == "__main__":
+    test_dedupe_split()
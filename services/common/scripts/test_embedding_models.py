@@ -0,0 +1,22 @@
+import pytest
+
+from services.common.embedding_models import DEFAULT_MODEL, embedding_model, table_name
+
+
+def test_per_model_tables(monkeypatch):
+    """The default model keeps the original tables; every other model gets its own"""
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    assert embedding_model().key == DEFAULT_MODEL
+    assert table_name("articles") == "articles"
+
+    monkeypatch.setenv("EMBEDDING_MODEL", "bge-small")
+    assert embedding_model().dim == 384
+    assert table_name("guardian_articles") == "guardian_articles_bge_small"
+    assert table_name("articles", "mpnet") == "articles_mpnet"
+
+    with pytest.raises(ValueError):
+        embedding_model("word2vec")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
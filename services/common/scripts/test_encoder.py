@@ -0,0 +1,41 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+SENTENCES = [
+    "What are the latest updates on Epstein",
+    "The Bank of England held interest rates at 5.25% on Thursday.",
+    "Arsenal came from behind to beat Chelsea 3-2 at the Emirates.",
+    "Ministers are under pressure to publish the climate adaptation plan before the summer recess.",
+]
+
+# (backend, int8, minimum cosine similarity to the PyTorch embeddings)
+CASES = [
+    ("onnx", False, 0.999),
+    ("onnx", True, 0.97),
+    ("openvino", False, 0.999),
+    ("openvino", True, 0.97),
+]
+
+RUNTIMES = {"onnx": "onnxruntime", "openvino": "openvino"}
+
+
+@pytest.mark.parametrize("backend,int8,threshold", CASES)
+def test_encoder_parity(backend, int8, threshold):
+    """Optimized backends must embed text like the PyTorch reference"""
+    pytest.importorskip("sentence_transformers")
+    if importlib.util.find_spec(RUNTIMES[backend]) is None:
+        pytest.skip(f"{RUNTIMES[backend]} is not installed")
+    from services.common.encoder import load_encoder
+
+    reference = load_encoder(backend="torch", int8=False).encode(SENTENCES, normalize_embeddings=True)
+    embeddings = load_encoder(backend=backend, int8=int8).encode(SENTENCES, normalize_embeddings=True)
+
+    cosine = np.sum(reference * embeddings, axis=1)
+    assert cosine.min() >= threshold, f"{backend} int8={int8}: cosine similarity {cosine.min():.4f} < {threshold}"
+
+
+if __name__ == "__main__":
+    for case in CASES:
+        test_encoder_parity(*case)
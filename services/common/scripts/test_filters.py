@@ -0,0 +1,48 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from services.common.filters import date_range
+
+
+def test_date_range_bounds():
+    """from is inclusive, a bare to date covers its whole day, naive datetimes are UTC"""
+    start, end = date_range("2024-05-01", "2024-05-01")
+    assert start == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert end == datetime(2024, 5, 2, tzinfo=timezone.utc)
+    assert date_range(None, "2024-05-01T12:00:00Z") == (None, datetime(2024, 5, 1, 12, tzinfo=timezone.utc))
+    assert date_range("", None) == (None, None)
+
+
+@pytest.mark.parametrize("from_date, to_date", [
+    ("2024-05-02", "2024-05-01"),
+    ("2024-05-01T12:00:00", "2024-05-01T12:00:00"),
+    ("last tuesday", None),
+])
+def test_empty_or_unparsable_range_is_rejected(from_date, to_date):
+    """The controllers answer these ValueErrors with 400"""
+    with pytest.raises(ValueError):
+        date_range(from_date, to_date)
+
+
+def test_date_mask():
+    pytest.importorskip("sentence_transformers")
+    from services.numpy_store.numpy_store_dao import NumpyStoreDao
+
+    # Only the article list is needed, not the model or a store directory
+    dao = NumpyStoreDao.__new__(NumpyStoreDao)
+    dao.lock = threading.Lock()
+    dao.dates = None
+    dao.articles = [
+        {"publication_date": "2024-04-30T23:59:59Z"},
+        {"publication_date": "2024-05-01T00:00:00Z"},
+        {"publication_date": "2024-05-01T18:30:00+00:00"},
+        {"publication_date": "2024-05-02T00:00:00Z"},
+    ]
+    assert dao.date_mask() is None
+    assert dao.date_mask("2024-05-01", "2024-05-01").tolist() == [1, 2]
+    assert dao.date_mask(from_date="2024-05-01T18:30:00Z").tolist() == [2, 3]
+    assert dao.date_mask(to_date="2024-04-30").tolist() == [0]
+    with pytest.raises(ValueError):
+        dao.date_mask("2024-05-02", "2024-05-01")
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from services.common import ingest
+from services.common.ingest import IngestCheckpoint, IngestInProgress, guardian_pages
+
+
+def article(day: int, hour: int = 12) -> dict:
+    date = f"2024-05-{day:02d}T{hour:02d}:00:00Z"
+    return {"id": f"a{day}-{hour}", "webPublicationDate": date, "fields": {"firstPublicationDate": date}}
+
+
+class Guardian:
+    """Stands in for fetch_page over a fixed set of articles, honouring order and the date filters"""
+
+    def __init__(self, articles):
+        self.articles = list(articles)
+        self.requests = []
+
+    def __call__(self, api_key, page, page_size, order_by="newest", use_date=None, from_date=None, to_date=None):
+        self.requests.append({"page": page, "order_by": order_by, "from_date": from_date, "to_date": to_date})
+        matching = [a for a in self.articles if (not from_date or ingest.publication_date(a)[:10] >= from_date)
+                    and (not to_date or ingest.publication_date(a)[:10] <= to_date)]
+        matching.sort(key=ingest.publication_date, reverse=order_by == "newest")
+        pages = -(-len(matching) // page_size)
+        return matching[(page - 1) * page_size:page * page_size], pages
+
+
+@pytest.fixture
+def guardian(monkeypatch, tmp_path):
+    monkeypatch.setenv("INGEST_STATE_DIR", str(tmp_path))
+    guardian = Guardian(article(day) for day in range(1, 6))
+    monkeypatch.setattr(ingest, "fetch_page", guardian)
+    return guardian
+
+
+def ingested(mode: str, **kwargs) -> list:
+    return [a["id"] for page in guardian_pages("key", "test", page_size=2, mode=mode, **kwargs) for a in page]
+
+
+def test_incremental_advances_the_watermark(guardian):
+    assert len(ingested("incremental", max_pages=10)) == 5
+    assert IngestCheckpoint("test").latest == "2024-05-05T12:00:00Z"
+
+    guardian.articles += [article(5, 18), article(6)]
+    # Only what is at or past the watermark, oldest first
+    assert ingested("incremental", max_pages=10) == ["a5-12", "a5-18", "a6-12"]
+    assert guardian.requests[-1]["from_date"] == "2024-05-05"
+    assert IngestCheckpoint("test").latest == "2024-05-06T12:00:00Z"
+
+
+def test_watermark_moves_only_once_the_page_is_stored(guardian):
+    guardian.articles.append(article(1, 6))
+    pages = guardian_pages("key", "test", page_size=2, max_pages=10, mode="incremental")
+    next(pages)
+    assert IngestCheckpoint("test").latest is None
+    next(pages)
+    assert IngestCheckpoint("test").latest is not None
+    pages.close()
+
+
+@pytest.mark.parametrize("mode", ["latest", "backfill"])
+def test_other_modes_leave_the_watermark_alone(guardian, mode):
+    checkpoint = IngestCheckpoint("test")
+    checkpoint.latest = "2024-05-02T12:00:00Z"
+    checkpoint.save()
+
+    assert len(ingested(mode, max_pages=10, to_date="2024-05-05")) == 5
+    saved = IngestCheckpoint("test")
+    assert saved.latest == "2024-05-02T12:00:00Z"
+    if mode == "backfill":
+        assert saved.backfill["done"]
+
+
+def test_backfill_resumes_at_its_cursor(guardian):
+    assert ingested("backfill", max_pages=1, to_date="2024-05-05") == ["a5-12", "a4-12"]
+    assert IngestCheckpoint("test").backfill["page"] == 2
+    assert ingested("backfill", max_pages=10) == ["a3-12", "a2-12", "a1-12"]
+    assert ingested("backfill", max_pages=10) == []
+
+
+def test_concurrent_run_is_refused(guardian):
+    first = guardian_pages("key", "test", page_size=2, max_pages=10, mode="incremental")
+    next(first)
+    with pytest.raises(IngestInProgress):
+        ingested("incremental")
+    # Another backend is not affected
+    assert len([page for page in guardian_pages("key", "other", page_size=2, mode="latest")]) == 1
+    first.close()
+    assert ingested("latest") == ["a5-12", "a4-12"]
+
+
+def test_periodic_ingest_runs_within_the_app_lifespan(monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("INGEST_INTERVAL_SECONDS", "0.01")
+    ran = threading.Event()
+    app = FastAPI()
+    ingest.schedule_periodic_ingest(app, ran.set)
+    with TestClient(app):
+        assert ran.wait(5)
+        task = app.state.periodic_ingest
+    assert task.cancelled()
@@ -0,0 +1,68 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+from services.common.metrics import MetricsSink
+
+
+class FakeClickHouse:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.release = threading.Event()
+        self.queries = []
+        self.rows = []
+
+    def post(self, url, params=None, data=None, timeout=None):
+        if params is None:
+            self.queries.append(data.decode("utf-8"))
+        elif self.fail:
+            # Hold the writer thread so the buffer fills up behind it
+            self.release.wait(5)
+            raise ConnectionError("ClickHouse is down")
+        else:
+            self.rows.extend(json.loads(line) for line in data.decode("utf-8").splitlines())
+        return self
+
+    def raise_for_status(self):
+        pass
+
+
+def test_metrics_sink_batches_and_bounds():
+    """Records are inserted in batches off the request path; overflow and failed inserts are counted"""
+    clickhouse = FakeClickHouse()
+    sink = MetricsSink("numpy", url="http://clickhouse:8123", buffer_size=1000, batch_size=50,
+                       flush_interval=0.05, post=clickhouse.post)
+    for i in range(120):
+        sink.record("/related-articles", float(i), rows=5, stages={"encode_ms": 1.0, "search_ms": None})
+    with pytest.raises(ValueError):
+        with sink.track("/related-articles") as record:
+            record["rows"] = 0
+            raise ValueError("search failed")
+    assert sink.flush(timeout=5)
+
+    assert any("MergeTree" in query for query in clickhouse.queries)
+    assert len(clickhouse.rows) == 121
+    assert clickhouse.rows[0]["database"] == "numpy"
+    assert clickhouse.rows[0]["stages"] == {"encode_ms": 1.0}
+    assert clickhouse.rows[-1]["status"] == "error"
+    sink.close()
+
+    # A full buffer drops new records instead of blocking, and a failed insert is not retried
+    down = FakeClickHouse(fail=True)
+    sink = MetricsSink("numpy", url="http://clickhouse:8123", buffer_size=10, batch_size=10,
+                       flush_interval=0.05, post=down.post)
+    for i in range(25):
+        sink.record("/related-articles", 1.0)
+    down.release.set()
+    sink.close()
+    stats = sink.stats()
+    assert stats["recorded"] + stats["dropped"] == 25
+    assert stats["dropped"] > 0
+    assert stats["failed"] == stats["recorded"] and stats["written"] == 0
+
+
+if __name__ == "__main__":
+    test_metrics_sink_batches_and_bounds()
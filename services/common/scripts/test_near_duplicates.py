@@ -0,0 +1,57 @@
+from services.common.near_duplicates import NearDuplicateIndex, article_text, minhash, similarity
+
+BODY = " ".join(f"word{i}" for i in range(400))
+STORED = [("https://gu.com/p/live", "Live: UK economy", BODY)]
+
+
+def test_near_copies_collapse_into_stored_article():
+    """Near-copies under new URLs collapse, distinct articles and same-URL updates are kept"""
+    index = NearDuplicateIndex(seed=lambda: STORED, threshold=0.8)
+    articles = [
+        # Syndicated copy with a different headline and a sentence appended
+        {"url": "https://gu.com/p/copy", "title": "UK economy latest", "body": BODY + " Reuters contributed"},
+        # The stored live blog itself, updated
+        {"url": "https://gu.com/p/live", "title": "Live: UK economy", "body": BODY + " 10.42 update"},
+        {"url": "https://gu.com/p/other", "title": "Football", "body": "A different story entirely " * 20},
+        # Near-copy of an article earlier on the same page
+        {"url": "https://gu.com/p/other-2", "title": "Football", "body": "A different story entirely " * 21},
+    ]
+    canonical, duplicates = index.split(articles)
+
+    assert [a["url"] for a in canonical] == ["https://gu.com/p/live", "https://gu.com/p/other"]
+    assert [(a["url"], a["duplicate_of"]) for a in duplicates] == [
+        ("https://gu.com/p/copy", "https://gu.com/p/live"),
+        ("https://gu.com/p/other-2", "https://gu.com/p/other"),
+    ]
+    assert index.as_dict()["reduction"] == 0.5
+
+
+def test_only_stored_articles_are_indexed():
+    """A canonical article whose insert failed does not swallow its later copies; updates are re-signed"""
+    index = NearDuplicateIndex(seed=lambda: [], threshold=0.8)
+    article = {"url": "https://gu.com/p/a", "title": "Budget", "body": BODY}
+    copy = {"url": "https://gu.com/p/b", "title": "Budget", "body": BODY + " Reuters contributed"}
+    assert index.split([article])[0] == [article]
+
+    # The page was never stored, so the copy on the next page is canonical
+    assert index.split([copy])[0] == [copy]
+    index.mark_stored([copy])
+    assert index.split([dict(article)])[1][0]["duplicate_of"] == "https://gu.com/p/b"
+
+    # The stored copy is rewritten; the old text no longer matches
+    index.mark_stored([{"url": "https://gu.com/p/b", "title": "Football", "body": "A different story entirely " * 20}])
+    assert index.split([dict(article)])[1] == []
+
+
+def test_minhash_estimates_jaccard():
+    """Signature agreement tracks shingle overlap"""
+    a = minhash(article_text({"title": "", "body": BODY}))
+    half = minhash(article_text({"title": "", "body": " ".join(f"word{i}" for i in range(200, 600))}))
+    assert similarity(a, a) == 1.0
+    assert 0.2 < similarity(a, half) < 0.5
+
+
+if __name__ == "__main__":
+    test_near_copies_collapse_into_stored_article()
+    test_only_stored_articles_are_indexed()
+    test_minhash_estimates_jaccard()
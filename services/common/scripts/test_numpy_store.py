@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+from services.common.quantization import quantize_binary, quantize_int8
+from services.common.result_cache import ResultCache
+from services.numpy_store.numpy_store_dao import NumpyStoreDao, quantized_top_k, top_k, top_k_batch
+
+DIM = 32
+
+
+def unit_rows(n: int, seed: int = 0) -> np.ndarray:
+    rows = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+MATRIX = unit_rows(1000)
+QUERIES = unit_rows(6, seed=1)
+
+
+def exact(query: np.ndarray, k: int, matrix: np.ndarray = MATRIX) -> list:
+    return np.argsort(-(matrix @ query))[:k].tolist()
+
+
+def test_top_k_best_first_with_and_without_shards():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for query in QUERIES:
+            idx, scores = top_k(MATRIX, query, 10)
+            assert idx.tolist() == exact(query, 10)
+            assert np.all(np.diff(scores) <= 0)
+            sharded, _ = top_k(MATRIX, query, 10, executor, workers=4, shard_rows=100)
+            assert sharded.tolist() == idx.tolist()
+    # k larger than the matrix, and an empty matrix
+    assert len(top_k(MATRIX[:3], QUERIES[0], 10)[0]) == 3
+    assert len(top_k(MATRIX[:0], QUERIES[0], 10)[0]) == 0
+
+
+def test_top_k_batch_matches_top_k():
+    for query, (idx, _) in zip(QUERIES, top_k_batch(MATRIX, QUERIES, 10)):
+        assert idx.tolist() == top_k(MATRIX, query, 10)[0].tolist()
+
+
+@pytest.mark.parametrize("level, quantize", [("int8", quantize_int8), ("binary", quantize_binary)])
+def test_quantized_top_k_reranks_exactly(level, quantize):
+    codes = quantize(MATRIX)
+    for query in QUERIES:
+        # With every row a candidate the exact re-rank gives the exact answer
+        idx, scores = quantized_top_k(MATRIX, codes, query, level, 5, candidates=len(MATRIX))
+        assert idx.tolist() == exact(query, 5)
+        assert np.allclose(scores, MATRIX[idx] @ query)
+    assert len(quantized_top_k(MATRIX[:0], codes[:0], QUERIES[0], level, 5, 50)[0]) == 0
+
+
+class Encoder:
+    """Maps each known question to a fixed unit vector"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=True):
+        if isinstance(texts, str):
+            return self.vectors[texts]
+        return np.stack([self.vectors[text] for text in texts])
+
+
+@pytest.fixture
+def dao(tmp_path):
+    """A NumPy store over MATRIX, without the embedding model or a store directory"""
+    dao = NumpyStoreDao.__new__(NumpyStoreDao)
+    dao.model = Encoder({f"q{i}": query for i, query in enumerate(QUERIES)})
+    dao.lock = threading.Lock()
+    dao.embeddings = MATRIX
+    dao.articles = [
+        {"url": f"https://gu.com/p/{i}", "title": f"T{i}", "body": "", "publication_date": f"2024-05-{i % 28 + 1:02d}T12:00:00Z"}
+        for i in range(len(MATRIX))
+    ]
+    dao.codes, dao.dates = {}, None
+    dao.executor, dao.workers, dao.shard_rows = None, 1, 0
+    dao.results = ResultCache("numpy", "test", mode="memory", directory=str(tmp_path))
+    return dao
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"quantization": "int8"},
+    {"quantization": "binary", "from_date": "2024-05-03", "to_date": "2024-05-10"},
+])
+def test_batch_matches_single_queries(dao, options, tmp_path):
+    questions = [f"q{i}" for i in range(len(QUERIES))]
+    batch = dao.related_articles_batch(questions, limit=5, **options)
+    # Fresh cache, so the single queries are searched again rather than read back
+    dao.results = ResultCache("numpy", "single", mode="memory", directory=str(tmp_path))
+    single = [dao.related_articles(q, limit=5, **options) for q in questions]
+    assert [[row[0] for row in rows] for rows in batch] == [[row[0] for row in rows] for rows in single]
+    # A matrix-matrix product may round differently from a matrix-vector one
+    assert [row[4] for rows in batch for row in rows] == pytest.approx([row[4] for rows in single for row in rows])
+    if "from_date" in options:
+        assert all("2024-05-03" <= row[3][:10] <= "2024-05-10" for rows in batch for row in rows)
+
+
+def test_batch_uses_the_result_cache(dao):
+    stats = {}
+    first = dao.related_articles("q0", limit=5, quantization="int8", stats=stats)
+    assert stats["scanned_rows"] == len(MATRIX) and set(stats["stages"]) == {"encode_ms", "search_ms"}
+
+    # q0 is answered from the cache; only q1 is scored
+    dao.related_articles("q0", limit=5, quantization="int8", stats=stats)
+    assert stats["scanned_rows"] == 0
+    assert dao.related_articles_batch(["q0", "q1"], limit=5, quantization="int8")[0] == first
+    assert dao.results.as_dict()["memory_hits"] == 2
+
+
+def test_bad_parameters_are_value_errors(dao):
+    with pytest.raises(ValueError):
+        dao.related_articles_batch(["q0"], quantization="halfvec")
+    with pytest.raises(ValueError):
+        dao.related_articles("q0", from_date="2024-05-10", to_date="2024-05-01")
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from services.common.embedding_models import embedding_model
+from services.common.reduction import EmbeddingSpace, Projection, fit_pca, reduction_setting, truncation
+
+
+def test_pca_projection_is_versioned(tmp_path):
+    """The version hashes the fitted matrix, survives a save/load and the output is unit length"""
+    embeddings = np.random.default_rng(0).normal(size=(200, 384)).astype(np.float32)
+    projection = fit_pca("minilm", embeddings, 64)
+    assert projection.version.startswith("pca64_")
+    assert 0 < projection.explained_variance < 1
+
+    loaded = Projection.load(projection.save(str(tmp_path)))
+    assert loaded.version == projection.version
+    reduced = loaded.apply(embeddings[:3])
+    assert reduced.shape == (3, 64)
+    assert np.allclose(np.linalg.norm(reduced, axis=1), 1, atol=1e-5)
+    assert np.allclose(loaded.apply(embeddings[0]), reduced[0], atol=1e-6)
+
+    refit = fit_pca("minilm", embeddings[:100], 64)
+    assert refit.version != projection.version
+    assert EmbeddingSpace(embedding_model("minilm"), projection).table("articles") == f"articles_{projection.version}"
+
+
+def test_reduction_settings():
+    assert reduction_setting("none") == ("none", None)
+    assert reduction_setting("pca:128") == ("pca", 128)
+    for setting in ("pca", "pca:100", "none:64", "svd:64"):
+        with pytest.raises(ValueError):
+            reduction_setting(setting)
+
+    with pytest.raises(ValueError):
+        truncation(embedding_model("minilm"), 128)
+    assert truncation(embedding_model("mxbai-large"), 256).version == "trunc256"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from services.common.rerank import cosine_scores, embedding_matrix, mmr, rerank
+
+QUERY = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+# Two near-identical candidates closest to the query and a less similar, different one
+CANDIDATES = np.array([
+    [0.95, 0.30, 0.0],
+    [0.94, 0.32, 0.0],
+    [0.80, 0.0, 0.60],
+], dtype=np.float32)
+
+
+def test_exact_and_threshold():
+    """Exact re-scoring orders by cosine similarity; threshold drops candidates below min_score"""
+    idx, scores = rerank(CANDIDATES, QUERY, k=3)
+    assert idx.tolist() == [0, 1, 2]
+    assert np.all(np.diff(scores) <= 0)
+
+    idx, _ = rerank(CANDIDATES, QUERY, k=3, mode="threshold", min_score=0.9)
+    assert idx.tolist() == [0, 1]
+
+
+def test_mmr_prefers_diverse_candidates():
+    """MMR picks the different candidate over the near-duplicate; lambda=1 is plain top-k"""
+    scores = cosine_scores(CANDIDATES, QUERY)
+    assert mmr(CANDIDATES, scores, k=2, mmr_lambda=0.5).tolist() == [0, 2]
+    assert mmr(CANDIDATES, scores, k=2, mmr_lambda=1.0).tolist() == [0, 1]
+
+
+def test_embedding_matrix_from_arrow():
+    """Chunked Arrow list<float> columns become one (n, dim) float32 matrix"""
+    pa = pytest.importorskip("pyarrow")
+    column = pa.chunked_array([[[1.0, 2.0], [3.0, 4.0]], [[5.0, 6.0]]], pa.list_(pa.float32()))
+    matrix = embedding_matrix(column, 2)
+    assert matrix.dtype == np.float32
+    assert matrix.tolist() == [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+
+
+if __name__ == "__main__":
+    test_exact_and_threshold()
+    test_mmr_prefers_diverse_candidates()
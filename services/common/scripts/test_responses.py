@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("msgpack")
+pytest.importorskip("orjson")
+
+from services.common import responses
+from services.common.responses import (
+    ARROW, JSON, MSGPACK, encode_rows, decode_rows, encode_batch, decode_batch, negotiate
+)
+
+ROWS = [
+    ("https://gu.com/p/a", "A", "First body", datetime(2025, 7, 1, 9, 30, tzinfo=timezone.utc), 0.91),
+    ("https://gu.com/p/b", "B", "Second body", datetime(2025, 6, 30, 18, 0), 0.87),
+]
+# What the services returned before: FastAPI's JSON, dates as ISO strings
+EXPECTED = [[url, title, body, published.isoformat(), score] for url, title, body, published, score in ROWS]
+
+
+def formats():
+    available = [JSON, MSGPACK]
+    try:
+        import pyarrow  # noqa: F401
+        available.append(ARROW)
+    except ImportError:
+        pass
+    return available
+
+
+@pytest.mark.parametrize("media_type", formats())
+def test_formats_round_trip(media_type):
+    """Every wire format decodes to the rows JSON has always produced, batches included"""
+    assert decode_rows(encode_rows(ROWS, media_type), media_type) == EXPECTED
+
+    groups = [ROWS, [], ROWS[:1]]
+    assert decode_batch(encode_batch(groups, media_type), media_type) == [EXPECTED, [], EXPECTED[:1]]
+
+    # Cassandra has no similarity score
+    text_scores = [row[:4] + ("No Similarity Score",) for row in ROWS]
+    assert [row[4] for row in decode_rows(encode_rows(text_scores, media_type), media_type)] == \
+        ["No Similarity Score"] * 2
+
+
+def test_negotiate_falls_back_to_json(monkeypatch):
+    """A service answers in the first format it supports and never in one the client did not list"""
+    assert negotiate(None) == JSON
+    assert negotiate("application/x-msgpack, application/json;q=0.5") == MSGPACK
+    monkeypatch.setattr(responses, "ARROW_AVAILABLE", False)
+    assert negotiate(f"{ARROW}, {JSON};q=0.5") == JSON
+    assert negotiate(f"{MSGPACK};q=0, {JSON}") == JSON
+
+
+if __name__ == "__main__":
+    for media_type in formats():
+        test_formats_round_trip(media_type)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from services.common.result_cache import ResultCache, corpus_version
+
+VECTOR = np.linspace(-1, 1, 16, dtype=np.float32)
+ROWS = [("https://gu.com/p/a", "Title", "Body", "2024-05-01", 0.9)]
+
+
+def test_hits_until_ingest_bumps_the_version(tmp_path):
+    """Same vector and parameters hit; other parameters miss; an ingest invalidates everything"""
+    cache = ResultCache("postgres", "articles", mode="memory", directory=str(tmp_path))
+    key = cache.key(VECTOR, limit=5, quantization="none")
+    assert cache.get(key) is None
+    cache.put(key, ROWS, search_ms=40.0)
+
+    assert cache.get(cache.key(VECTOR, limit=5, quantization="none")) == ROWS
+    assert cache.get(cache.key(VECTOR, limit=10, quantization="none")) is None
+
+    # An ingest by another process (pull_docs) only touches the version file
+    corpus_version("postgres", "articles", str(tmp_path)).bump()
+    assert cache.get(cache.key(VECTOR, limit=5, quantization="none")) is None
+    stats = cache.as_dict()
+    assert stats["memory_hits"] == 1 and stats["lookups"] == 4
+    assert 0 < stats["saved_ms"] <= 40.0
+
+
+def test_results_of_a_search_overtaken_by_ingest_are_not_stored(tmp_path):
+    cache = ResultCache("numpy", "numpy_store", mode="memory", directory=str(tmp_path))
+    key = cache.key(VECTOR, limit=5)
+    cache.get(key)
+    cache.bump()
+    cache.put(key, ROWS, search_ms=5.0)
+    assert cache.get(key) is None
+    assert cache.as_dict()["entries"] == 0
+
+
+def test_disk_tier_is_shared_between_processes(tmp_path):
+    """A second cache on the same directory (another worker) hits what the first stored"""
+    first = ResultCache("clickhouse", "articles", mode="disk", directory=str(tmp_path))
+    second = ResultCache("clickhouse", "articles", mode="disk", directory=str(tmp_path))
+    key = first.key(VECTOR, limit=5)
+    first.get(key)
+    first.put(key, ROWS, search_ms=12.0)
+
+    assert second.get(second.key(VECTOR, limit=5)) == ROWS
+    assert second.as_dict()["disk_hits"] == 1
+
+    first.bump()
+    assert second.get(second.key(VECTOR, limit=5)) is None
+    assert not list(tmp_path.glob("clickhouse_articles/v0"))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_hits_until_ingest_bumps_the_version, test_results_of_a_search_overtaken_by_ingest_are_not_stored,
+                 test_disk_tier_is_shared_between_processes):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
@@ -0,0 +1 @@
+# This file makes numpy_store a Python package
\ No newline at end of file
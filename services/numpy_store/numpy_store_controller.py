@@ -0,0 +1,80 @@
+import time
+from typing import List, Literal, Optional
+from fastapi import FastAPI, Header, HTTPException
+from numpy_store_dao import NumpyStoreDao
+import logging
+from services.common.batch import RelatedArticlesBatch
+from services.common.ingest import IngestCheckpoint, schedule_periodic_ingest
+from services.common.metrics import metrics_sink
+from services.common.near_duplicates import near_duplicate_index
+from services.common.responses import ArticleRow, rows_response, batch_response
+
+app = FastAPI()
+
+# Create controller instance
+numpy_store_dao = NumpyStoreDao()
+metrics = metrics_sink("numpy")
+
+@app.get("/related-articles", response_model=List[ArticleRow])
+async def related_articles(query: str,
+                           quantization: Optional[Literal["none", "int8", "binary"]] = None,
+                           from_date: Optional[str] = None, to_date: Optional[str] = None,
+                           accept: Optional[str] = Header(None)):
+    start_time = time.time()
+    with metrics.track("/related-articles") as record:
+        stats = {}
+        try:
+            result = numpy_store_dao.related_articles(query, quantization=quantization, from_date=from_date,
+                                                      to_date=to_date, stats=stats)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        record.update(rows=len(result), stages=stats["stages"])
+    end_time = time.time()
+    logging.info(f"GET Time taken: {end_time - start_time} seconds")
+    return rows_response(result, accept)
+
+@app.post("/related-articles/batch", response_model=List[List[ArticleRow]])
+async def related_articles_batch(request: RelatedArticlesBatch,
+                                 quantization: Optional[Literal["none", "int8", "binary"]] = None,
+                                 from_date: Optional[str] = None, to_date: Optional[str] = None,
+                                 accept: Optional[str] = Header(None)):
+    start_time = time.time()
+    with metrics.track("/related-articles/batch") as record:
+        try:
+            result = numpy_store_dao.related_articles_batch(request.queries, limit=request.limit,
+                                                            quantization=quantization, from_date=from_date,
+                                                            to_date=to_date)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        record.update(rows=sum(len(rows) for rows in result))
+    end_time = time.time()
+    logging.info(f"BATCH Time taken for {len(request.queries)} queries: {end_time - start_time} seconds")
+    return batch_response(result, accept)
+
+@app.post("/upload-articles")
+async def upload_articles(mode: Literal["latest", "incremental", "backfill"] = "latest",
+                          from_date: Optional[str] = None, to_date: Optional[str] = None):
+    start_time = time.time()
+    with metrics.track("/upload-articles"):
+        result = numpy_store_dao.upload_articles(mode=mode, from_date=from_date, to_date=to_date)
+    end_time = time.time()
+    logging.info(f"POST Time taken: {end_time - start_time} seconds")
+    return result
+
+@app.get("/ingest-status")
+async def ingest_status():
+    return IngestCheckpoint("numpy").as_dict()
+
+
+@app.get("/near-duplicates")
+async def near_duplicates():
+    """How many ingested articles were collapsed as near-copies of stored ones"""
+    return near_duplicate_index("numpy").as_dict()
+
+@app.get("/result-cache")
+async def result_cache():
+    """Hit rate, latency saved and corpus version of the top-k result cache"""
+    return numpy_store_dao.results.as_dict()
+
+# Set INGEST_INTERVAL_SECONDS to keep the store current in the background
+schedule_periodic_ingest(app, lambda: numpy_store_dao.upload_articles(mode="incremental"))
@@ -0,0 +1,399 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+from services.common.ingest import IngestInProgress, guardian_pages
+from services.common.near_duplicates import collapse, mark_stored
+from services.common.filters import date_range
+from services.common.parallel_encode import encode_texts
+from services.common.reduction import embedding_space
+from services.common.result_cache import ResultCache
+from services.common.quantization import (
+    quantization_level, candidate_count, quantize_int8, quantize_binary, hamming_distances
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+load_dotenv()
+
+EMBEDDINGS_FILE = "embeddings.npy"
+ARTICLES_FILE = "articles.jsonl"
+
+
+def _utc(value) -> datetime:
+    """Naive UTC datetime for an ISO string or datetime, as datetime64 expects"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _shard_top_k(matrix: np.ndarray, query: np.ndarray, k: int, offset: int = 0):
+    """Top-k rows of one shard by dot product, as (global indices, scores)"""
+    scores = matrix @ query
+    if k < len(scores):
+        idx = np.argpartition(scores, -k)[-k:]
+    else:
+        idx = np.arange(len(scores))
+    return idx + offset, scores[idx]
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int, executor: ThreadPoolExecutor = None,
+          workers: int = 1, shard_rows: int = 0):
+    """Return (indices, scores) of the k rows with the highest dot product, best first.
+
+    When an executor is given and the matrix has more than shard_rows rows, the scan is split
+    into one contiguous row shard per worker. Shards run in parallel (NumPy releases the GIL
+    during the product) and the per-shard winners are merged.
+    """
+    n = matrix.shape[0]
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    if executor is None or workers <= 1 or n <= shard_rows:
+        idx, scores = _shard_top_k(matrix, query, k)
+    else:
+        bounds = np.linspace(0, n, workers + 1, dtype=np.int64)
+        futures = [
+            executor.submit(_shard_top_k, matrix[start:stop], query, k, start)
+            for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+        ]
+        parts = [f.result() for f in futures]
+        idx = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        if k < len(scores):
+            keep = np.argpartition(scores, -k)[-k:]
+            idx, scores = idx[keep], scores[keep]
+
+    order = np.argsort(-scores)
+    return idx[order], scores[order]
+
+
+def top_k_batch(matrix: np.ndarray, queries: np.ndarray, k: int):
+    """Per-query (indices, scores) of the k best rows, best first, from one matrix-matrix product"""
+    n = matrix.shape[0]
+    if n == 0 or k <= 0:
+        return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+
+    scores = np.asarray(matrix) @ queries.T
+    k = min(k, n)
+    idx = np.argpartition(scores, -k, axis=0)[-k:] if k < n else np.broadcast_to(np.arange(n)[:, None], scores.shape)
+    results = []
+    for column in range(scores.shape[1]):
+        column_idx = idx[:, column]
+        column_scores = scores[column_idx, column]
+        order = np.argsort(-column_scores)
+        results.append((column_idx[order], column_scores[order]))
+    return results
+
+
+def quantized_top_k(embeddings: np.ndarray, codes: np.ndarray, query: np.ndarray, level: str, k: int,
+                    candidates: int):
+    """Rank candidates over int8 or binary codes, then re-rank them exactly against the float32 rows"""
+    if embeddings.shape[0] == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    if level == "int8":
+        scores = codes @ quantize_int8(query).astype(np.int32)
+    else:
+        scores = -hamming_distances(codes, quantize_binary(query))
+    n = min(candidates, len(scores))
+    candidate_idx = np.argpartition(scores, -n)[-n:] if n < len(scores) else np.arange(len(scores))
+    # Sorted row order keeps reads from a memory-mapped matrix sequential
+    candidate_idx.sort()
+
+    exact = np.asarray(embeddings[candidate_idx]) @ query
+    order = np.argsort(-exact)[:k]
+    return candidate_idx[order], exact[order]
+
+
+class NumpyStoreDao:
+    """In-process vector store: normalized float32 embeddings in one contiguous matrix."""
+
+    def __init__(self):
+        self.API_KEY = os.getenv("GUARDIAN_API_KEY")
+        self.embedding = embedding_space()
+        self.model = self.embedding.encoder()
+        # One store directory per embedding model and projection, like the other backends' tables
+        self.data_dir = self.embedding.table(os.getenv("NUMPY_STORE_PATH", "data/numpy_store"))
+        self.use_mmap = os.getenv("NUMPY_STORE_MMAP", "false") == "true"
+        self.shard_rows = int(os.getenv("NUMPY_STORE_SHARD_ROWS", 50000))
+        self.workers = int(os.getenv("NUMPY_STORE_WORKERS", os.cpu_count() or 1))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self.lock = threading.Lock()
+        self.embeddings = np.empty((0, self.embedding.dim), dtype=np.float32)
+        self.articles = []
+        self.urls = set()
+        self.codes = {}
+        self.dates = None
+        # Top-k results per query vector, invalidated by every ingest into the store
+        self.results = ResultCache("numpy", os.path.basename(os.path.normpath(self.data_dir)))
+        self.load()
+        logging.info("DAO initialized.")
+
+    def load(self):
+        """Load the embedding matrix and article metadata from disk, if present"""
+        embeddings_path = os.path.join(self.data_dir, EMBEDDINGS_FILE)
+        articles_path = os.path.join(self.data_dir, ARTICLES_FILE)
+        if not os.path.exists(embeddings_path) or not os.path.exists(articles_path):
+            logging.info(f"No existing store at {self.data_dir}, starting empty.")
+            return
+
+        with open(articles_path, "r", encoding="utf-8") as f:
+            articles = [json.loads(line) for line in f if line.strip()]
+        embeddings = np.load(embeddings_path, mmap_mode="r" if self.use_mmap else None)
+        if not self.use_mmap:
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        # A crash between the two writes can leave the files out of step; trust the shorter one
+        n = min(len(articles), embeddings.shape[0])
+        self.articles = articles[:n]
+        self.embeddings = embeddings[:n]
+        self.urls = {a["url"] for a in self.articles}
+        logging.info(f"Loaded {n} articles from {self.data_dir} (mmap={self.use_mmap}).")
+
+    def save(self):
+        """Persist the embedding matrix and article metadata"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        embeddings_path = os.path.join(self.data_dir, EMBEDDINGS_FILE)
+        articles_path = os.path.join(self.data_dir, ARTICLES_FILE)
+
+        tmp_embeddings = embeddings_path + ".tmp"
+        with open(tmp_embeddings, "wb") as f:
+            np.save(f, np.asarray(self.embeddings, dtype=np.float32))
+        tmp_articles = articles_path + ".tmp"
+        with open(tmp_articles, "w", encoding="utf-8") as f:
+            for article in self.articles:
+                f.write(json.dumps(article) + "\n")
+        os.replace(tmp_embeddings, embeddings_path)
+        os.replace(tmp_articles, articles_path)
+
+        if self.use_mmap:
+            self.embeddings = np.load(embeddings_path, mmap_mode="r")
+
+    def add_articles(self, articles, embeddings):
+        """Append articles and their embeddings, skipping URLs already stored"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding.dim)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        with self.lock:
+            keep = []
+            for i, article in enumerate(articles):
+                if article["url"] not in self.urls:
+                    self.urls.add(article["url"])
+                    keep.append(i)
+            if not keep:
+                return 0
+            self.articles = self.articles + [articles[i] for i in keep]
+            self.embeddings = np.concatenate([np.asarray(self.embeddings), embeddings[keep]])
+            self.codes = {}
+            self.dates = None
+            self.save()
+            self.results.bump()
+        logging.info(f"Added {len(keep)} articles, store now holds {len(self.articles)}.")
+        return len(keep)
+
+    def stored_texts(self):
+        """(url, title, body) of every stored article, for seeding the near-duplicate index"""
+        with self.lock:
+            return [(a["url"], a["title"], a["body"]) for a in self.articles]
+
+    def export_articles(self, batch_size: int = 1000):
+        """Stream every stored article with its embedding, in batches of row tuples"""
+        with self.lock:
+            embeddings, articles = self.embeddings, self.articles
+        for start in range(0, len(articles), batch_size):
+            yield [
+                (a["url"], a["title"], a["body"], a["publication_date"], embeddings[start + i])
+                for i, a in enumerate(articles[start:start + batch_size])
+            ]
+
+    def insert_articles(self, rows):
+        """Bulk insert pre-embedded (url, title, body, publication_date, embedding) rows"""
+        articles = [
+            {
+                "url": url,
+                "title": title,
+                "body": body,
+                "publication_date": publication_date.isoformat() if hasattr(publication_date, "isoformat") else publication_date,
+            }
+            for url, title, body, publication_date, _ in rows
+        ]
+        return self.add_articles(articles, [row[4] for row in rows])
+
+    def parse_articles(self, results):
+        """Extract the stored fields from raw Guardian API results"""
+        articles = []
+        for result in results:
+            fields = result.get('fields', {})
+            articles.append({
+                "url": fields.get('shortUrl', ''),
+                "title": fields.get('headline', ''),
+                "body": fields.get('bodyText', ''),
+                "publication_date": fields.get('firstPublicationDate', '2024-01-01T00:00:00Z'),
+            })
+        return articles
+
+    def quantized_codes(self, level: str):
+        """Compact codes for the current matrix, built on first use after each change"""
+        with self.lock:
+            if level not in self.codes:
+                quantize = quantize_int8 if level == "int8" else quantize_binary
+                self.codes[level] = quantize(self.embeddings)
+            return self.codes[level], self.embeddings, self.articles
+
+    def publication_dates(self):
+        """Publication dates as a datetime64 array parallel to the matrix, built on first use after each change"""
+        with self.lock:
+            if self.dates is None:
+                self.dates = np.array(
+                    [np.datetime64(_utc(a["publication_date"]), "s") for a in self.articles],
+                    dtype="datetime64[s]"
+                )
+            return self.dates
+
+    def date_mask(self, from_date=None, to_date=None):
+        """Row indices inside the date window, or None when no window is requested"""
+        start, end = date_range(from_date, to_date)
+        if start is None and end is None:
+            return None
+        dates = self.publication_dates()
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= np.datetime64(_utc(start), "s")
+        if end is not None:
+            mask &= dates < np.datetime64(_utc(end), "s")
+        return np.flatnonzero(mask)
+
+    def related_articles(self, query: str, limit: int = 5, quantization: str = None, from_date=None, to_date=None,
+                         stats: dict = None):
+        """Search for similar articles with a single matrix-vector product.
+
+        A date window is applied as a mask before scoring, so only rows inside it are scanned.
+        When a stats dict is given it is filled with this call's stage timings and rows scanned;
+        the DAO is shared by concurrent requests, so nothing about one call is kept on it.
+        """
+        encode_started = time.perf_counter()
+        query_embedding = self.model.encode(query, normalize_embeddings=True).astype(np.float32)
+        search_started = time.perf_counter()
+        (results,), scanned_rows = self.search(query_embedding[None, :], limit, quantization, from_date, to_date)
+        if stats is not None:
+            stats["scanned_rows"] = scanned_rows
+            stats["stages"] = {
+                "encode_ms": (search_started - encode_started) * 1000,
+                "search_ms": (time.perf_counter() - search_started) * 1000,
+            }
+        return results
+
+    def related_articles_batch(self, queries, limit: int = 5, quantization: str = None, from_date=None,
+                               to_date=None):
+        """Search for several queries with one forward pass and, unquantized, one matrix-matrix product"""
+        query_embeddings = self.model.encode(
+            list(queries), batch_size=len(queries), normalize_embeddings=True
+        ).astype(np.float32)
+        return self.search(query_embeddings, limit, quantization, from_date, to_date)[0]
+
+    def search(self, query_embeddings: np.ndarray, limit: int, quantization: str = None, from_date=None,
+               to_date=None):
+        """Rows per query vector and the number of rows scanned.
+
+        Queries found in the result cache are not scored again; the rest are scored together.
+        """
+        level = quantization_level(quantization)
+        if level == "halfvec":
+            raise ValueError("halfvec quantization is only available in Postgres")
+        start, end = date_range(from_date, to_date)
+        keys = [self.results.key(q, limit=limit, quantization=level, from_date=start, to_date=end)
+                for q in query_embeddings]
+        found = [self.results.get(key) for key in keys]
+        misses = [i for i, cached in enumerate(found) if cached is None]
+        if not misses:
+            return found, 0
+
+        search_started = time.perf_counter()
+        rows = self.date_mask(from_date, to_date)
+        if level == "none":
+            with self.lock:
+                embeddings, articles = self.embeddings, self.articles
+            if rows is not None:
+                rows = rows[rows < len(articles)]
+                embeddings = np.asarray(embeddings[rows])
+            if len(misses) == 1:
+                hits = [top_k(embeddings, query_embeddings[misses[0]], limit, self.executor, self.workers,
+                              self.shard_rows)]
+            else:
+                hits = top_k_batch(embeddings, query_embeddings[misses], limit)
+        else:
+            codes, embeddings, articles = self.quantized_codes(level)
+            if rows is not None:
+                rows = rows[rows < len(articles)]
+                codes, embeddings = codes[rows], np.asarray(embeddings[rows])
+            hits = [quantized_top_k(embeddings, codes, query_embeddings[i], level, limit, candidate_count(limit))
+                    for i in misses]
+        search_ms = (time.perf_counter() - search_started) * 1000
+
+        for i, (idx, scores) in zip(misses, hits):
+            if rows is not None:
+                idx = rows[idx]
+            found[i] = [
+                (
+                    articles[j]["url"],
+                    articles[j]["title"],
+                    articles[j]["body"],
+                    articles[j]["publication_date"],
+                    float(score)
+                )
+                for j, score in zip(idx, scores)
+            ]
+            self.results.put(keys[i], found[i], search_ms / len(misses))
+        return found, int(embeddings.shape[0])
+
+    def storage_stats(self):
+        """In-memory bytes of the full-precision matrix and of each quantized code matrix"""
+        return {
+            "none": {"bytes": int(self.embeddings.nbytes)},
+            "int8": {"bytes": int(self.quantized_codes("int8")[0].nbytes)},
+            "binary": {"bytes": int(self.quantized_codes("binary")[0].nbytes)},
+        }
+
+    def upload_articles(self, page_size=1, total_needed=10, mode="latest", from_date=None, to_date=None):
+        """Fetch, vectorize and store Guardian articles"""
+        logging.info(f"Starting Guardian article vectorization pipeline ({mode})...")
+        pages = (total_needed + page_size - 1) // page_size
+        try:
+            for results in guardian_pages(self.API_KEY, "numpy", page_size, pages, mode, from_date, to_date):
+                articles = [a for a in self.parse_articles(results) if a["url"] and a["url"] not in self.urls]
+                articles = collapse("numpy", articles, self.stored_texts)
+                if not articles:
+                    logging.info("No new articles on this page.")
+                    continue
+                embeddings = encode_texts(
+                    self.model,
+                    [a["body"] for a in articles],
+                    batch_size=32,
+                    normalize_embeddings=True
+                )
+                self.add_articles(articles, embeddings)
+                mark_stored("numpy", articles)
+            logging.info("Pipeline completed successfully")
+            return True
+        except IngestInProgress:
+            return "skipped"
+        except Exception as e:
+            logging.error(f"Pipeline failed: {e}")
+            return False
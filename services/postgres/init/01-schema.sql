@@ -18,12 +18,20 @@ CREATE TABLE articles (
     title TEXT NOT NULL,
     body TEXT NOT NULL,
     publication_date TIMESTAMPTZ NOT NULL,
-    vector vector(384)
+    vector vector(384),
+    content_hash TEXT
 );
 
 -- Create an index for vector similarity search
 -- CREATE INDEX ON articles USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);
 
+-- Btree for publication-date prefilters
+CREATE INDEX articles_publication_date_idx ON articles (publication_date);
+
+-- Quantized indexes for candidate search with exact re-ranking (pgvector >= 0.7; filtered iterative scans need >= 0.8)
+CREATE INDEX articles_vector_halfvec_idx ON articles USING hnsw ((vector::halfvec(384)) halfvec_cosine_ops);
+CREATE INDEX articles_vector_bit_idx ON articles USING hnsw ((binary_quantize(vector)::bit(384)) bit_hamming_ops);
+
 -- Create additional indexes for different similarity metrics
 -- CREATE INDEX ON articles USING ivfflat (vector vector_l2ops) WITH (lists = 100);
 
@@ -1,26 +1,71 @@
 import time
-from fastapi import FastAPI
+from typing import List, Literal, Optional
+from fastapi import FastAPI, Header, HTTPException
 from postgres_dao import PostgresDao
 from pull_docs import pull_docs
 import logging
+from services.common.batch import RelatedArticlesBatch
+from services.common.ingest import IngestCheckpoint, schedule_periodic_ingest
+from services.common.metrics import metrics_sink
+from services.common.near_duplicates import near_duplicate_index
+from services.common.responses import ArticleRow, rows_response, batch_response
 
 app = FastAPI()
 
 # Create controller instance
 postgres_dao = PostgresDao()
+metrics = metrics_sink("postgres")
 
-@app.get("/related-articles")
-async def related_articles(query: str):
+@app.get("/related-articles", response_model=List[ArticleRow])
+async def related_articles(query: str,
+                           quantization: Optional[Literal["none", "halfvec", "int8", "binary"]] = None,
+                           from_date: Optional[str] = None, to_date: Optional[str] = None,
+                           accept: Optional[str] = Header(None)):
     start_time = time.time()
-    result =  postgres_dao.related_articles(query)
+    with metrics.track("/related-articles") as record:
+        try:
+            result = postgres_dao.related_articles(query, quantization=quantization, from_date=from_date,
+                                                   to_date=to_date)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        record.update(rows=len(result), stages=postgres_dao.last_stages)
     end_time = time.time()
     logging.info(f"GET Time taken: {end_time - start_time} seconds...you got that!")
-    return result
+    return rows_response(result, accept)
+
+@app.post("/related-articles/batch", response_model=List[List[ArticleRow]])
+async def related_articles_batch(request: RelatedArticlesBatch, accept: Optional[str] = Header(None)):
+    start_time = time.time()
+    with metrics.track("/related-articles/batch") as record:
+        result = postgres_dao.related_articles_batch(request.queries, limit=request.limit)
+        record.update(rows=sum(len(rows) for rows in result))
+    end_time = time.time()
+    logging.info(f"BATCH Time taken for {len(request.queries)} queries: {end_time - start_time} seconds...you got that!")
+    return batch_response(result, accept)
 
 @app.post("/upload-articles")
-async def upload_articles():
+async def upload_articles(mode: Literal["latest", "incremental", "backfill"] = "latest",
+                          from_date: Optional[str] = None, to_date: Optional[str] = None):
     start_time = time.time()
-    result = pull_docs(10)
+    with metrics.track("/upload-articles"):
+        result = pull_docs(10, mode=mode, from_date=from_date, to_date=to_date)
     end_time = time.time()
     logging.info(f"POST Time taken: {end_time - start_time} seconds...you posted up!")
-    return result
\ No newline at end of file
+    return result
+
+@app.get("/ingest-status")
+async def ingest_status():
+    return IngestCheckpoint("postgres").as_dict()
+
+@app.get("/near-duplicates")
+async def near_duplicates():
+    """How many ingested articles were collapsed as near-copies of stored ones"""
+    return near_duplicate_index("postgres").as_dict()
+
+@app.get("/result-cache")
+async def result_cache():
+    """Hit rate, latency saved and corpus version of the top-k result cache"""
+    return postgres_dao.results.as_dict()
+
+# Set INGEST_INTERVAL_SECONDS to keep the store current in the background
+schedule_periodic_ingest(app, lambda: pull_docs(10, mode="incremental"))
@@ -1,12 +1,20 @@
 from http.client import HTTPException
 
+import numpy as np
 import psycopg
 from pgvector.psycopg import register_vector
-from sentence_transformers import SentenceTransformer
 import os
+import time
 import logging
+import threading
 from dotenv import load_dotenv
-from pull_docs import pull_docs
+from pull_docs import pull_docs, ensure_table, ensure_indexes
+from services.common.batch import group_by_query
+from services.common.dedupe import content_hash
+from services.common.filters import date_range
+from services.common.quantization import quantization_level, candidate_count
+from services.common.reduction import embedding_space
+from services.common.result_cache import ResultCache
 
 # Configure logging
 logging.basicConfig(
@@ -19,12 +27,25 @@ logging.basicConfig(
 
 load_dotenv()
 
+# Candidate ordering per quantization level; {dim} is the embedding model's dimension
+QUANTIZED_ORDER = {
+    "halfvec": "vector::halfvec({dim}) <=> %(emb)s::vector::halfvec({dim})",
+    "binary": "binary_quantize(vector)::bit({dim}) <~> binary_quantize(%(emb)s::vector)",
+}
+
 class PostgresDao:
     def __init__(self):
         self.API_KEY = os.getenv("GUARDIAN_API_KEY")
         self.BASE = "https://content.guardianapis.com/search"
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The model's vectors, optionally reduced; each (model, projection) pair has its own table
+        self.embedding = embedding_space()
+        self.table = self.embedding.table("articles")
+        self.model = self.embedding.encoder()
+        # Top-k results per query vector, invalidated by every ingest into the table
+        self.results = ResultCache("postgres", self.table)
         self.client = None
+        self.table_ready = False
+        self.last_stages = None
         logging.info("DAO initialized.")
 
     def connect_postgres(self):
@@ -39,6 +60,10 @@ class PostgresDao:
             )
             logging.info("Connected to Postgres successfully.")
             print("Connected to Postgres successfully")
+            if not self.table_ready:
+                ensure_table(self.client, self.table, self.embedding.dim)
+                self.table_ready = True
+                threading.Thread(target=self.build_indexes, name="postgres-indexes", daemon=True).start()
             return True
         except Exception as e:
             logging.error(f"Failed to connect to Postgres: {e}")
@@ -46,8 +71,47 @@ class PostgresDao:
             self.client = None
             return False
 
-    def related_articles(self, query: str, limit: int = 5):
+    def build_indexes(self):
+        """Build indexes missing from a table created before they were added, off the request path"""
         try:
+            with psycopg.connect(
+                dbname=os.getenv("POSTGRES_DB", "VectorEmbeds"),
+                user=os.getenv("POSTGRES_USER", "test"),
+                password=os.getenv("POSTGRES_PASSWORD", "1234"),
+                host=os.getenv("POSTGRES_HOST", "db"),
+                port=os.getenv("POSTGRES_PORT", 5432),
+                autocommit=True,
+            ) as conn:
+                ensure_indexes(conn, self.table, self.embedding.dim)
+        except Exception as e:
+            logging.error(f"Could not build indexes on {self.table}: {e}")
+
+    def related_articles(self, query: str, limit: int = 5, quantization: str = None,
+                         from_date=None, to_date=None):
+        """Search for similar articles by cosine distance.
+
+        With halfvec or binary quantization, an HNSW index over the compact representation yields
+        candidate_count(limit) candidates that are re-ranked exactly against the full vectors.
+        A publication-date window is a btree-backed prefilter; on the HNSW path pgvector's
+        iterative index scan keeps fetching until enough rows pass it.
+        """
+        cur = conn = None
+        try:
+            level = quantization_level(quantization)
+            if level == "int8":
+                raise ValueError("int8 quantization is not available in pgvector; use halfvec or binary")
+            encode_started = time.perf_counter()
+            emb = self.model.encode(query).tolist()
+            encode_ms = (time.perf_counter() - encode_started) * 1000
+            start, end = date_range(from_date, to_date)
+
+            # A cached top-k skips the connection as well as the search
+            cache_key = self.results.key(emb, limit=limit, quantization=level, from_date=start, to_date=end)
+            cached = self.results.get(cache_key)
+            if cached is not None:
+                self.last_stages = {"encode_ms": encode_ms, "search_ms": 0.0}
+                return cached
+
             if not self.connect_postgres():
                 raise HTTPException(500, "Failed to connect to database")
             conn = self.client
@@ -56,23 +120,66 @@ class PostgresDao:
             conn.autocommit = True
             register_vector(conn)
             cur = conn.cursor()
-            emb = self.model.encode(query).tolist()
-            cur.execute(
-                """
-                SELECT url, title, body, publication_date,
-                       1 - (vector <=> %s::vector) AS similarity
-                FROM articles
-                ORDER BY vector <=> %s::vector
-                LIMIT %s
-                """,
-                (emb, emb, limit)
-            )
+            search_started = time.perf_counter()
+            params = {"emb": emb, "limit": limit}
+
+            conditions = []
+            if start:
+                conditions.append("publication_date >= %(from_date)s")
+                params["from_date"] = start
+            if end:
+                conditions.append("publication_date < %(to_date)s")
+                params["to_date"] = end
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            if level == "none":
+                cur.execute(
+                    f"""
+                    SELECT url, title, body, publication_date,
+                           1 - (vector <=> %(emb)s::vector) AS similarity
+                    FROM {self.table}
+                    {where}
+                    ORDER BY vector <=> %(emb)s::vector
+                    LIMIT %(limit)s
+                    """,
+                    params
+                )
+            else:
+                params["candidates"] = candidate_count(limit)
+                # The HNSW scan returns at most ef_search rows
+                cur.execute(f"SET hnsw.ef_search = {max(40, params['candidates'])}")
+                if conditions:
+                    cur.execute("SET hnsw.iterative_scan = relaxed_order")
+                cur.execute(
+                    f"""
+                    SELECT url, title, body, publication_date,
+                           1 - (vector <=> %(emb)s::vector) AS similarity
+                    FROM (
+                        SELECT url, title, body, publication_date, vector
+                        FROM {self.table}
+                        {where}
+                        ORDER BY {QUANTIZED_ORDER[level].format(dim=self.embedding.dim)}
+                        LIMIT %(candidates)s
+                    ) candidates
+                    ORDER BY vector <=> %(emb)s::vector
+                    LIMIT %(limit)s
+                    """,
+                    params
+                )
             results = cur.fetchall()
+            self.last_stages = {
+                "encode_ms": encode_ms,
+                "search_ms": (time.perf_counter() - search_started) * 1000,
+            }
             if not results:
                 raise HTTPException(404, "No matches found")
+            self.results.put(cache_key, results, self.last_stages["search_ms"])
 
             return results
             
+        except ValueError:
+            # Bad request parameters (quantization level, dates); the controller answers 400
+            raise
         except Exception as e:
             logging.error(f"Exception in /search endpoint: {e}", exc_info=True)
             raise HTTPException(500, str(e))
@@ -81,3 +188,132 @@ class PostgresDao:
                 cur.close()
             if conn is not None:
                 conn.close()
+
+    def related_articles_batch(self, queries, limit: int = 5):
+        """Search for several queries with one statement.
+
+        The query vectors come from a single forward pass and are joined LATERALly against a
+        per-query top-k. There is no index on the full-precision vector (01-schema.sql only indexes
+        its halfvec and bit expressions), so each query is an exact sequential scan; the batch saves
+        forward passes and round trips, not scan work.
+        """
+        cur = conn = None
+        try:
+            if not self.connect_postgres():
+                raise HTTPException(500, "Failed to connect to database")
+            conn = self.client
+            if conn is None:
+                raise HTTPException(500, "Database connection is None")
+            conn.autocommit = True
+            register_vector(conn)
+            cur = conn.cursor()
+
+            embeddings = self.model.encode(list(queries), batch_size=len(queries))
+            values = ", ".join(f"({i}, %s::vector)" for i in range(len(queries)))
+            cur.execute(
+                f"""
+                SELECT q.query_index, a.url, a.title, a.body, a.publication_date, a.similarity
+                FROM (VALUES {values}) AS q(query_index, emb)
+                CROSS JOIN LATERAL (
+                    SELECT url, title, body, publication_date,
+                           1 - (vector <=> q.emb) AS similarity
+                    FROM {self.table}
+                    ORDER BY vector <=> q.emb
+                    LIMIT %s
+                ) a
+                ORDER BY q.query_index, a.similarity DESC
+                """,
+                [embedding.tolist() for embedding in embeddings] + [limit]
+            )
+            return group_by_query(cur.fetchall(), len(queries))
+
+        except Exception as e:
+            logging.error(f"Exception in /search batch endpoint: {e}", exc_info=True)
+            raise HTTPException(500, str(e))
+        finally:
+            if cur is not None:
+                cur.close()
+            if conn is not None:
+                conn.close()
+
+    def storage_stats(self):
+        """Bytes taken by the full vectors and by their quantized representations"""
+        if not self.connect_postgres():
+            raise HTTPException(500, "Failed to connect to database")
+        conn = self.client
+        try:
+            with conn.cursor() as cur:
+                dim = self.embedding.dim
+                cur.execute(
+                    f"""
+                    SELECT coalesce(sum(pg_column_size(vector)), 0),
+                           coalesce(sum(pg_column_size(vector::halfvec({dim}))), 0),
+                           coalesce(sum(pg_column_size(binary_quantize(vector)::bit({dim}))), 0)
+                    FROM {self.table}
+                    """
+                )
+                full, half, binary = cur.fetchone()
+                cur.execute(
+                    """
+                    SELECT indexrelname, pg_relation_size(indexrelid)
+                    FROM pg_stat_user_indexes
+                    WHERE relname = %s AND indexrelname LIKE %s
+                    """,
+                    (self.table, f"{self.table}_vector_%")
+                )
+                indexes = dict(cur.fetchall())
+            return {
+                "none": {"column_bytes": full},
+                "halfvec": {"column_bytes": half, "index_bytes": indexes.get(f"{self.table}_vector_halfvec_idx")},
+                "binary": {"column_bytes": binary, "index_bytes": indexes.get(f"{self.table}_vector_bit_idx")},
+            }
+        finally:
+            conn.close()
+
+    def export_articles(self, batch_size: int = 1000):
+        """Stream every stored article with its embedding, in batches of row tuples"""
+        if not self.connect_postgres():
+            raise HTTPException(500, "Failed to connect to database")
+        conn = self.client
+        register_vector(conn)
+        try:
+            # Named (server-side) cursor so the table is never materialized client-side
+            with conn.cursor(name="snapshot_export") as cur:
+                cur.itersize = batch_size
+                cur.execute(f"SELECT url, title, body, publication_date, vector FROM {self.table}")
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            conn.close()
+
+    def insert_articles(self, rows):
+        """Bulk insert pre-embedded (url, title, body, publication_date, embedding) rows via COPY"""
+        if not self.connect_postgres():
+            raise HTTPException(500, "Failed to connect to database")
+        conn = self.client
+        register_vector(conn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE TEMP TABLE articles_load (LIKE {self.table}) ON COMMIT DROP")
+                with cur.copy(
+                    "COPY articles_load (url, title, body, publication_date, vector, content_hash) FROM STDIN"
+                ) as copy:
+                    for url, title, body, publication_date, embedding in rows:
+                        copy.write_row((url, title, body, publication_date,
+                                        np.asarray(embedding, dtype=np.float32), content_hash(title, body)))
+                cur.execute(
+                    f"""
+                    INSERT INTO {self.table} (url, title, body, publication_date, vector, content_hash)
+                    SELECT url, title, body, publication_date, vector, content_hash FROM articles_load
+                    ON CONFLICT (url) DO NOTHING
+                    """
+                )
+                inserted = cur.rowcount
+            conn.commit()
+            self.results.bump()
+            return inserted
+        finally:
+            conn.close()
@@ -1,9 +1,13 @@
 import os
 import psycopg
 import logging
-import requests
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
+from services.common.dedupe import ArticleDeduper
+from services.common.ingest import IngestInProgress, guardian_pages
+from services.common.near_duplicates import collapse, mark_stored
+from services.common.parallel_encode import encode_texts
+from services.common.reduction import embedding_space
+from services.common.result_cache import corpus_version
 
 # Configure logging
 logging.basicConfig(
@@ -13,11 +17,64 @@ logging.basicConfig(
 )
 
 
-def pull_docs(total_needed: int = 1000, page_size: int = 1):
+# Indexes every articles table carries, as 01-schema.sql creates them for the default one: index name
+# suffix and definition, where {dim} is the model's dimension. Quantized search and date prefilters rely on them.
+INDEXES = {
+    "halfvec": ("vector_halfvec_idx", "USING hnsw ((vector::halfvec({dim})) halfvec_cosine_ops)"),
+    "binary": ("vector_bit_idx", "USING hnsw ((binary_quantize(vector)::bit({dim})) bit_hamming_ops)"),
+    "publication_date": ("publication_date_idx", "(publication_date)"),
+}
+
+
+def ensure_table(conn, table: str, dim: int):
+    """Create an embedding model's articles table with its indexes; 01-schema.sql only creates the default model's.
+
+    Indexes are built here only for a table that did not exist yet, where building them is instant;
+    an existing table missing some gets them from ensure_indexes, which does not block writes.
+    """
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        created = cur.fetchone()[0] is None
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                url TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                publication_date TIMESTAMPTZ NOT NULL,
+                vector vector({dim}),
+                content_hash TEXT
+            )
+            """
+        )
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        if created:
+            for suffix, definition in INDEXES.values():
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_{suffix} ON {table} {definition.format(dim=dim)}")
+    conn.commit()
+
+
+def ensure_indexes(conn, table: str, dim: int):
+    """Build any missing INDEXES with CREATE INDEX CONCURRENTLY; needs an autocommit connection"""
+    for name, (suffix, definition) in INDEXES.items():
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{suffix} "
+                            f"ON {table} {definition.format(dim=dim)}")
+        except Exception as e:
+            logging.error(f"Building the {name} index on {table} failed: {e}")
+            # A failed concurrent build leaves an invalid index that IF NOT EXISTS would keep;
+            # drop it so the next start tries again
+            with conn.cursor() as cur:
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {table}_{suffix}")
+
+
+def pull_docs(total_needed: int = 1000, page_size: int = 1, mode: str = "latest",
+              from_date: str = None, to_date: str = None):
 
     load_dotenv()
     API_KEY = os.getenv("GUARDIAN_API_KEY")
-    BASE = "https://content.guardianapis.com/search"
     all_articles = []
     pages = total_needed // page_size
     
@@ -32,78 +89,114 @@ def pull_docs(total_needed: int = 1000, page_size: int = 1):
             port=os.getenv("POSTGRES_PORT", 5430),
         )
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    embedding = embedding_space()
+    table = embedding.table("articles")
+    model = embedding.encoder()
     articles_inserted = 0
+    articles_updated = 0
     articles_skipped = 0
-    
+    articles_collapsed = 0
+
+    ensure_table(conn, table, embedding.dim)
+
+    def stored_hashes(urls):
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT url, content_hash FROM {table} WHERE url = ANY(%s)", (urls,))
+            return dict(cur.fetchall())
+
+    deduper = ArticleDeduper(stored_hashes)
+
+    def stored_texts():
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT url, title, body FROM {table}")
+            return cur.fetchall()
+
     try:
-        for page in range(1, pages + 1):
-            params = {
-                "api-key": API_KEY,
-                "order-by": "newest",
-                "page-size": page_size,
-                "page": page,  # Offset to fetch older articles (skip recent 2000 pages)
-                "show-fields": "all",
-            }
-            
-            logging.info(f"--- Fetching page {page} ---")
-            logging.debug(f"Request URL: {BASE}")
-            
-            resp = requests.get(BASE, params=params)
-            
-            data = resp.json().get("response", {})
-            results = data.get("results", [])
+        pages_iter = guardian_pages(API_KEY, "postgres", page_size, pages, mode, from_date, to_date)
+        for page, results in enumerate(pages_iter, start=1):
             all_articles.extend(results)
-            
-            logging.info(f"Fetched {len(results)} items from page {page}")
-            
-            if not results:
-                logging.warning("No results returned, stopping...")
-                break
+
+            logging.info(f"Fetched {len(results)} items from page {page} ({mode})")
+
+            articles = [
+                {
+                    "url": result['fields']['shortUrl'],
+                    "title": result['fields']['headline'],
+                    "body": result['fields']['bodyText'],
+                    "publication_date": result['fields']['firstPublicationDate'],
+                }
+                for result in results
+            ]
+
+            # Only new or modified articles reach the encoder
+            new, modified, unchanged = deduper.split(articles)
+            articles_skipped += len(unchanged)
+            for article in unchanged:
+                logging.info(f"  ⏭️  SKIPPED (unchanged): {article['title'][:50]}...")
+
+            # Near-copies of stored articles under new URLs collapse into the stored one
+            canonical = collapse("postgres", new, stored_texts)
+            articles_collapsed += len(new) - len(canonical)
+            to_embed = canonical + modified
+            if not to_embed:
+                logging.info(f"Page {page} summary: {articles_inserted} inserted, {articles_updated} updated, {articles_skipped} skipped")
+                continue
+            embeddings = encode_texts(model, [a["body"] for a in to_embed])
 
             # Process each article
-            for i, result in enumerate(results):
-                article = result['fields']
-                url = article['shortUrl']
-                title = article['headline']
-                body = article['bodyText']
-                publication_date = article['firstPublicationDate']
-                
+            for article, embedding in zip(to_embed, embeddings):
+                title = article["title"]
                 logging.info(f"  Title: {title[:100]}...")
 
-                embedding = model.encode(body)
-                embedding_list = embedding.tolist()
-
                 with conn.cursor() as cur:
                     cur.execute(
-                        """
-                        INSERT INTO articles (url, title, body, publication_date, vector)
-                        VALUES (%s, %s, %s, %s, %s)
-                        ON CONFLICT (url) DO NOTHING
-                        RETURNING url;
+                        f"""
+                        INSERT INTO {table} (url, title, body, publication_date, vector, content_hash)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (url) DO UPDATE SET
+                            title = EXCLUDED.title,
+                            body = EXCLUDED.body,
+                            publication_date = EXCLUDED.publication_date,
+                            vector = EXCLUDED.vector,
+                            content_hash = EXCLUDED.content_hash
+                        WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                        RETURNING (xmax = 0) AS inserted;
                         """,
-                        (url, title, body, publication_date, embedding_list)
+                        (article["url"], title, article["body"], article["publication_date"],
+                         embedding.tolist(), article["content_hash"])
                     )
                     result = cur.fetchone()
                     conn.commit()
                     
-                    if result:
+                    if result is None:
+                        articles_skipped += 1
+                        logging.info(f"  ⏭️  SKIPPED (duplicate): {title[:50]}...")
+                    elif result[0]:
                         articles_inserted += 1
                         logging.info(f"  ✅ INSERTED: {title[:50]}...")
                     else:
-                        articles_skipped += 1
-                        logging.info(f"  ⏭️  SKIPPED (duplicate): {title[:50]}...")
+                        articles_updated += 1
+                        logging.info(f"  🔄 UPDATED: {title[:50]}...")
+                deduper.mark_stored([article])
+                mark_stored("postgres", [article])
+            # Results the service cached before this page no longer reflect the table
+            corpus_version("postgres", table).bump()
 
-            logging.info(f"Page {page} summary: {articles_inserted} inserted, {articles_skipped} skipped")
+            logging.info(f"Page {page} summary: {articles_inserted} inserted, {articles_updated} updated, {articles_skipped} skipped")
 
         conn.close()
 
         logging.info("=== FINAL SUMMARY ===")
         logging.info(f"Articles inserted: {articles_inserted}")
+        logging.info(f"Articles updated (content changed): {articles_updated}")
         logging.info(f"Articles skipped (duplicates): {articles_skipped}")
-        logging.info(f"Total processed: {articles_inserted + articles_skipped}")
+        logging.info(f"Articles collapsed (near-duplicates): {articles_collapsed}")
+        logging.info(f"Total processed: {articles_inserted + articles_updated + articles_skipped}")
 
         return True
+    except IngestInProgress:
+        conn.close()
+        return "skipped"
     except Exception as e:
         logging.error(f"❌ Pipeline failed: {e}")
         return False